@@ -3,14 +3,25 @@ Celery Application Configuration
 """
 
 from celery import Celery
+from celery.signals import (before_task_publish, task_postrun, task_prerun,
+                            worker_init, worker_process_init,
+                            worker_process_shutdown)
+from celery.worker.control import inspect_command
 
+from app import database, metrics
 from app.config import settings
 
 celery_app = Celery(
     "vmshift",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=["app.tasks.vm_tasks", "app.tasks.migration_tasks"],
+    include=[
+        "app.tasks.vm_tasks",
+        "app.tasks.migration_tasks",
+        "app.tasks.maintenance",
+        "app.tasks.outbox_tasks",
+        "app.tasks.utilization_tasks",
+    ],
 )
 
 # Celery configuration
@@ -27,6 +38,8 @@ celery_app.conf.update(
         "app.tasks.migration_tasks.*": {"queue": "migration"},
     },
     # Worker settings
+    worker_send_task_events=True,  # Feeds the API's worker state monitor
+    task_send_sent_event=True,
     worker_prefetch_multiplier=1,
     worker_concurrency=4,
     # Result settings
@@ -43,6 +56,14 @@ celery_app.conf.update(
             "task": "app.tasks.maintenance.cleanup_old_tasks",
             "schedule": 3600.0,  # Every hour
         },
+        "dispatch-task-outbox": {
+            "task": "app.tasks.outbox_tasks.dispatch_outbox",
+            "schedule": settings.OUTBOX_DISPATCH_INTERVAL,
+        },
+        "rollup-vm-utilization": {
+            "task": "app.tasks.utilization_tasks.rollup_utilization",
+            "schedule": settings.UTILIZATION_ROLLUP_INTERVAL,
+        },
     },
 )
 
@@ -50,3 +71,42 @@ celery_app.conf.update(
 celery_app.conf.update(
     broker_connection_retry_on_startup=True,
 )
+
+
+@worker_process_init.connect
+def init_worker_db_pool(**kwargs):
+    """Give each forked worker child its own, worker-sized connection pool"""
+    database.configure_engines(role="worker")
+
+
+@inspect_command()
+def db_pool_stats(state):
+    """Connection pool statistics (celery -A app.celery_app inspect db_pool_stats)"""
+    return database.get_pool_stats()
+
+
+def celery_queues():
+    """Names of all queues tasks can be routed to"""
+    queues = {celery_app.conf.task_default_queue}
+    for route in (celery_app.conf.task_routes or {}).values():
+        if "queue" in route:
+            queues.add(route["queue"])
+    return sorted(queues)
+
+
+# Prometheus metrics
+before_task_publish.connect(metrics.stamp_enqueue_time, weak=False)
+task_prerun.connect(metrics.task_started, weak=False)
+task_postrun.connect(metrics.task_finished, weak=False)
+
+
+@worker_init.connect
+def start_metrics_exporter(**kwargs):
+    """Expose worker metrics for Prometheus from the worker main process"""
+    if settings.METRICS_ENABLED and settings.WORKER_METRICS_PORT:
+        metrics.start_worker_exporter(settings.WORKER_METRICS_PORT)
+
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid=None, **kwargs):
+    metrics.mark_process_dead(pid)
@@ -3,26 +3,234 @@ Database Configuration
 SQLAlchemy setup for PostgreSQL
 """
 
+import itertools
+import logging
+import threading
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy import exc as sqlalchemy_exc
+from sqlalchemy import text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import Delete, Insert, Update
 
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check out a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sqlalchemy_exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.wait_count += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+def create_db_engine(url: str, role: str = "api"):
+    """
+    Create an engine sized for the calling process.
+
+    API processes serve many concurrent requests and get the larger pool;
+    Celery worker children run one task at a time, so their pool is kept
+    small to stay within the server's max_connections across the fleet.
+    """
+    if url.startswith("sqlite"):
+        return create_engine(
+            url, connect_args={"check_same_thread": False, "timeout": 30}
+        )
+
+    if role == "worker":
+        pool_size = settings.WORKER_DB_POOL_SIZE
+        max_overflow = settings.WORKER_DB_MAX_OVERFLOW
+    else:
+        pool_size = settings.DB_POOL_SIZE
+        max_overflow = settings.DB_MAX_OVERFLOW
+
+    return create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=True,  # Verify connections before use
+        pool_recycle=settings.DB_POOL_RECYCLE,  # Recycle stale connections
+    )
+
+
 # Create engine with connection pooling
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_size=10,
-    max_overflow=20,
-    pool_pre_ping=True,  # Verify connections before use
-    pool_recycle=300,  # Recycle connections after 5 minutes
+engine = create_db_engine(settings.DATABASE_URL)
+
+# Optional read replicas - only used by sessions opened with get_read_db
+replica_engines = [create_db_engine(url) for url in settings.DATABASE_REPLICA_URLS]
+
+# A replica that has replayed everything it received is caught up, however
+# long ago the last transaction was (an idle primary sends none)
+_REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+class ReplicaRouter:
+    """Round-robin replica selection that skips lagging or unreachable replicas"""
+
+    def __init__(self, engines, max_lag_seconds: float, check_interval: float):
+        self.engines = list(engines)
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._cycle = itertools.cycle(range(len(self.engines)))
+        self._lag = {}  # engine index -> (checked_at, lag seconds or None)
+        self._lock = threading.Lock()
+
+    def _replica_lag(self, index: int):
+        """Return cached replication lag in seconds, or None if unreachable"""
+        now = time.monotonic()
+        cached = self._lag.get(index)
+        if cached and now - cached[0] < self.check_interval:
+            return cached[1]
+
+        try:
+            with self.engines[index].connect() as conn:
+                lag = float(conn.execute(_REPLICA_LAG_QUERY).scalar() or 0)
+        except Exception as e:
+            logger.warning(f"Read replica {index} unavailable: {str(e)}")
+            lag = None
+
+        self._lag[index] = (now, lag)
+        return lag
+
+    def choose(self):
+        """Pick the next healthy replica, or None to fall back to the primary"""
+        for _ in range(len(self.engines)):
+            with self._lock:
+                index = next(self._cycle)
+            lag = self._replica_lag(index)
+            if lag is not None and lag <= self.max_lag_seconds:
+                return self.engines[index]
+        return None
+
+
+replica_router = ReplicaRouter(
+    replica_engines,
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_LAG_CHECK_INTERVAL,
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to a replica when opened as read-only.
+
+    Any flush or write statement pins the session to the primary for the
+    rest of its life, so read-after-write within a request stays consistent.
+    """
+
+    def __init__(self, *args, read_only: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_only = read_only
+        self._replica = None
+        self._pinned_primary = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if isinstance(clause, (Insert, Update, Delete)) or self._flushing:
+            self._pinned_primary = True
+
+        if not self.read_only or self._pinned_primary or not replica_router.engines:
+            return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+        if self._replica is None:
+            self._replica = replica_router.choose()
+            if self._replica is None:
+                self._pinned_primary = True
+                return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+        return self._replica
+
+
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, class_=RoutingSession
+)
 
 Base = declarative_base()
 
 
+def configure_engines(role: str = "api"):
+    """
+    Rebuild the primary and replica engines for this process.
+
+    Called from Celery's worker_process_init so each forked child drops the
+    pool inherited from its parent (without closing the parent's sockets)
+    and opens its own, sized for a worker.
+    """
+    global engine, replica_engines, replica_router
+
+    for old_engine in [engine, *replica_engines]:
+        old_engine.dispose(close=False)
+
+    engine = create_db_engine(settings.DATABASE_URL, role=role)
+    replica_engines = [
+        create_db_engine(url, role=role) for url in settings.DATABASE_REPLICA_URLS
+    ]
+    replica_router = ReplicaRouter(
+        replica_engines,
+        max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+        check_interval=settings.REPLICA_LAG_CHECK_INTERVAL,
+    )
+    SessionLocal.configure(bind=engine)
+
+
+def get_pool_stats():
+    """Connection pool statistics for the primary and replica engines"""
+    stats = {}
+    named = [("primary", engine)] + [
+        (f"replica_{i}", eng) for i, eng in enumerate(replica_engines)
+    ]
+    for name, eng in named:
+        pool = eng.pool
+        if not isinstance(pool, QueuePool):
+            stats[name] = {"pool": pool.__class__.__name__}
+            continue
+
+        pool_stats = {
+            "pool": pool.__class__.__name__,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        }
+        if isinstance(pool, InstrumentedQueuePool):
+            pool_stats.update(
+                {
+                    "wait_count": pool.wait_count,
+                    "wait_seconds_total": round(pool.wait_seconds_total, 6),
+                    "wait_seconds_max": round(pool.wait_seconds_max, 6),
+                    "timeouts": pool.timeouts,
+                }
+            )
+        stats[name] = pool_stats
+    return stats
+
+
 def get_db():
     """Dependency to get database session"""
     db = SessionLocal()
@@ -30,3 +238,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Dependency to get a read-only session routed to a replica when configured"""
+    db = SessionLocal(read_only=True)
+    try:
+        yield db
+    finally:
+        db.close()
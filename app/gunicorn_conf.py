@@ -0,0 +1,24 @@
+"""
+Gunicorn Configuration
+Keeps Prometheus multiprocess metrics consistent across worker restarts
+"""
+
+import glob
+import os
+
+
+def on_starting(server):
+    """Clear metric files left over from a previous run"""
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    """Drop live gauges of a worker that has exited"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
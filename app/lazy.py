@@ -0,0 +1,34 @@
+"""
+Lazy Imports
+Module proxies that import on first attribute access, so heavy libraries
+(numpy, yaml, redis) stay out of the API's cold start until a request
+actually needs them.
+"""
+
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    The import goes through importlib.import_module, so concurrent first
+    accesses are serialized by the import lock; the loaded module's
+    attributes are then copied onto the proxy for direct lookups.
+    """
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self.__name__!r}>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Return name's module if already imported, otherwise a lazy proxy"""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
@@ -4,19 +4,23 @@ Demonstrates VM discovery, migration workflows, and containerization logic
 """
 
 import logging
+import sys
 from contextlib import asynccontextmanager
 
-from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
 from app.config import settings
 from app.database import Base, engine, get_db
-from app.routers import health, migrations, tasks, vms
-
+from app.middleware import (CompressionMiddleware, PrometheusMiddleware,
+                            install_profiling)
 # Ensure models are registered by importing them explicitly
 from app.models.migration import Migration  # noqa: F401
 from app.models.vm import VirtualMachine  # noqa: F401
+from app.routers import capacity, health, metrics, migrations, tasks, vms
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -32,6 +36,9 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown
     logger.info("Shutting down VMShift Demo Application...")
+    if "app.services.worker_state" in sys.modules:
+        # Only loaded (and started) by the first task/worker status request
+        sys.modules["app.services.worker_state"].stop_worker_monitor()
 
 
 app = FastAPI(
@@ -58,11 +65,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Response compression - inside the metrics middleware, so response sizes
+# are measured as sent
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        levels={"gzip": settings.GZIP_LEVEL, "br": settings.BROTLI_QUALITY},
+    )
+
+# Request profiling - opt-in, nothing is hooked when disabled
+if settings.PROFILING_ENABLED:
+    install_profiling(
+        app,
+        slow_request_ms=settings.PROFILING_SLOW_REQUEST_MS,
+        top_queries=settings.PROFILING_TOP_QUERIES,
+    )
+
+# Prometheus request metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(PrometheusMiddleware)
+
+
+@app.exception_handler(StaleDataError)
+async def handle_stale_data(request: Request, exc: StaleDataError):
+    """A versioned row changed between our read and our write"""
+    return JSONResponse(
+        status_code=409,
+        content={"detail": "Resource was modified concurrently, reload and retry"},
+    )
+
+
 # Include routers
 app.include_router(health.router, tags=["Health"])
+app.include_router(metrics.router, tags=["Metrics"])
 app.include_router(vms.router, prefix="/api/v1/vms", tags=["Virtual Machines"])
 app.include_router(migrations.router, prefix="/api/v1/migrations", tags=["Migrations"])
 app.include_router(tasks.router, prefix="/api/v1/tasks", tags=["Tasks"])
+app.include_router(capacity.router, prefix="/api/v1/capacity", tags=["Capacity"])
 
 
 @app.get("/")
@@ -0,0 +1,237 @@
+"""
+Prometheus Metrics
+Metric definitions shared by the API and Celery workers.
+
+When PROMETHEUS_MULTIPROC_DIR is set, every process (gunicorn worker or
+Celery child) writes its samples there and a scrape aggregates all of them.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess,
+                               start_http_server)
+from prometheus_client.core import GaugeMetricFamily
+
+from app.database import get_pool_stats
+
+logger = logging.getLogger(__name__)
+
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+TASK_BUCKETS = (0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+# API
+REQUEST_LATENCY = Histogram(
+    "vmshift_http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route", "status"],
+)
+REQUEST_SIZE = Histogram(
+    "vmshift_http_request_size_bytes",
+    "HTTP request body size",
+    ["method", "route"],
+    buckets=SIZE_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "vmshift_http_response_size_bytes",
+    "HTTP response body size",
+    ["method", "route"],
+    buckets=SIZE_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "vmshift_http_requests_in_flight",
+    "HTTP requests currently being handled",
+    multiprocess_mode="livesum",
+)
+
+# Database connection pools (per process, summed across live processes)
+DB_POOL_SIZE = Gauge(
+    "vmshift_db_pool_size", "Pool size", ["engine"], multiprocess_mode="livesum"
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "vmshift_db_pool_checked_out",
+    "Connections checked out",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "vmshift_db_pool_overflow",
+    "Overflow connections open",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT_SECONDS = Gauge(
+    "vmshift_db_pool_wait_seconds_total",
+    "Time spent waiting for a pooled connection",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_TIMEOUTS = Gauge(
+    "vmshift_db_pool_timeouts_total",
+    "Pool checkout timeouts",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+
+# Celery
+TASK_RUNTIME = Histogram(
+    "vmshift_task_duration_seconds",
+    "Celery task runtime",
+    ["task", "state"],
+    buckets=TASK_BUCKETS,
+)
+TASKS_TOTAL = Counter("vmshift_tasks_total", "Celery tasks finished", ["task", "state"])
+TASK_QUEUE_WAIT = Histogram(
+    "vmshift_task_queue_wait_seconds",
+    "Time from enqueue to task start",
+    ["task", "queue"],
+    buckets=TASK_BUCKETS,
+)
+MIGRATION_STAGE_DURATION = Histogram(
+    "vmshift_migration_stage_duration_seconds",
+    "Time spent in each migration stage",
+    ["stage", "target_platform"],
+    buckets=TASK_BUCKETS,
+)
+
+_pool_metrics_updated_at = 0.0
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def update_pool_metrics(min_interval: float = 1.0):
+    """Copy connection pool statistics into gauges, at most once per interval"""
+    global _pool_metrics_updated_at
+
+    now = time.monotonic()
+    if now - _pool_metrics_updated_at < min_interval:
+        return
+    _pool_metrics_updated_at = now
+
+    for name, stats in get_pool_stats().items():
+        if "size" not in stats:
+            continue
+        DB_POOL_SIZE.labels(name).set(stats["size"])
+        DB_POOL_CHECKED_OUT.labels(name).set(stats["checked_out"])
+        DB_POOL_OVERFLOW.labels(name).set(stats["overflow"])
+        DB_POOL_WAIT_SECONDS.labels(name).set(stats.get("wait_seconds_total", 0))
+        DB_POOL_TIMEOUTS.labels(name).set(stats.get("timeouts", 0))
+
+
+@contextmanager
+def track_migration_stage(stage: str, target_platform: str):
+    """Observe how long a migration stage took"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        MIGRATION_STAGE_DURATION.labels(stage, target_platform).observe(
+            time.perf_counter() - start
+        )
+
+
+class QueueDepthCollector:
+    """Reports broker queue lengths at scrape time"""
+
+    def __init__(self, redis_client_factory, queues):
+        self.redis_client_factory = redis_client_factory
+        self.queues = list(queues)
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            "vmshift_celery_queue_depth", "Messages waiting in queue", labels=["queue"]
+        )
+        try:
+            pipe = self.redis_client_factory().pipeline(transaction=False)
+            for queue in self.queues:
+                pipe.llen(queue)
+            for queue, depth in zip(self.queues, pipe.execute()):
+                gauge.add_metric([queue], depth)
+        except Exception as e:
+            logger.warning(f"Could not read queue depth: {str(e)}")
+        yield gauge
+
+
+def render_metrics(extra_collectors=()):
+    """Return (body, content_type) for a scrape of this process or all processes"""
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    output = generate_latest(registry)
+
+    if extra_collectors:
+        extra = CollectorRegistry(auto_describe=False)
+        for collector in extra_collectors:
+            extra.register(collector)
+        output += generate_latest(extra)
+
+    return output, CONTENT_TYPE_LATEST
+
+
+# Celery signal handlers (connected in app.celery_app)
+
+
+def stamp_enqueue_time(headers=None, **kwargs):
+    """before_task_publish: record when the message was sent"""
+    if headers is not None:
+        headers.setdefault("enqueued_at", time.time())
+
+
+def task_started(task=None, **kwargs):
+    """task_prerun: observe queue wait and start the runtime clock"""
+    request = task.request
+    request.metrics_started_at = time.perf_counter()
+
+    enqueued_at = request.get("enqueued_at")
+    if enqueued_at is None:
+        return
+    # Tasks with a countdown/ETA only start waiting once they are due
+    if request.eta:
+        try:
+            enqueued_at = max(
+                enqueued_at, datetime.fromisoformat(str(request.eta)).timestamp()
+            )
+        except ValueError:
+            pass
+    queue = (request.delivery_info or {}).get("routing_key") or "celery"
+    TASK_QUEUE_WAIT.labels(task.name, queue).observe(max(time.time() - enqueued_at, 0))
+
+
+def task_finished(task=None, state=None, **kwargs):
+    """task_postrun: observe runtime and count the outcome"""
+    started_at = getattr(task.request, "metrics_started_at", None)
+    state = state or "UNKNOWN"
+    if started_at is not None:
+        TASK_RUNTIME.labels(task.name, state).observe(time.perf_counter() - started_at)
+    TASKS_TOTAL.labels(task.name, state).inc()
+    update_pool_metrics()
+
+
+def start_worker_exporter(port: int):
+    """Serve worker metrics over HTTP from the Celery main process"""
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(port, registry=registry)
+    else:
+        logger.warning(
+            "PROMETHEUS_MULTIPROC_DIR is not set; metrics from prefork "
+            "children will not be visible to the worker exporter"
+        )
+        start_http_server(port)
+    logger.info(f"Worker metrics exporter listening on :{port}")
+
+
+def mark_process_dead(pid: int):
+    """Drop live gauges of an exited process from multiprocess aggregation"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,4 @@
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.metrics import PrometheusMiddleware
+from app.middleware.profiling import (ProfilingMiddleware, current_profile,
+                                      install_profiling)
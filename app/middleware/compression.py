@@ -0,0 +1,85 @@
+"""
+Compression Middleware
+Compresses response bodies with the best coding the client accepts
+(br when the brotli package is installed, otherwise gzip).
+
+Small bodies, bodies that already carry a Content-Encoding (e.g. stored
+artifacts served as-is) and already-compressed media types pass through.
+Streaming responses are compressed chunk by chunk.
+"""
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.services.compression import Compressor, choose_encoding
+
+# Media types that don't shrink further
+SKIP_CONTENT_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "application/zip",
+    "application/gzip",
+)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses of at least minimum_size bytes"""
+
+    def __init__(self, app, minimum_size: int = 1024, levels: dict = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        # Per-coding level overrides, e.g. {"gzip": 6, "br": 4}
+        self.levels = levels or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                if not (
+                    "content-encoding" in headers
+                    or "content-range" in headers
+                    or headers.get("content-type", "").startswith(SKIP_CONTENT_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    compressor = Compressor(coding, self.levels.get(coding))
+                    headers["Content-Encoding"] = coding
+                    headers.add_vary_header("Accept-Encoding")
+                    if more_body:
+                        del headers["Content-Length"]
+                    else:
+                        body = compressor.compress(body) + compressor.finish()
+                        headers["Content-Length"] = str(len(body))
+                        await send(start)
+                        await send({**message, "body": body})
+                        return
+                await send(start)
+                start = None
+
+            if compressor is not None:
+                body = compressor.compress(body)
+                if not more_body:
+                    body += compressor.finish()
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
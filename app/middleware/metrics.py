@@ -0,0 +1,61 @@
+"""
+Prometheus Middleware
+Request latency, size and in-flight metrics per route
+"""
+
+import time
+
+from app.metrics import (REQUEST_LATENCY, REQUEST_SIZE, REQUESTS_IN_FLIGHT,
+                         RESPONSE_SIZE, update_pool_metrics)
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording request metrics labelled by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        response_size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec()
+
+            # The router stores the matched route in scope; unmatched paths are
+            # collapsed into one label to keep cardinality bounded
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+
+            REQUEST_LATENCY.labels(method, route_path, status_code).observe(elapsed)
+            REQUEST_SIZE.labels(method, route_path).observe(_request_size(scope))
+            RESPONSE_SIZE.labels(method, route_path).observe(response_size)
+            update_pool_metrics()
+
+
+def _request_size(scope) -> int:
+    for name, value in scope.get("headers", []):
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return 0
+    return 0
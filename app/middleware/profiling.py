@@ -0,0 +1,204 @@
+"""
+Request Profiling Middleware
+Per-request wall time, SQL, Redis and serialization accounting
+"""
+
+import logging
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from fastapi import routing as fastapi_routing
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+_current_profile = ContextVar("request_profile", default=None)
+_installed = False
+
+
+class RequestProfile:
+    """Counters collected while a single request is being handled"""
+
+    __slots__ = (
+        "sql_count",
+        "sql_seconds",
+        "queries",
+        "redis_calls",
+        "redis_seconds",
+        "serialize_seconds",
+    )
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.queries = []  # (seconds, statement)
+        self.redis_calls = 0
+        self.redis_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+    def server_timing(self, total_seconds: float) -> str:
+        """Render the counters as a Server-Timing header value"""
+        return ", ".join(
+            [
+                f"app;dur={total_seconds * 1000:.2f}",
+                f'db;dur={self.sql_seconds * 1000:.2f};desc="{self.sql_count} queries"',
+                f'redis;dur={self.redis_seconds * 1000:.2f};desc="{self.redis_calls} calls"',
+                f"serialize;dur={self.serialize_seconds * 1000:.2f}",
+            ]
+        )
+
+    def top_queries(self, limit: int):
+        return sorted(self.queries, key=lambda q: q[0], reverse=True)[:limit]
+
+
+def current_profile():
+    """The profile of the request being handled, or None outside a request"""
+    return _current_profile.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profiling_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    starts = conn.info.get("profiling_query_start")
+    if profile is None or not starts:
+        return
+
+    elapsed = time.perf_counter() - starts.pop()
+    profile.sql_count += 1
+    profile.sql_seconds += elapsed
+    profile.queries.append((elapsed, statement))
+
+
+def _timed(func, field_count, field_seconds):
+    """Wrap a sync callable so its calls are charged to the current request"""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return func(*args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if field_count:
+                setattr(profile, field_count, getattr(profile, field_count) + 1)
+            setattr(
+                profile,
+                field_seconds,
+                getattr(profile, field_seconds) + time.perf_counter() - start,
+            )
+
+    return wrapper
+
+
+def _timed_serialize_response(func):
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return await func(*args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            profile.serialize_seconds += time.perf_counter() - start
+
+    return wrapper
+
+
+def _install_hooks():
+    """Attach SQLAlchemy, Redis and serialization hooks once per process"""
+    global _installed
+    if _installed:
+        return
+
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    import redis.client
+
+    redis.client.Redis.execute_command = _timed(
+        redis.client.Redis.execute_command, "redis_calls", "redis_seconds"
+    )
+    redis.client.Pipeline.execute = _timed(
+        redis.client.Pipeline.execute, "redis_calls", "redis_seconds"
+    )
+
+    # Response model validation + jsonable encoding, then json.dumps
+    fastapi_routing.serialize_response = _timed_serialize_response(
+        fastapi_routing.serialize_response
+    )
+    JSONResponse.render = _timed(JSONResponse.render, None, "serialize_seconds")
+
+    _installed = True
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware adding a Server-Timing header to every HTTP response.
+
+    Requests slower than slow_request_ms are logged with their slowest
+    SQL statements.
+    """
+
+    def __init__(self, app, slow_request_ms: float = 500.0, top_queries: int = 5):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self.top_queries = top_queries
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing", profile.server_timing(time.perf_counter() - start)
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(token)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms >= self.slow_request_ms:
+                self._log_slow_request(scope, profile, elapsed_ms)
+
+    def _log_slow_request(self, scope, profile: RequestProfile, elapsed_ms: float):
+        queries = "\n".join(
+            f"  {seconds * 1000:.2f}ms  {' '.join(statement.split())[:500]}"
+            for seconds, statement in profile.top_queries(self.top_queries)
+        )
+        logger.warning(
+            f"Slow request {scope['method']} {scope['path']} took {elapsed_ms:.1f}ms "
+            f"(db: {profile.sql_count} queries/{profile.sql_seconds * 1000:.1f}ms, "
+            f"redis: {profile.redis_calls} calls/{profile.redis_seconds * 1000:.1f}ms, "
+            f"serialize: {profile.serialize_seconds * 1000:.1f}ms)"
+            + (f"\nTop queries:\n{queries}" if queries else "")
+        )
+
+
+def install_profiling(app, slow_request_ms: float = 500.0, top_queries: int = 5):
+    """Enable request profiling on a FastAPI app"""
+    _install_hooks()
+    app.add_middleware(
+        ProfilingMiddleware, slow_request_ms=slow_request_ms, top_queries=top_queries
+    )
@@ -1,2 +1,8 @@
-from app.models.migration import Migration, MigrationStatus, TargetPlatform
+from app.models.event import MigrationEvent
+from app.models.migration import (Migration, MigrationArchive, MigrationStatus,
+                                  TargetPlatform)
+from app.models.outbox import OutboxMessage
+from app.models.revision import ArtifactRevision
+from app.models.stats import StageDurationStat
+from app.models.utilization import UtilizationChunk, UtilizationRollup
 from app.models.vm import VirtualMachine, VMStatus
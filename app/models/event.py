@@ -0,0 +1,46 @@
+"""
+Migration Event Model - append-only history of status transitions
+"""
+
+from sqlalchemy import (BigInteger, Column, DateTime, Float, Index, Integer,
+                        String)
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class MigrationEvent(Base):
+    """
+    One row per status transition. Rows are only ever inserted; the time
+    spent in the previous status is stored on the transition that ends it,
+    so duration statistics never need to pair rows up.
+    """
+
+    __tablename__ = "migration_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    # No foreign key: inserts stay cheap and history outlives the migration
+    migration_id = Column(Integer, nullable=False)
+
+    status = Column(String(50), nullable=False)
+    from_status = Column(String(50))
+    # Seconds spent in from_status, when known
+    from_status_seconds = Column(Float)
+
+    progress_percent = Column(Integer)
+    message = Column(String(500))
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Timeline of one migration
+        Index("ix_migration_events_migration_created", "migration_id", "created_at"),
+        # Duration statistics over a time window
+        Index("ix_migration_events_created", "created_at"),
+    )
+
+    def __repr__(self):
+        return (
+            f"<MigrationEvent(migration_id={self.migration_id}, "
+            f"status='{self.status}')>"
+        )
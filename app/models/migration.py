@@ -5,11 +5,12 @@ Migration Model - Migration workflow tracking
 import enum
 
 from sqlalchemy import (JSON, Column, DateTime, Enum, ForeignKey, Integer,
-                        String, Text)
+                        LargeBinary, String, Text)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 from app.database import Base
+from app.models.types import CompressedText
 
 
 class MigrationStatus(str, enum.Enum):
@@ -52,10 +53,10 @@ class Migration(Base):
     container_port = Column(Integer)
     replicas = Column(Integer, default=1)
 
-    # Generated artifacts (stored as JSON)
-    dockerfile_content = Column(Text)
-    kubernetes_manifest = Column(Text)
-    docker_compose = Column(Text)
+    # Generated artifacts (gzip-compressed, served as stored when accepted)
+    dockerfile_content = Column(CompressedText)
+    kubernetes_manifest = Column(CompressedText)
+    docker_compose = Column(CompressedText)
 
     # Registry info
     registry_url = Column(String(255))
@@ -71,11 +72,39 @@ class Migration(Base):
     # Celery task tracking
     celery_task_id = Column(String(100))
 
+    # Optimistic concurrency - bumped on every update, exposed as the ETag
+    version = Column(Integer, nullable=False, default=1)
+
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     started_at = Column(DateTime(timezone=True))
+    stage_started_at = Column(DateTime(timezone=True))  # When status last changed
     completed_at = Column(DateTime(timezone=True))
 
+    __mapper_args__ = {"version_id_col": version}
+
     def __repr__(self):
         return f"<Migration(name='{self.name}', status='{self.status}')>"
+
+
+class MigrationArchive(Base):
+    """Finished migrations moved out of the hot migrations table"""
+
+    __tablename__ = "migrations_archive"
+
+    # Same id as the original migration row
+    id = Column(Integer, primary_key=True)
+    vm_id = Column(Integer, index=True)
+    name = Column(String(255))
+    target_platform = Column(String(50))
+    status = Column(String(50))
+    created_at = Column(DateTime(timezone=True))
+    completed_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Full original row as gzip-compressed JSON
+    payload = Column(LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f"<MigrationArchive(name='{self.name}', status='{self.status}')>"
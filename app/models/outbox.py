@@ -0,0 +1,36 @@
+"""
+Outbox Model - Celery tasks waiting to be published
+"""
+
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, Text
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class OutboxMessage(Base):
+    """
+    A task enqueue recorded in the same transaction as the state change
+    that requires it, and published to the broker by the dispatcher
+    """
+
+    __tablename__ = "task_outbox"
+
+    id = Column(Integer, primary_key=True)
+    task_name = Column(String(255), nullable=False)
+    task_id = Column(String(100), nullable=False, unique=True)
+    args = Column(JSON, default=list)
+    kwargs = Column(JSON, default=dict)
+
+    attempts = Column(Integer, default=0)  # Failed publishes of this message
+    last_error = Column(Text)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True))
+    dead_at = Column(DateTime(timezone=True))  # Given up after too many attempts
+
+    # The dispatcher only ever scans unsent, live rows
+    __table_args__ = (Index("ix_task_outbox_pending", "sent_at", "dead_at", "id"),)
+
+    def __repr__(self):
+        return f"<OutboxMessage(task='{self.task_name}', task_id='{self.task_id}')>"
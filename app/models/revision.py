@@ -0,0 +1,45 @@
+"""
+Artifact Revision Model - history of a migration's generated artifacts
+"""
+
+from sqlalchemy import (BigInteger, Boolean, Column, DateTime, Integer, String,
+                        UniqueConstraint)
+from sqlalchemy.sql import func
+
+from app.database import Base
+from app.models.types import CompressedText
+
+
+class ArtifactRevision(Base):
+    """
+    One row per distinct set of generated artifacts of a migration.
+
+    Keyframes hold the full text of every artifact; other revisions hold
+    line deltas against the previous revision (see services.revisions).
+    """
+
+    __tablename__ = "artifact_revisions"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    # No foreign key, like the event log; record_revision locks the
+    # migration row instead, so concurrent writers number revisions in turn
+    migration_id = Column(Integer, nullable=False)
+    revision = Column(Integer, nullable=False)
+
+    # sha256 of all artifacts; an unchanged digest writes no revision
+    digest = Column(String(64), nullable=False)
+    is_keyframe = Column(Boolean, nullable=False, default=False)
+    # JSON: {artifact: full text} for keyframes, {artifact: delta} otherwise
+    payload = Column(CompressedText, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("migration_id", "revision", name="uq_artifact_revision"),
+    )
+
+    def __repr__(self):
+        return (
+            f"<ArtifactRevision(migration_id={self.migration_id}, "
+            f"revision={self.revision})>"
+        )
@@ -0,0 +1,37 @@
+"""
+Stage Duration Statistics Model - running sums for ETA prediction
+"""
+
+from sqlalchemy import Column, DateTime, Float, Integer, String
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class StageDurationStat(Base):
+    """
+    Streaming duration statistics for one migration stage within a segment
+    (target platform, OS family, VM size bucket). "*" in a key column means
+    all values, so coarser fallbacks are maintained alongside.
+    """
+
+    __tablename__ = "stage_duration_stats"
+
+    stage = Column(String(50), primary_key=True)
+    target_platform = Column(String(50), primary_key=True)
+    os_family = Column(String(50), primary_key=True)
+    size_bucket = Column(String(20), primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+    total_seconds = Column(Float, nullable=False, default=0.0)
+    total_squared_seconds = Column(Float, nullable=False, default=0.0)
+
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    def __repr__(self):
+        return (
+            f"<StageDurationStat(stage='{self.stage}', "
+            f"platform='{self.target_platform}', count={self.count})>"
+        )
@@ -0,0 +1,65 @@
+"""
+Column Types
+"""
+
+import base64
+import binascii
+import gzip
+from typing import Optional
+
+from sqlalchemy import Text, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+GZIP_MAGIC = b"\x1f\x8b"
+# Every base64-encoded gzip stream starts with this (1f 8b 08)
+STORED_PREFIX = "H4sI"
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text stored as a base64-encoded gzip stream in a text column.
+
+    The column stays TEXT, so existing databases need no ALTER and rows
+    written before compression (plain text) still read back as they are.
+    The stream is deterministic (mtime 0, so equal text stores equal
+    values); select the column through raw_column() and pass it to
+    gzip_bytes() to send it as Content-Encoding: gzip without recompressing.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def __init__(self, compresslevel: int = 6, **kwargs):
+        super().__init__(**kwargs)
+        self.compresslevel = compresslevel
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        stream = gzip.compress(value.encode(), self.compresslevel, mtime=0)
+        return base64.b64encode(stream).decode("ascii")
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
+
+def gzip_bytes(stored) -> Optional[bytes]:
+    """The gzip stream of a stored value, or None for uncompressed text"""
+    if stored is None or not stored.startswith(STORED_PREFIX):
+        return None
+    try:
+        stream = base64.b64decode(stored, validate=True)
+    except binascii.Error:
+        return None
+    return stream if stream[:2] == GZIP_MAGIC else None
+
+
+def decompress_text(value):
+    """Text from a stored value; rows written before compression pass through"""
+    stream = gzip_bytes(value)
+    return value if stream is None else gzip.decompress(stream).decode()
+
+
+def raw_column(column):
+    """The column's stored value, bypassing CompressedText decoding"""
+    return type_coerce(column, Text)
@@ -0,0 +1,60 @@
+"""
+Utilization Models - raw VM utilization samples and downsampled rollups
+"""
+
+from sqlalchemy import (BigInteger, Boolean, Column, DateTime, Float, Index,
+                        Integer, LargeBinary, String)
+from sqlalchemy.sql import func
+
+from app.database import Base
+
+
+class UtilizationChunk(Base):
+    """
+    One ingested batch of samples for a VM, stored as packed arrays: uint32
+    second offsets from start_epoch and one float32 array per metric.
+    A thousand samples cost one row instead of a thousand.
+    """
+
+    __tablename__ = "vm_utilization_chunks"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    vm_id = Column(Integer, nullable=False)
+
+    start_epoch = Column(BigInteger, nullable=False)
+    end_epoch = Column(BigInteger, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+
+    offsets = Column(LargeBinary, nullable=False)
+    cpu = Column(LargeBinary)
+    memory = Column(LargeBinary)
+    disk = Column(LargeBinary)
+    network = Column(LargeBinary)
+
+    rolled_up = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_vm_utilization_chunks_vm_start", "vm_id", "start_epoch"),
+        Index("ix_vm_utilization_chunks_rolled_up", "rolled_up", "id"),
+        Index("ix_vm_utilization_chunks_end", "end_epoch"),
+    )
+
+
+class UtilizationRollup(Base):
+    """min/avg/p95/max of one metric for one VM over a fixed time bucket"""
+
+    __tablename__ = "vm_utilization_rollups"
+
+    vm_id = Column(Integer, primary_key=True)
+    resolution = Column(String(4), primary_key=True)  # "5m" or "1h"
+    metric = Column(String(10), primary_key=True)
+    bucket_epoch = Column(BigInteger, primary_key=True)
+
+    count = Column(Integer, nullable=False)
+    min = Column(Float, nullable=False)
+    avg = Column(Float, nullable=False)
+    p95 = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+
+    __table_args__ = (Index("ix_vm_utilization_rollups_bucket", "bucket_epoch"),)
@@ -52,9 +52,14 @@ class VirtualMachine(Base):
     # Status tracking
     status = Column(Enum(VMStatus), default=VMStatus.DISCOVERED)
 
+    # Optimistic concurrency - bumped on every update, exposed as the ETag
+    version = Column(Integer, nullable=False, default=1)
+
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __mapper_args__ = {"version_id_col": version}
+
     def __repr__(self):
         return f"<VirtualMachine(name='{self.name}', status='{self.status}')>"
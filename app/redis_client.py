@@ -0,0 +1,44 @@
+"""
+Redis Client
+Shared connection pools for Redis
+"""
+
+import atexit
+import threading
+
+from app.config import settings
+from app.lazy import lazy_import
+
+redis = lazy_import("redis")
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_redis(url: str = None) -> "redis.Redis":
+    """
+    Return a process-wide Redis client for url (defaults to REDIS_URL).
+
+    Clients share one connection pool per URL, so callers should use this
+    instead of redis.from_url() on every call.
+    """
+    url = url or settings.REDIS_URL
+    client = _clients.get(url)
+    if client is None:
+        with _lock:
+            client = _clients.get(url)
+            if client is None:
+                client = redis.from_url(url)
+                _clients[url] = client
+    return client
+
+
+def reset_clients():
+    """Drop cached clients, e.g. after fork so children open their own sockets"""
+    with _lock:
+        _clients.clear()
+
+
+# redis is imported lazily, after this module, so interpreter shutdown tears
+# it down first; drop the clients while their connection code is still there
+atexit.register(reset_clients)
@@ -1 +1 @@
-from app.routers import health, migrations, tasks, vms
+from app.routers import capacity, health, metrics, migrations, tasks, vms
@@ -0,0 +1,61 @@
+"""
+Capacity Planning Router
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.database import get_read_db
+from app.schemas.capacity import (CapacityPlan, CapacityPlanRequest,
+                                  CapacityPlanResponse)
+from app.services.capacity import (STRATEGIES, NodeShape, plan_capacity,
+                                   workload_demands)
+
+router = APIRouter()
+
+
+@router.post("/plan", response_model=CapacityPlanResponse)
+async def plan_cluster_capacity(
+    request: CapacityPlanRequest, db: Session = Depends(get_read_db)
+):
+    """Bin-pack the workloads' pods onto each node shape"""
+    unknown = sorted(set(request.strategies) - set(STRATEGIES))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown strategies {unknown}, expected any of {list(STRATEGIES)}",
+        )
+
+    demands = workload_demands(
+        db,
+        migration_ids=request.migration_ids,
+        vm_ids=request.vm_ids,
+        include_hpa_max=request.include_hpa_max,
+    )
+    shapes = [NodeShape(**shape.model_dump()) for shape in request.node_shapes]
+    plans, recommended = plan_capacity(demands, shapes, request.strategies)
+
+    results = [
+        CapacityPlan(
+            node_shape=plan["shape"].name,
+            strategy=plan["strategy"],
+            nodes=plan["nodes"],
+            lower_bound_nodes=plan["lower_bound_nodes"],
+            pods=plan["pods"],
+            cpu_utilization=round(plan["cpu_utilization"], 4),
+            memory_utilization=round(plan["memory_utilization"], 4),
+            cost=(
+                None
+                if plan["shape"].cost is None
+                else plan["nodes"] * plan["shape"].cost
+            ),
+            unplaceable=plan["unplaceable"],
+        )
+        for plan in plans
+    ]
+    return CapacityPlanResponse(
+        workloads=len(demands["workloads"]),
+        pods=int(demands["pods"].sum()),
+        plans=results,
+        recommended=None if recommended is None else results[recommended],
+    )
@@ -2,13 +2,14 @@
 Health Check Router
 """
 
-import redis
-from fastapi import APIRouter, Depends
-from sqlalchemy import text
-from sqlalchemy.orm import Session
+from fastapi import APIRouter
 
-from app.config import settings
-from app.database import get_db
+from app.database import get_pool_stats
+from app.lazy import lazy_import
+from app.services.breakers import get_breakers
+from app.services.health import get_health_checker
+
+redis = lazy_import("redis")
 
 router = APIRouter()
 
@@ -20,50 +21,43 @@ async def health_check():
 
 
 @router.get("/health/detailed")
-async def detailed_health_check(db: Session = Depends(get_db)):
-    """Detailed health check with dependency status"""
-    health_status = {"status": "healthy", "service": "vmshift-api", "dependencies": {}}
+async def detailed_health_check():
+    """
+    Database, Redis, broker queue depth and worker liveness, checked
+    concurrently with per-check timeouts and cached for a few seconds
+    """
+    return {"service": "vmshift-api", **await get_health_checker().results()}
 
-    # Check database
-    try:
-        db.execute(text("SELECT 1"))
-        health_status["dependencies"]["database"] = {
-            "status": "healthy",
-            "type": "postgresql",
-        }
-    except Exception as e:
-        health_status["dependencies"]["database"] = {
-            "status": "unhealthy",
-            "error": str(e),
-        }
-        health_status["status"] = "degraded"
-
-    # Check Redis
-    try:
-        r = redis.from_url(settings.REDIS_URL)
-        r.ping()
-        health_status["dependencies"]["redis"] = {"status": "healthy", "type": "redis"}
-    except Exception as e:
-        health_status["dependencies"]["redis"] = {
-            "status": "unhealthy",
-            "error": str(e),
-        }
-        health_status["status"] = "degraded"
 
-    return health_status
+@router.get("/health/db-pool")
+async def db_pool_status():
+    """Connection pool statistics for this API process"""
+    return get_pool_stats()
 
 
 @router.get("/ready")
-async def readiness_check(db: Session = Depends(get_db)):
-    """Kubernetes readiness probe"""
-    try:
-        db.execute(text("SELECT 1"))
-        return {"ready": True}
-    except Exception:
-        return {"ready": False}
+async def readiness_check():
+    """Kubernetes readiness probe (cached database check)"""
+    result = await get_health_checker("readiness").results()
+    return {"ready": result["status"] == "healthy"}
 
 
 @router.get("/live")
 async def liveness_check():
     """Kubernetes liveness probe"""
     return {"alive": True}
+
+
+@router.get("/health/breakers")
+def circuit_breakers():
+    """Circuit breaker state per external endpoint, shared by all workers"""
+    try:
+        breakers = get_breakers().states()
+    except redis.RedisError as e:
+        return {"status": "unknown", "error": str(e), "breakers": []}
+    open_count = sum(1 for breaker in breakers if breaker["state"] != "closed")
+    return {
+        "status": "degraded" if open_count else "healthy",
+        "open": open_count,
+        "breakers": breakers,
+    }
@@ -0,0 +1,34 @@
+"""
+Metrics Router - Prometheus scrape endpoint
+"""
+
+from fastapi import APIRouter, Response
+
+from app.config import settings
+from app.metrics import QueueDepthCollector, render_metrics
+from app.redis_client import get_redis
+
+router = APIRouter()
+
+
+_queue_depth_collector = None
+
+
+def get_queue_depth_collector() -> QueueDepthCollector:
+    """Broker queue length collector, built on the first scrape"""
+    global _queue_depth_collector
+    if _queue_depth_collector is None:
+        # Celery is only loaded here, keeping it out of the API's startup
+        from app.celery_app import celery_queues
+
+        _queue_depth_collector = QueueDepthCollector(
+            lambda: get_redis(settings.CELERY_BROKER_URL), celery_queues()
+        )
+    return _queue_depth_collector
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for all API processes"""
+    body, content_type = render_metrics(extra_collectors=[get_queue_depth_collector()])
+    return Response(content=body, media_type=content_type)
@@ -2,41 +2,124 @@
 Migrations Router
 """
 
-from datetime import datetime
-from typing import List
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (APIRouter, BackgroundTasks, Depends, Header,
+                     HTTPException, Query, Response, status)
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.migration import Migration, MigrationStatus
+from app.models.types import decompress_text, gzip_bytes, raw_column
 from app.models.vm import VirtualMachine
-from app.schemas.migration import (MigrationArtifactsResponse, MigrationCreate,
-                                   MigrationResponse, MigrationStartRequest,
-                                   MigrationStartResponse, MigrationUpdate)
+from app.schemas.migration import (ArtifactDiffResponse,
+                                   ArtifactRevisionResponse,
+                                   ArtifactRevisionSummary,
+                                   BuildGroupsResponse,
+                                   MigrationArtifactsResponse,
+                                   MigrationBulkStartRequest,
+                                   MigrationBulkStartResponse, MigrationCreate,
+                                   MigrationEta, MigrationResponse,
+                                   MigrationStartRequest,
+                                   MigrationStartResponse,
+                                   MigrationTimelineResponse, MigrationUpdate,
+                                   StageDurationStatsResponse)
 from app.services.artifact_generator import ArtifactGenerator
-from app.tasks.migration_tasks import run_migration_task
+from app.services.build_cache import group_builds
+from app.services.compression import (GZIP, choose_encoding, compress,
+                                      get_precompressed_cache)
+from app.services.concurrency import compare_and_set, etag, if_match_satisfied
+from app.services.eta import get_eta_estimator
+from app.services.fingerprints import get_fingerprint_index
+from app.services.migration_events import (get_timeline, record_event,
+                                           stage_duration_stats)
+from app.services.outbox import dispatch_soon, enqueue_task
+from app.services.revisions import (diff_revisions, get_revision,
+                                    list_revisions, record_revision)
+from app.services.rightsizing import resources_for_vm
 
 router = APIRouter()
 
 
+def _with_eta(db: Session, migrations) -> List[MigrationResponse]:
+    etas = get_eta_estimator().estimate_many(db, migrations)
+    return [
+        MigrationResponse.model_validate(migration).model_copy(
+            update={"eta": MigrationEta(**eta) if eta else None}
+        )
+        for migration, eta in zip(migrations, etas)
+    ]
+
+
 @router.get("/", response_model=List[MigrationResponse])
 async def list_migrations(
     skip: int = 0,
     limit: int = 100,
     status_filter: MigrationStatus = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """List all migrations"""
     query = db.query(Migration)
     if status_filter:
         query = query.filter(Migration.status == status_filter)
     migrations = query.offset(skip).limit(limit).all()
-    return migrations
+    return _with_eta(db, migrations)
+
+
+@router.get("/stats/stage-durations", response_model=StageDurationStatsResponse)
+async def get_stage_duration_stats(
+    since_hours: float = Query(168, gt=0, le=24 * 365),
+    db: Session = Depends(get_read_db),
+):
+    """Stage duration percentiles across all migrations"""
+    since = datetime.now(timezone.utc) - timedelta(hours=since_hours)
+    return StageDurationStatsResponse(
+        since=since, stages=stage_duration_stats(db, since=since)
+    )
+
+
+@router.get("/build-groups", response_model=BuildGroupsResponse)
+async def get_build_groups(
+    builders: int = Query(1, ge=1, le=256),
+    status_filter: Optional[List[MigrationStatus]] = Query(None),
+    limit: int = Query(5000, le=50000),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Group migrations by identical cacheable image layers and spread the
+    groups over builders (default: pending and failed migrations)
+    """
+    statuses = status_filter or STARTABLE_STATUSES
+    migrations = (
+        db.query(Migration)
+        .filter(Migration.status.in_(statuses))
+        .order_by(Migration.id)
+        .limit(limit)
+        .all()
+    )
+    vm_ids = {migration.vm_id for migration in migrations}
+    vms = {
+        vm.id: vm
+        for vm in db.query(VirtualMachine).filter(VirtualMachine.id.in_(vm_ids))
+    }
+
+    def dockerfiles():
+        for migration in migrations:
+            if migration.dockerfile_content:
+                yield migration.id, migration.dockerfile_content
+            elif migration.vm_id in vms:
+                generator = ArtifactGenerator(migration, vms[migration.vm_id])
+                yield migration.id, generator.generate_dockerfile()
+
+    return BuildGroupsResponse(**group_builds(dockerfiles(), builders))
 
 
 @router.get("/{migration_id}", response_model=MigrationResponse)
-async def get_migration(migration_id: int, db: Session = Depends(get_db)):
+async def get_migration(
+    migration_id: int, response: Response, db: Session = Depends(get_read_db)
+):
     """Get a specific migration by ID"""
     migration = db.query(Migration).filter(Migration.id == migration_id).first()
     if not migration:
@@ -44,7 +127,8 @@ async def get_migration(migration_id: int, db: Session = Depends(get_db)):
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Migration with id {migration_id} not found",
         )
-    return migration
+    response.headers["ETag"] = etag(migration.version)
+    return _with_eta(db, [migration])[0]
 
 
 @router.post("/", response_model=MigrationResponse, status_code=status.HTTP_201_CREATED)
@@ -64,12 +148,9 @@ async def create_migration(
             detail=f"Virtual machine with id {migration_data.vm_id} not found",
         )
 
-    # Set default base image based on OS family
+    # Default base image from the VM's OS family and service fingerprints
     if not migration_data.base_image:
-        if vm.os_family == "windows":
-            migration_data.base_image = "mcr.microsoft.com/windows/servercore:ltsc2022"
-        else:
-            migration_data.base_image = "ubuntu:22.04"
+        migration_data.base_image = get_fingerprint_index().recommend(vm)["base_image"]
 
     migration = Migration(**migration_data.model_dump())
     db.add(migration)
@@ -80,9 +161,13 @@ async def create_migration(
 
 @router.put("/{migration_id}", response_model=MigrationResponse)
 async def update_migration(
-    migration_id: int, migration_update: MigrationUpdate, db: Session = Depends(get_db)
+    migration_id: int,
+    migration_update: MigrationUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
 ):
-    """Update a migration"""
+    """Update a migration (conditional when If-Match is sent)"""
     migration = db.query(Migration).filter(Migration.id == migration_id).first()
     if not migration:
         raise HTTPException(
@@ -90,12 +175,29 @@ async def update_migration(
             detail=f"Migration with id {migration_id} not found",
         )
 
+    if not if_match_satisfied(if_match, migration.version):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"Migration has changed, current ETag is {etag(migration.version)}",
+        )
+
     update_data = migration_update.model_dump(exclude_unset=True)
+    if update_data.get("status") not in (None, migration.status):
+        record_event(
+            db,
+            migration_id,
+            update_data["status"],
+            from_status=migration.status,
+            progress_percent=update_data.get("progress_percent"),
+            message=update_data.get("status_message"),
+        )
     for key, value in update_data.items():
         setattr(migration, key, value)
 
+    # The flush checks the version it read, see handle_stale_data
     db.commit()
     db.refresh(migration)
+    response.headers["ETag"] = etag(migration.version)
     return migration
 
 
@@ -120,8 +222,39 @@ async def delete_migration(migration_id: int, db: Session = Depends(get_db)):
     db.commit()
 
 
+STARTABLE_STATUSES = [MigrationStatus.PENDING, MigrationStatus.FAILED]
+ACTIVE_STATUSES = [
+    MigrationStatus.IN_PROGRESS,
+    MigrationStatus.GENERATING_ARTIFACTS,
+    MigrationStatus.BUILDING_IMAGE,
+    MigrationStatus.PUSHING_IMAGE,
+    MigrationStatus.DEPLOYING,
+]
+CANCEL_ATTEMPTS = 5
+
+
+def _queue_migration(db: Session, migration: Migration) -> str:
+    """Mark a migration started and record its task in the outbox"""
+    record_event(
+        db,
+        migration.id,
+        MigrationStatus.IN_PROGRESS,
+        from_status=migration.status,
+        progress_percent=0,
+        message="Migration started",
+    )
+    migration.status = MigrationStatus.IN_PROGRESS
+    migration.started_at = migration.stage_started_at = datetime.utcnow()
+    migration.progress_percent = 0
+    migration.status_message = "Migration started"
+    migration.celery_task_id = enqueue_task(db, "run_migration", [migration.id])
+    return migration.celery_task_id
+
+
 @router.post("/{migration_id}/start", response_model=MigrationStartResponse)
-async def start_migration(migration_id: int, db: Session = Depends(get_db)):
+async def start_migration(
+    migration_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)
+):
     """Start the migration process"""
     migration = db.query(Migration).filter(Migration.id == migration_id).first()
     if not migration:
@@ -130,57 +263,134 @@ async def start_migration(migration_id: int, db: Session = Depends(get_db)):
             detail=f"Migration with id {migration_id} not found",
         )
 
-    if migration.status not in [MigrationStatus.PENDING, MigrationStatus.FAILED]:
+    if migration.status not in STARTABLE_STATUSES:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Migration is already {migration.status}",
         )
 
-    # Update status and start time
-    migration.status = MigrationStatus.IN_PROGRESS
-    migration.started_at = datetime.utcnow()
-    migration.progress_percent = 0
-    migration.status_message = "Migration started"
-
-    # Queue the migration task
-    task = run_migration_task.delay(migration_id)
-    migration.celery_task_id = task.id
-
+    # The task is published only once this commit succeeds
+    task_id = _queue_migration(db, migration)
     db.commit()
+    background_tasks.add_task(dispatch_soon)
 
     return MigrationStartResponse(
         migration_id=migration_id,
-        task_id=task.id,
+        task_id=task_id,
         status="started",
         message="Migration task has been queued",
     )
 
 
+@router.post("/bulk-start", response_model=MigrationBulkStartResponse)
+async def bulk_start_migrations(
+    request: MigrationBulkStartRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    """Start many migrations in one transaction"""
+    migrations = db.query(Migration).filter(Migration.id.in_(request.migration_ids))
+    found = {m.id: m for m in migrations}
+
+    started, skipped = [], []
+    for migration_id in dict.fromkeys(request.migration_ids):
+        migration = found.get(migration_id)
+        if migration is None:
+            skipped.append({"migration_id": migration_id, "reason": "not found"})
+        elif migration.status not in STARTABLE_STATUSES:
+            skipped.append(
+                {
+                    "migration_id": migration_id,
+                    "reason": f"already {migration.status.value}",
+                }
+            )
+        else:
+            started.append(
+                MigrationStartResponse(
+                    migration_id=migration_id,
+                    task_id=_queue_migration(db, migration),
+                    status="started",
+                    message="Migration task has been queued",
+                )
+            )
+
+    db.commit()
+    if started:
+        background_tasks.add_task(dispatch_soon)
+
+    return MigrationBulkStartResponse(started=started, skipped=skipped)
+
+
 @router.post("/{migration_id}/cancel")
 async def cancel_migration(migration_id: int, db: Session = Depends(get_db)):
     """Cancel a running migration"""
-    migration = db.query(Migration).filter(Migration.id == migration_id).first()
-    if not migration:
+    # Workers keep writing progress; retry the compare-and-set rather than
+    # locking the row against them
+    for _ in range(CANCEL_ATTEMPTS):
+        migration = db.query(Migration).filter(Migration.id == migration_id).first()
+        if not migration:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Migration with id {migration_id} not found",
+            )
+
+        if migration.status not in ACTIVE_STATUSES:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Can only cancel migrations that are in progress",
+            )
+
+        if compare_and_set(
+            db,
+            Migration,
+            migration_id,
+            migration.version,
+            status=MigrationStatus.CANCELLED,
+            status_message="Migration cancelled by user",
+        ):
+            record_event(
+                db,
+                migration_id,
+                MigrationStatus.CANCELLED,
+                from_status=migration.status,
+                message="Migration cancelled by user",
+            )
+            db.commit()
+            return {"message": "Migration cancelled", "migration_id": migration_id}
+
+        db.rollback()
+
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Migration is being modified concurrently, try again",
+    )
+
+
+@router.get("/{migration_id}/timeline", response_model=MigrationTimelineResponse)
+async def get_migration_timeline(migration_id: int, db: Session = Depends(get_read_db)):
+    """Status transitions of a migration, oldest first"""
+    events = get_timeline(db, migration_id)
+    if not events and not db.get(Migration, migration_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Migration with id {migration_id} not found",
         )
 
-    if migration.status != MigrationStatus.IN_PROGRESS:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Can only cancel migrations that are in progress",
-        )
-
-    migration.status = MigrationStatus.CANCELLED
-    migration.status_message = "Migration cancelled by user"
-    db.commit()
-
-    return {"message": "Migration cancelled", "migration_id": migration_id}
+    stages = {}
+    for event in events:
+        if event.from_status and event.from_status_seconds is not None:
+            stages[event.from_status] = (
+                stages.get(event.from_status, 0.0) + event.from_status_seconds
+            )
+    return MigrationTimelineResponse(
+        migration_id=migration_id, events=events, stage_seconds=stages
+    )
 
 
 @router.get("/{migration_id}/artifacts", response_model=MigrationArtifactsResponse)
-async def get_migration_artifacts(migration_id: int, db: Session = Depends(get_db)):
+async def get_migration_artifacts(
+    migration_id: int, db: Session = Depends(get_read_db)
+):
     """Get generated artifacts for a migration"""
     migration = db.query(Migration).filter(Migration.id == migration_id).first()
     if not migration:
@@ -197,6 +407,143 @@ async def get_migration_artifacts(migration_id: int, db: Session = Depends(get_d
     )
 
 
+def _get_migration_or_404(db: Session, migration_id: int) -> Migration:
+    migration = db.get(Migration, migration_id)
+    if not migration:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Migration with id {migration_id} not found",
+        )
+    return migration
+
+
+@router.get("/{migration_id}/revisions", response_model=List[ArtifactRevisionSummary])
+async def get_artifact_revisions(migration_id: int, db: Session = Depends(get_read_db)):
+    """Stored artifact revisions of a migration, oldest first"""
+    revisions = list_revisions(db, migration_id)
+    if not revisions:
+        _get_migration_or_404(db, migration_id)
+    return revisions
+
+
+@router.get("/{migration_id}/revisions/diff", response_model=ArtifactDiffResponse)
+async def get_artifact_revision_diff(
+    migration_id: int,
+    from_revision: int = Query(..., ge=1),
+    to_revision: int = Query(..., ge=1),
+    db: Session = Depends(get_read_db),
+):
+    """Unified diffs of the artifacts that changed between two revisions"""
+    diffs = diff_revisions(db, migration_id, from_revision, to_revision)
+    if diffs is None:
+        _get_migration_or_404(db, migration_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Revision {from_revision} or {to_revision} not found",
+        )
+    return ArtifactDiffResponse(
+        migration_id=migration_id,
+        from_revision=from_revision,
+        to_revision=to_revision,
+        diffs=diffs,
+    )
+
+
+@router.get(
+    "/{migration_id}/revisions/{revision}", response_model=ArtifactRevisionResponse
+)
+async def get_artifact_revision(
+    migration_id: int, revision: int, db: Session = Depends(get_read_db)
+):
+    """Artifacts as they were at a revision"""
+    found = get_revision(db, migration_id, revision)
+    if found is None:
+        _get_migration_or_404(db, migration_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Revision {revision} of migration {migration_id} not found",
+        )
+    return ArtifactRevisionResponse(
+        migration_id=migration_id,
+        revision=found["revision"],
+        digest=found["digest"],
+        created_at=found["created_at"],
+        **found["artifacts"],
+    )
+
+
+# Artifact name -> (column, media type) for the per-artifact endpoint
+ARTIFACTS = {
+    "dockerfile": (Migration.dockerfile_content, "text/plain; charset=utf-8"),
+    "kubernetes_manifest": (
+        Migration.kubernetes_manifest,
+        "application/yaml; charset=utf-8",
+    ),
+    "docker_compose": (Migration.docker_compose, "application/yaml; charset=utf-8"),
+}
+
+
+@router.get("/{migration_id}/artifacts/{artifact}")
+async def get_migration_artifact(
+    migration_id: int,
+    artifact: str,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+):
+    """
+    One generated artifact as a file, negotiated by Accept-Encoding.
+
+    gzip is served from the stored stream without recompressing; other
+    codings come from a cache of precompressed bodies keyed by the
+    artifact's digest, which is also its ETag.
+    """
+    if artifact not in ARTIFACTS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown artifact '{artifact}', expected one of "
+            f"{', '.join(ARTIFACTS)}",
+        )
+    column, media_type = ARTIFACTS[artifact]
+    row = (
+        db.query(raw_column(column)).filter(Migration.id == migration_id).one_or_none()
+    )
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Migration with id {migration_id} not found",
+        )
+    stored = row[0]
+    if stored is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Artifact '{artifact}' has not been generated yet",
+        )
+
+    digest = hashlib.sha256(stored.encode()).hexdigest()[:32]
+    # Weak: the representations differ by coding but not by content
+    headers = {"ETag": f'W/"{digest}"', "Vary": "Accept-Encoding"}
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or digest in [tag.strip().strip('W/"') for tag in if_none_match.split(",")]
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    coding = choose_encoding(accept_encoding)
+    stream = gzip_bytes(stored)
+    if coding is None:
+        body = decompress_text(stored).encode()
+    elif coding == GZIP and stream is not None:
+        body = stream
+    else:
+        body = get_precompressed_cache().get(
+            digest, coding, lambda: compress(decompress_text(stored).encode(), coding)
+        )
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
 @router.post(
     "/{migration_id}/generate-artifacts", response_model=MigrationArtifactsResponse
 )
@@ -215,11 +562,20 @@ async def generate_migration_artifacts(
     vm = db.query(VirtualMachine).filter(VirtualMachine.id == migration.vm_id).first()
 
     # Generate artifacts
-    generator = ArtifactGenerator(migration, vm)
+    generator = ArtifactGenerator(migration, vm, resources_for_vm(db, vm))
 
     migration.dockerfile_content = generator.generate_dockerfile()
     migration.kubernetes_manifest = generator.generate_kubernetes_manifest()
     migration.docker_compose = generator.generate_docker_compose()
+    record_revision(
+        db,
+        migration_id,
+        {
+            "dockerfile": migration.dockerfile_content,
+            "kubernetes_manifest": migration.kubernetes_manifest,
+            "docker_compose": migration.docker_compose,
+        },
+    )
 
     db.commit()
 
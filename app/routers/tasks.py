@@ -1,18 +1,21 @@
 """
 Tasks Router - Celery task management
+
+Celery is imported inside the endpoints so it is not loaded at API startup.
 """
 
-from celery.result import AsyncResult
 from fastapi import APIRouter, HTTPException
 
-from app.celery_app import celery_app
-
 router = APIRouter()
 
 
 @router.get("/{task_id}")
 async def get_task_status(task_id: str):
     """Get the status of a Celery task"""
+    from celery.result import AsyncResult
+
+    from app.celery_app import celery_app
+
     task_result = AsyncResult(task_id, app=celery_app)
 
     response = {
@@ -36,6 +39,8 @@ async def get_task_status(task_id: str):
 @router.delete("/{task_id}")
 async def revoke_task(task_id: str, terminate: bool = False):
     """Revoke/cancel a Celery task"""
+    from app.celery_app import celery_app
+
     celery_app.control.revoke(task_id, terminate=terminate)
     return {
         "task_id": task_id,
@@ -44,23 +49,55 @@ async def revoke_task(task_id: str, terminate: bool = False):
 
 
 @router.get("/")
-async def list_active_tasks():
-    """List all active Celery tasks"""
-    inspector = celery_app.control.inspect()
+async def list_active_tasks(live: bool = False):
+    """
+    List all active Celery tasks.
+
+    Served from the event-driven worker snapshot; pass live=true to fall
+    back to a (slow) broadcast inspect of every worker.
+    """
+    from app.celery_app import celery_app
+    from app.services.worker_state import get_worker_monitor
+
+    if live:
+        inspector = celery_app.control.inspect()
 
-    active = inspector.active() or {}
-    scheduled = inspector.scheduled() or {}
-    reserved = inspector.reserved() or {}
+        active = inspector.active() or {}
+        scheduled = inspector.scheduled() or {}
+        reserved = inspector.reserved() or {}
 
-    return {"active": active, "scheduled": scheduled, "reserved": reserved}
+        return {"active": active, "scheduled": scheduled, "reserved": reserved}
+
+    monitor = get_worker_monitor()
+    return {
+        **monitor.tasks_by_worker(),
+        "queues": monitor.queues_snapshot(),
+        "snapshot": monitor.freshness(),
+    }
 
 
 @router.get("/workers/status")
-async def get_worker_status():
+async def get_worker_status(live: bool = False):
     """Get status of all Celery workers"""
-    inspector = celery_app.control.inspect()
+    from app.celery_app import celery_app
+    from app.services.worker_state import get_worker_monitor
+
+    if live:
+        inspector = celery_app.control.inspect()
 
-    stats = inspector.stats() or {}
-    ping = inspector.ping() or {}
+        stats = inspector.stats() or {}
+        ping = inspector.ping() or {}
 
-    return {"workers": list(stats.keys()), "stats": stats, "ping": ping}
+        return {"workers": list(stats.keys()), "stats": stats, "ping": ping}
+
+    monitor = get_worker_monitor()
+    workers = monitor.workers()
+    return {
+        "workers": [name for name, info in workers.items() if info["alive"]],
+        "stats": workers,
+        "ping": {
+            name: {"ok": "pong"} for name, info in workers.items() if info["alive"]
+        },
+        "queues": monitor.queues_snapshot(),
+        "snapshot": monitor.freshness(),
+    }
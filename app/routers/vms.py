@@ -2,16 +2,30 @@
 Virtual Machines Router
 """
 
-from typing import List
+import time
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (APIRouter, Depends, Header, HTTPException, Query,
+                     Response, status)
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.vm import VirtualMachine, VMStatus
-from app.schemas.vm import (VMCreate, VMDiscoveryRequest, VMDiscoveryResponse,
-                            VMResponse, VMUpdate)
-from app.tasks.vm_tasks import discover_vms_task
+from app.schemas.vm import (MigrationWave, UtilizationIngestRequest,
+                            UtilizationIngestResponse, UtilizationRollupPoint,
+                            UtilizationRollupResponse,
+                            VMContainerRecommendation, VMCreate,
+                            VMDependenciesResponse, VMDiscoveryRequest,
+                            VMDiscoveryResponse, VMResponse,
+                            VMRightSizingResponse, VMUpdate, WavePlanResponse)
+from app.services.concurrency import etag, if_match_satisfied
+from app.services.dependency_graph import (dependencies_of, get_graph_cache,
+                                           plan_waves)
+from app.services.fingerprints import get_fingerprint_index
+from app.services.rightsizing import recommend_observed
+from app.services.utilization import (METRICS, RESOLUTIONS, InvalidSeries,
+                                      ingest, pack_series, query_rollups)
 
 router = APIRouter()
 
@@ -21,7 +35,7 @@ async def list_virtual_machines(
     skip: int = 0,
     limit: int = 100,
     status_filter: VMStatus = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """List all discovered virtual machines"""
     query = db.query(VirtualMachine)
@@ -31,8 +45,140 @@ async def list_virtual_machines(
     return vms
 
 
+@router.get("/rightsizing", response_model=List[VMRightSizingResponse])
+async def get_rightsizing_recommendations(
+    skip: int = 0,
+    limit: int = Query(1000, le=100000),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Recommended container requests/limits from each VM's utilization
+    rollups, computed for the page at once
+    """
+    rows = db.execute(
+        select(
+            VirtualMachine.id,
+            VirtualMachine.name,
+            VirtualMachine.cpu_count,
+            VirtualMachine.memory_mb,
+        )
+        .order_by(VirtualMachine.id)
+        .offset(skip)
+        .limit(limit)
+    ).all()
+    if not rows:
+        return []
+
+    ids, names, cpus, memory = zip(*rows)
+    sizing = recommend_observed(db, ids, cpus, memory)
+    columns = {key: values.tolist() for key, values in sizing.items()}
+    return [
+        VMRightSizingResponse(
+            vm_id=vm_id,
+            name=name,
+            **{key: values[i] for key, values in columns.items()},
+        )
+        for i, (vm_id, name) in enumerate(zip(ids, names))
+    ]
+
+
+@router.get("/recommendations", response_model=List[VMContainerRecommendation])
+async def get_container_recommendations(
+    skip: int = 0,
+    limit: int = Query(1000, le=100000),
+    db: Session = Depends(get_read_db),
+):
+    """Base image and fingerprint rules for a page of the inventory"""
+    rows = db.execute(
+        select(
+            VirtualMachine.id,
+            VirtualMachine.name,
+            VirtualMachine.os_family,
+            VirtualMachine.discovered_services,
+            VirtualMachine.installed_software,
+        )
+        .order_by(VirtualMachine.id)
+        .offset(skip)
+        .limit(limit)
+    ).all()
+    recommendations = get_fingerprint_index().recommend_many(
+        (row.os_family, row.discovered_services, row.installed_software) for row in rows
+    )
+    return [
+        VMContainerRecommendation(
+            vm_id=row.id,
+            name=row.name,
+            base_image=recommendation["base_image"],
+            command=recommendation["command"],
+            rules=recommendation["rules"],
+        )
+        for row, recommendation in zip(rows, recommendations)
+    ]
+
+
+@router.get("/waves", response_model=WavePlanResponse)
+async def plan_migration_waves(
+    max_wave_size: int = Query(50, ge=1, le=10000),
+    datacenter: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
+    """Group VMs into ordered waves that keep network dependencies together"""
+    graph = get_graph_cache().get(db, datacenter)
+    plan = plan_waves(graph, max_wave_size)
+    return WavePlanResponse(
+        vms=graph.node_count,
+        edges=graph.edge_count,
+        components=plan["components"],
+        cyclic_groups=plan["cyclic_groups"],
+        max_wave_size=max_wave_size,
+        waves=[
+            MigrationWave(wave=number, **wave)
+            for number, wave in enumerate(plan["waves"], start=1)
+        ],
+    )
+
+
+@router.post("/utilization", response_model=UtilizationIngestResponse)
+async def ingest_utilization(
+    request: UtilizationIngestRequest, db: Session = Depends(get_db)
+):
+    """Store batched utilization samples, one packed chunk per series"""
+    vm_ids = {series.vm_id for series in request.series}
+    known = set(
+        db.execute(select(VirtualMachine.id).where(VirtualMachine.id.in_(vm_ids)))
+        .scalars()
+        .all()
+    )
+    missing = sorted(vm_ids - known)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Virtual machines not found: {missing}",
+        )
+
+    try:
+        rows = [
+            pack_series(
+                series.vm_id,
+                series.timestamps,
+                {metric: getattr(series, metric) for metric in METRICS},
+            )
+            for series in request.series
+        ]
+    except InvalidSeries as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        )
+
+    samples = ingest(db, rows)
+    db.commit()
+    return UtilizationIngestResponse(chunks=len(rows), samples=samples)
+
+
 @router.get("/{vm_id}", response_model=VMResponse)
-async def get_virtual_machine(vm_id: int, db: Session = Depends(get_db)):
+async def get_virtual_machine(
+    vm_id: int, response: Response, db: Session = Depends(get_read_db)
+):
     """Get a specific virtual machine by ID"""
     vm = db.query(VirtualMachine).filter(VirtualMachine.id == vm_id).first()
     if not vm:
@@ -40,6 +186,7 @@ async def get_virtual_machine(vm_id: int, db: Session = Depends(get_db)):
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Virtual machine with id {vm_id} not found",
         )
+    response.headers["ETag"] = etag(vm.version)
     return vm
 
 
@@ -59,15 +206,20 @@ async def create_virtual_machine(vm_data: VMCreate, db: Session = Depends(get_db
     vm = VirtualMachine(**vm_data.model_dump())
     db.add(vm)
     db.commit()
+    get_graph_cache().invalidate()
     db.refresh(vm)
     return vm
 
 
 @router.put("/{vm_id}", response_model=VMResponse)
 async def update_virtual_machine(
-    vm_id: int, vm_update: VMUpdate, db: Session = Depends(get_db)
+    vm_id: int,
+    vm_update: VMUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
 ):
-    """Update a virtual machine"""
+    """Update a virtual machine (conditional when If-Match is sent)"""
     vm = db.query(VirtualMachine).filter(VirtualMachine.id == vm_id).first()
     if not vm:
         raise HTTPException(
@@ -75,12 +227,20 @@ async def update_virtual_machine(
             detail=f"Virtual machine with id {vm_id} not found",
         )
 
+    if not if_match_satisfied(if_match, vm.version):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"Virtual machine has changed, current ETag is {etag(vm.version)}",
+        )
+
     update_data = vm_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(vm, key, value)
 
     db.commit()
+    get_graph_cache().invalidate()
     db.refresh(vm)
+    response.headers["ETag"] = etag(vm.version)
     return vm
 
 
@@ -96,11 +256,14 @@ async def delete_virtual_machine(vm_id: int, db: Session = Depends(get_db)):
 
     db.delete(vm)
     db.commit()
+    get_graph_cache().invalidate()
 
 
 @router.post("/discover", response_model=VMDiscoveryResponse)
 async def discover_virtual_machines(request: VMDiscoveryRequest):
     """Start VM discovery task from hypervisor"""
+    from app.tasks.vm_tasks import discover_vms_task
+
     # Queue the discovery task with Celery
     task = discover_vms_task.delay(
         hypervisor_type=request.hypervisor_type,
@@ -136,3 +299,47 @@ async def analyze_virtual_machine(vm_id: int, db: Session = Depends(get_db)):
         status="queued",
         message=f"Analysis task queued for VM {vm.name}",
     )
+
+
+@router.get("/{vm_id}/utilization", response_model=UtilizationRollupResponse)
+async def get_utilization_rollups(
+    vm_id: int,
+    resolution: str = Query("5m", pattern="^(5m|1h)$"),
+    metric: Optional[List[str]] = Query(None),
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+):
+    """Downsampled utilization of a VM (default: the last 288 buckets)"""
+    metrics = metric or list(METRICS)
+    unknown = sorted(set(metrics) - set(METRICS))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown metrics: {unknown}",
+        )
+    end = end if end is not None else int(time.time())
+    start = start if start is not None else end - 288 * RESOLUTIONS[resolution]
+
+    points = {name: [] for name in metrics}
+    for rollup in query_rollups(db, vm_id, resolution, start, end, metrics):
+        points[rollup.metric].append(UtilizationRollupPoint.model_validate(rollup))
+    return UtilizationRollupResponse(
+        vm_id=vm_id, resolution=resolution, start=start, end=end, metrics=points
+    )
+
+
+@router.get("/{vm_id}/dependencies", response_model=VMDependenciesResponse)
+async def get_vm_dependencies(vm_id: int, db: Session = Depends(get_read_db)):
+    """VMs this VM connects to and VMs connecting to it"""
+    if db.get(VirtualMachine, vm_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Virtual machine with id {vm_id} not found",
+        )
+    cache = get_graph_cache()
+    dependencies = dependencies_of(cache.get(db), vm_id)
+    if dependencies is None:
+        # Added since the cached build, e.g. by a discovery worker
+        dependencies = dependencies_of(cache.get(db, refresh=True), vm_id)
+    return VMDependenciesResponse(vm_id=vm_id, **dependencies)
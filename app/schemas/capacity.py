@@ -0,0 +1,58 @@
+"""
+Capacity Planning Schemas
+"""
+
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from app.services.capacity import STRATEGIES
+
+
+class NodeShapeSpec(BaseModel):
+    """Allocatable resources of a candidate node type"""
+
+    name: str
+    cpu_m: int = Field(..., gt=0, description="Allocatable CPU in millicores")
+    memory_mb: int = Field(..., gt=0, description="Allocatable memory in MiB")
+    max_pods: int = Field(default=110, ge=1)
+    cost: Optional[float] = Field(None, ge=0, description="Price per node")
+
+
+class CapacityPlanRequest(BaseModel):
+    """Workloads to place and node shapes to try"""
+
+    node_shapes: List[NodeShapeSpec] = Field(..., min_length=1)
+    migration_ids: Optional[List[int]] = Field(
+        None, description="Default: all planned migrations to cluster platforms"
+    )
+    vm_ids: Optional[List[int]] = Field(None, description="Planned as one replica")
+    include_hpa_max: bool = Field(
+        default=True, description="Size for the HPA's maximum replicas"
+    )
+    strategies: List[str] = Field(default=list(STRATEGIES))
+
+
+class CapacityPlan(BaseModel):
+    """Packing result for one node shape and strategy"""
+
+    node_shape: str
+    strategy: str
+    nodes: int
+    lower_bound_nodes: int
+    pods: int
+    cpu_utilization: float
+    memory_utilization: float
+    cost: Optional[float] = None
+    unplaceable: List[str] = Field(
+        default_factory=list, description="Workloads larger than the node"
+    )
+
+
+class CapacityPlanResponse(BaseModel):
+    """Packing results for every shape/strategy pair"""
+
+    workloads: int
+    pods: int
+    plans: List[CapacityPlan]
+    recommended: Optional[CapacityPlan] = None
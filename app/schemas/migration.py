@@ -3,7 +3,7 @@ Pydantic Schemas for Migrations
 """
 
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -39,6 +39,15 @@ class MigrationUpdate(BaseModel):
     error_message: Optional[str] = None
 
 
+class MigrationEta(BaseModel):
+    """Predicted time to completion from historical stage durations"""
+
+    seconds: float
+    estimated_completion_at: datetime
+    stddev_seconds: float
+    samples: int = Field(..., description="Fewest samples behind any stage used")
+
+
 class MigrationResponse(MigrationBase):
     """Schema for migration responses"""
 
@@ -55,10 +64,13 @@ class MigrationResponse(MigrationBase):
     image_name: Optional[str]
     image_tag: str
     celery_task_id: Optional[str]
+    version: int
     created_at: datetime
     updated_at: Optional[datetime]
     started_at: Optional[datetime]
+    stage_started_at: Optional[datetime] = None
     completed_at: Optional[datetime]
+    eta: Optional[MigrationEta] = None
 
     class Config:
         from_attributes = True
@@ -73,6 +85,35 @@ class MigrationArtifactsResponse(BaseModel):
     docker_compose: Optional[str]
 
 
+class ArtifactRevisionSummary(BaseModel):
+    """One stored artifact revision"""
+
+    revision: int
+    digest: str
+    is_keyframe: bool
+    created_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
+class ArtifactRevisionResponse(MigrationArtifactsResponse):
+    """Artifacts as of a revision"""
+
+    revision: int
+    digest: str
+    created_at: Optional[datetime]
+
+
+class ArtifactDiffResponse(BaseModel):
+    """Unified diff per artifact that changed between two revisions"""
+
+    migration_id: int
+    from_revision: int
+    to_revision: int
+    diffs: Dict[str, str]
+
+
 class MigrationStartRequest(BaseModel):
     """Request to start a migration"""
 
@@ -86,3 +127,74 @@ class MigrationStartResponse(BaseModel):
     task_id: str
     status: str
     message: str
+
+
+class MigrationBulkStartRequest(BaseModel):
+    """Request to start several migrations at once"""
+
+    migration_ids: List[int] = Field(..., min_length=1, max_length=10000)
+
+
+class MigrationBulkStartResponse(BaseModel):
+    """Response from a bulk start"""
+
+    started: List[MigrationStartResponse]
+    skipped: List[dict]
+
+
+class MigrationEventResponse(BaseModel):
+    """A single status transition"""
+
+    status: str
+    from_status: Optional[str]
+    from_status_seconds: Optional[float]
+    progress_percent: Optional[int]
+    message: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class MigrationTimelineResponse(BaseModel):
+    """Status history of a migration"""
+
+    migration_id: int
+    events: List[MigrationEventResponse]
+    stage_seconds: Dict[str, float]
+
+
+class StageDurationStatsResponse(BaseModel):
+    """Stage duration statistics across migrations"""
+
+    since: datetime
+    stages: Dict[str, Dict[str, float]]
+
+
+class BuildGroup(BaseModel):
+    """Migrations whose images share their cacheable base layers"""
+
+    digest: str
+    base_images: List[str]
+    shared_layers: int
+    migration_ids: List[int]
+    builder: int
+
+
+class BuilderAssignment(BaseModel):
+    """Build groups scheduled on one builder"""
+
+    builder: int
+    migrations: int
+    groups: List[str]
+
+
+class BuildGroupsResponse(BaseModel):
+    """Image builds grouped for layer cache reuse"""
+
+    migrations: int
+    cache_hit_ratio: float = Field(
+        ..., description="Share of builds that start from an already cached prefix"
+    )
+    groups: List[BuildGroup]
+    builders: List[BuilderAssignment]
@@ -56,6 +56,7 @@ class VMResponse(VMBase):
     network_config: Optional[Dict[str, Any]]
     discovered_services: Optional[List[str]]
     installed_software: Optional[List[str]]
+    version: int
     created_at: datetime
     updated_at: Optional[datetime]
 
@@ -79,3 +80,102 @@ class VMDiscoveryResponse(BaseModel):
     task_id: str
     status: str
     message: str
+
+
+class VMRightSizingResponse(BaseModel):
+    """Recommended container resources for a VM"""
+
+    vm_id: int
+    name: str
+    cpu_request_m: int
+    cpu_limit_m: int
+    memory_request_mb: int
+    memory_limit_mb: int
+    observed: bool = Field(..., description="Based on utilization data")
+
+
+class VMContainerRecommendation(BaseModel):
+    """Base image and matched fingerprint rules for a VM"""
+
+    vm_id: int
+    name: str
+    base_image: Optional[str]
+    command: Optional[str]
+    rules: List[str]
+
+
+class UtilizationSeries(BaseModel):
+    """Samples for one VM, as parallel arrays"""
+
+    vm_id: int
+    timestamps: List[float] = Field(..., description="Unix epoch seconds")
+    cpu: Optional[List[float]] = None
+    memory: Optional[List[float]] = None
+    disk: Optional[List[float]] = None
+    network: Optional[List[float]] = None
+
+
+class UtilizationIngestRequest(BaseModel):
+    """Batch of utilization samples for one or more VMs"""
+
+    series: List[UtilizationSeries]
+
+
+class UtilizationIngestResponse(BaseModel):
+    """Result of a utilization ingest"""
+
+    chunks: int
+    samples: int
+
+
+class UtilizationRollupPoint(BaseModel):
+    """Aggregates of one metric over a bucket"""
+
+    bucket_epoch: int
+    count: int
+    min: float
+    avg: float
+    p95: float
+    max: float
+
+    class Config:
+        from_attributes = True
+
+
+class UtilizationRollupResponse(BaseModel):
+    """Downsampled utilization of a VM"""
+
+    vm_id: int
+    resolution: str
+    start: int
+    end: int
+    metrics: Dict[str, List[UtilizationRollupPoint]]
+
+
+class VMDependenciesResponse(BaseModel):
+    """Direct network dependencies of a VM"""
+
+    vm_id: int
+    depends_on: List[int] = Field(..., description="VMs this VM connects to")
+    dependents: List[int] = Field(..., description="VMs connecting to this VM")
+
+
+class MigrationWave(BaseModel):
+    """One batch of VMs to migrate together"""
+
+    wave: int
+    vm_ids: List[int]
+    oversized: bool = Field(
+        default=False, description="A dependency cycle larger than the wave size"
+    )
+
+
+class WavePlanResponse(BaseModel):
+    """Dependency-aware migration waves"""
+
+    vms: int
+    edges: int
+    components: int
+    cyclic_groups: int
+    max_wave_size: int
+    waves: List[MigrationWave]
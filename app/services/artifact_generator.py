@@ -6,15 +6,32 @@ Generates Dockerfiles, Kubernetes manifests, and Docker Compose files
 import json
 from typing import Optional
 
-import yaml
+from app.lazy import lazy_import
+from app.services.fingerprints import get_fingerprint_index
+from app.services.rightsizing import recommend_for_vm
+
+yaml = lazy_import("yaml")
+
+# The generated HPA scales up to this many times the requested replicas
+HPA_MAX_REPLICAS_FACTOR = 3
 
 
 class ArtifactGenerator:
     """Generates container artifacts from VM configuration"""
 
-    def __init__(self, migration, vm):
+    def __init__(self, migration, vm, resources: Optional[dict] = None):
         self.migration = migration
         self.vm = vm
+        # Kubernetes resources block; right-sized from VM specs if not given
+        self.resources = resources
+        self._recommendation = None
+
+    @property
+    def recommendation(self) -> dict:
+        """Base image, command, packages and Dockerfile sections for the VM's services"""
+        if self._recommendation is None:
+            self._recommendation = get_fingerprint_index().recommend(self.vm)
+        return self._recommendation
 
     def generate_dockerfile(self) -> str:
         """Generate Dockerfile based on VM configuration"""
@@ -24,49 +41,47 @@ class ArtifactGenerator:
         else:
             return self._generate_linux_dockerfile()
 
-    def _generate_windows_dockerfile(self) -> str:
-        """Generate Dockerfile for Windows workloads"""
-        base_image = (
-            self.migration.base_image or "mcr.microsoft.com/windows/servercore:ltsc2022"
+    def _build_stages(self, base_image: str) -> str:
+        """Builder stages placed ahead of the final image"""
+        stages = [
+            stage.replace("{base_image}", base_image)
+            for stage in self.recommendation["build_stage"]
+        ]
+        return "".join(stage + "\n" for stage in stages)
+
+    def _layers(self) -> str:
+        """
+        Sections ordered from least to most frequently changing, so an
+        application change only rebuilds the final COPY layers
+        """
+        recommendation = self.recommendation
+        return "".join(
+            recommendation["setup"]
+            + recommendation["dependencies"]
+            + recommendation["source"]
         )
 
-        services = self.vm.discovered_services or []
+    def _generate_windows_dockerfile(self) -> str:
+        """Generate Dockerfile for Windows workloads"""
+        recommendation = self.recommendation
+        base_image = self.migration.base_image or recommendation["base_image"]
 
         dockerfile = f"""# Auto-generated Dockerfile for {self.vm.name}
 # Windows Container - Generated by VMShift
 
-FROM {base_image}
+{self._build_stages(base_image)}FROM {base_image}
 
 # Set shell to PowerShell
 SHELL ["powershell", "-Command", "$ErrorActionPreference = 'Stop';"]
-
-# Install required Windows features
 """
 
-        if "IIS" in services:
-            dockerfile += """
-# Install IIS
-RUN Install-WindowsFeature -Name Web-Server, Web-Asp-Net45, Web-Http-Logging -IncludeManagementTools
-
-# Copy application files
-COPY ./app /inetpub/wwwroot
-
-# Configure IIS
-RUN Remove-Website -Name 'Default Web Site'; \\
-    New-Website -Name 'app' -Port 80 -PhysicalPath 'C:\\inetpub\\wwwroot'
-
-EXPOSE 80
+        if recommendation["packages"]:
+            dockerfile += f"""
+# Install required Windows features
+RUN Install-WindowsFeature -Name {", ".join(recommendation["packages"])} -IncludeManagementTools
 """
 
-        if ".NET Core" in services or "ASP.NET" in services:
-            dockerfile += """
-# Install .NET Runtime
-RUN Invoke-WebRequest -Uri 'https://dot.net/v1/dotnet-install.ps1' -OutFile 'dotnet-install.ps1'; \\
-    ./dotnet-install.ps1 -Channel 6.0 -Runtime aspnetcore -InstallDir '/dotnet'
-
-ENV DOTNET_ROOT="C:\\dotnet"
-ENV PATH="$PATH;C:\\dotnet"
-"""
+        dockerfile += self._layers()
 
         dockerfile += f"""
 # Health check
@@ -77,61 +92,37 @@ HEALTHCHECK --interval=30s --timeout=10s --retries=3 \\
 EXPOSE {self.migration.container_port or 80}
 
 # Start command
-CMD ["powershell", "-NoExit", "-Command", "Start-Service W3SVC; while ($true) {{ Start-Sleep -Seconds 3600 }}"]
+CMD {recommendation["command"]}
 """
 
         return dockerfile
 
     def _generate_linux_dockerfile(self) -> str:
         """Generate Dockerfile for Linux workloads"""
-        base_image = self.migration.base_image or "ubuntu:22.04"
-
-        services = self.vm.discovered_services or []
+        recommendation = self.recommendation
+        base_image = self.migration.base_image or recommendation["base_image"]
 
         dockerfile = f"""# Auto-generated Dockerfile for {self.vm.name}
 # Linux Container - Generated by VMShift
 
-FROM {base_image}
+{self._build_stages(base_image)}FROM {base_image}
 
 # Set environment variables
 ENV DEBIAN_FRONTEND=noninteractive
 ENV APP_HOME=/app
-
-# Install base packages
-RUN apt-get update && apt-get install -y \\
-    curl \\
-    wget \\
-    ca-certificates \\
-    && rm -rf /var/lib/apt/lists/*
-
 """
 
-        if "nginx" in services:
-            dockerfile += """
-# Install nginx
-RUN apt-get update && apt-get install -y nginx \\
-    && rm -rf /var/lib/apt/lists/*
-
-COPY ./nginx.conf /etc/nginx/nginx.conf
-COPY ./app /var/www/html
-
-EXPOSE 80
+        if recommendation["packages"]:
+            packages = "".join(
+                f"    {package} \\\n" for package in recommendation["packages"]
+            )
+            dockerfile += f"""
+# Install all system packages in one layer
+RUN apt-get update && apt-get install -y --no-install-recommends \\
+{packages}    && rm -rf /var/lib/apt/lists/*
 """
 
-        if "Python Flask" in services or "Python" in services:
-            dockerfile += """
-# Install Python
-RUN apt-get update && apt-get install -y \\
-    python3 \\
-    python3-pip \\
-    && rm -rf /var/lib/apt/lists/*
-
-WORKDIR /app
-COPY requirements.txt .
-RUN pip3 install --no-cache-dir -r requirements.txt
-
-COPY ./app /app
-"""
+        dockerfile += self._layers()
 
         dockerfile += f"""
 # Health check
@@ -141,7 +132,7 @@ HEALTHCHECK --interval=30s --timeout=10s --retries=3 \\
 EXPOSE {self.migration.container_port or 80}
 
 # Default command
-CMD ["python3", "app.py"]
+CMD {recommendation["command"]}
 """
 
         return dockerfile
@@ -154,6 +145,7 @@ CMD ["python3", "app.py"]
         image = f"{self.migration.registry_url or 'registry.example.com'}/{self.migration.image_name or app_name}:{self.migration.image_tag or 'latest'}"
         port = self.migration.container_port or 80
         replicas = self.migration.replicas or 1
+        resources = self.resources or recommend_for_vm(self.vm)
 
         # Deployment
         deployment = {
@@ -175,16 +167,7 @@ CMD ["python3", "app.py"]
                                 "name": app_name,
                                 "image": image,
                                 "ports": [{"containerPort": port}],
-                                "resources": {
-                                    "requests": {
-                                        "memory": f"{self.vm.memory_mb or 512}Mi",
-                                        "cpu": f"{(self.vm.cpu_count or 1) * 250}m",
-                                    },
-                                    "limits": {
-                                        "memory": f"{(self.vm.memory_mb or 512) * 2}Mi",
-                                        "cpu": f"{self.vm.cpu_count or 1}",
-                                    },
-                                },
+                                "resources": resources,
                                 "livenessProbe": {
                                     "httpGet": {"path": "/health", "port": port},
                                     "initialDelaySeconds": 30,
@@ -226,7 +209,7 @@ CMD ["python3", "app.py"]
                     "name": app_name,
                 },
                 "minReplicas": replicas,
-                "maxReplicas": replicas * 3,
+                "maxReplicas": replicas * HPA_MAX_REPLICAS_FACTOR,
                 "metrics": [
                     {
                         "type": "Resource",
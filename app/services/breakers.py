@@ -0,0 +1,279 @@
+"""
+Circuit Breakers
+Shared per-endpoint failure state (hypervisor host, registry, cluster) so
+that once an endpoint is failing, every worker stops calling it for a
+cooldown instead of each burning its own retries.
+
+A breaker opens after BREAKER_FAILURE_THRESHOLD failures within
+BREAKER_WINDOW_SECONDS. While open, calls fail fast with BreakerOpen,
+which tasks handle like Throttled: they retry after the cooldown. Once the
+cooldown has passed one probe call is let through. Its success closes the
+breaker; failure reopens it with twice the cooldown, up to
+BREAKER_MAX_COOLDOWN_SECONDS. Successful calls while the breaker is closed
+do not reset the failure count, which only expires with its window.
+
+Calls that fail but leave the breaker closed are retried in-process with
+full-jitter exponential backoff (call_with_retry).
+"""
+
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Callable, List
+
+from app.config import settings
+from app.lazy import lazy_import
+from app.redis_client import get_redis
+from app.services.throttle import Throttled
+
+redis = lazy_import("redis")
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = "breakers"
+
+_NOW = """
+if redis.replicate_commands then redis.replicate_commands() end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+"""
+
+# KEYS: breaker hash; ARGV: probe timeout ms
+# Returns {1, 0} if the call may proceed, else {0, ms until it may}
+_ALLOW = (
+    _NOW
+    + """
+if redis.call('HGET', KEYS[1], 'state') ~= 'open' then
+    return {1, 0}
+end
+local open_until = tonumber(redis.call('HGET', KEYS[1], 'open_until'))
+if now < open_until then
+    return {0, open_until - now}
+end
+local probe_until = tonumber(redis.call('HGET', KEYS[1], 'probe_until') or '0')
+if now < probe_until then
+    return {0, probe_until - now}
+end
+redis.call('HSET', KEYS[1], 'probe_until', now + tonumber(ARGV[1]))
+return {1, 0}
+"""
+)
+
+# KEYS: breaker hash, index set; ARGV: member, threshold, window ms,
+# cooldown ms, max cooldown ms
+# Returns the cooldown in ms if the breaker (re)opened, else 0
+_FAILURE = (
+    _NOW
+    + """
+local threshold, window = tonumber(ARGV[2]), tonumber(ARGV[3])
+local cooldown, max_cooldown = tonumber(ARGV[4]), tonumber(ARGV[5])
+redis.call('SADD', KEYS[2], ARGV[1])
+local state = redis.call('HGET', KEYS[1], 'state')
+if state == 'open' then
+    -- Only a failed probe reopens; calls started before opening don't count
+    if tonumber(redis.call('HGET', KEYS[1], 'probe_until') or '0') == 0 then
+        return 0
+    end
+    local opens = redis.call('HINCRBY', KEYS[1], 'opens', 1)
+    cooldown = math.min(cooldown * 2 ^ (opens - 1), max_cooldown)
+else
+    local started = tonumber(redis.call('HGET', KEYS[1], 'window_start') or '0')
+    if now - started > window then
+        redis.call('HSET', KEYS[1], 'failures', 0, 'window_start', now)
+    end
+    local failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+    redis.call('PEXPIRE', KEYS[1], window)
+    if failures < threshold then
+        return 0
+    end
+    redis.call('HSET', KEYS[1], 'opens', 1)
+end
+redis.call('HSET', KEYS[1], 'state', 'open', 'open_until', now + cooldown,
+    'probe_until', 0)
+redis.call('PEXPIRE', KEYS[1], math.floor(cooldown + max_cooldown * 2))
+return cooldown
+"""
+)
+
+# KEYS: breaker hash. Only a probe's success closes the breaker and clears
+# its history. Successes while closed leave the failure count to age out
+# with its window, so intermittent failures still add up to the threshold.
+# Returns 1 if the breaker closed
+_SUCCESS = """
+if redis.call('HGET', KEYS[1], 'state') ~= 'open'
+    or tonumber(redis.call('HGET', KEYS[1], 'probe_until') or '0') == 0 then
+    return 0
+end
+return redis.call('DEL', KEYS[1])
+"""
+
+
+class BreakerOpen(Throttled):
+    """An endpoint's breaker is open; calls fail fast until it may close"""
+
+    def __str__(self):
+        return (
+            f"{self.kind} {self.target} is unavailable (circuit open), "
+            f"retry in {self.retry_after:.1f}s"
+        )
+
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^n)]"""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class CircuitBreakers:
+    """Breaker state per (kind, target) in Redis hashes"""
+
+    def __init__(
+        self,
+        redis_client,
+        failure_threshold: int = 5,
+        window_seconds: float = 60.0,
+        cooldown_seconds: float = 30.0,
+        max_cooldown_seconds: float = 600.0,
+    ):
+        self.redis = redis_client
+        self.failure_threshold = failure_threshold
+        self.window_ms = int(window_seconds * 1000)
+        self.cooldown_ms = int(cooldown_seconds * 1000)
+        self.max_cooldown_ms = int(max_cooldown_seconds * 1000)
+        self._allow = redis_client.register_script(_ALLOW)
+        self._failure = redis_client.register_script(_FAILURE)
+        self._success = redis_client.register_script(_SUCCESS)
+
+    @staticmethod
+    def key(kind: str, target: str) -> str:
+        return f"breaker:{kind}:{target}"
+
+    def check(self, kind: str, target: str):
+        """Raise BreakerOpen unless a call to the target may proceed"""
+        try:
+            allowed, wait_ms = self._allow(
+                keys=[self.key(kind, target)], args=[self.cooldown_ms]
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Breaker state unavailable for {kind} {target}: {e}")
+            return
+        if not allowed:
+            raise BreakerOpen(kind, target, int(wait_ms) / 1000)
+
+    def record_failure(self, kind: str, target: str):
+        try:
+            opened_ms = self._failure(
+                keys=[self.key(kind, target), INDEX_KEY],
+                args=[
+                    f"{kind}:{target}",
+                    self.failure_threshold,
+                    self.window_ms,
+                    self.cooldown_ms,
+                    self.max_cooldown_ms,
+                ],
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Could not record failure of {kind} {target}: {e}")
+            return
+        if opened_ms:
+            logger.warning(
+                f"Circuit opened for {kind} {target} for {int(opened_ms) / 1000:.0f}s"
+            )
+
+    def record_success(self, kind: str, target: str):
+        try:
+            if self._success(keys=[self.key(kind, target)]):
+                logger.info(f"Circuit closed for {kind} {target}")
+        except redis.RedisError as e:
+            logger.warning(f"Could not record success of {kind} {target}: {e}")
+
+    @contextmanager
+    def guard(self, kind: str, target: str):
+        """Fail fast if open; record the block's outcome otherwise"""
+        self.check(kind, target)
+        try:
+            yield
+        except Exception:
+            self.record_failure(kind, target)
+            raise
+        self.record_success(kind, target)
+
+    def states(self) -> List[dict]:
+        """Current state of every breaker that has recorded a failure"""
+        members = sorted(m.decode() for m in self.redis.smembers(INDEX_KEY))
+        pipe = self.redis.pipeline(transaction=False)
+        for member in members:
+            pipe.hgetall(f"breaker:{member}")
+        now_ms = time.time() * 1000
+        states, expired = [], []
+        for member, fields in zip(members, pipe.execute()):
+            if not fields:
+                expired.append(member)
+                continue
+            fields = {k.decode(): v.decode() for k, v in fields.items()}
+            kind, _, target = member.partition(":")
+            is_open = fields.get("state") == "open"
+            retry_after = (float(fields.get("open_until", 0)) - now_ms) / 1000
+            states.append(
+                {
+                    "kind": kind,
+                    "target": target,
+                    "state": (
+                        ("open" if retry_after > 0 else "half_open")
+                        if is_open
+                        else "closed"
+                    ),
+                    "failures": int(fields.get("failures", 0)),
+                    "retry_after": max(retry_after, 0.0) if is_open else 0.0,
+                }
+            )
+        if expired:
+            self.redis.srem(INDEX_KEY, *expired)
+        return states
+
+
+_breakers = None
+
+
+def get_breakers() -> CircuitBreakers:
+    global _breakers
+    if _breakers is None:
+        _breakers = CircuitBreakers(
+            get_redis(),
+            settings.BREAKER_FAILURE_THRESHOLD,
+            settings.BREAKER_WINDOW_SECONDS,
+            settings.BREAKER_COOLDOWN_SECONDS,
+            settings.BREAKER_MAX_COOLDOWN_SECONDS,
+        )
+    return _breakers
+
+
+def call_with_retry(
+    fn: Callable, kind: str, target, attempts: int = None, sleep=time.sleep
+):
+    """
+    Call fn through the target's breaker, retrying failures with backoff.
+
+    BreakerOpen is raised at once, whether the breaker was already open or
+    opened by one of these attempts; the last failure is re-raised when
+    attempts run out.
+    """
+    attempts = attempts or settings.STAGE_RETRY_ATTEMPTS
+    breakers = get_breakers()
+    target = str(target or "default").lower()
+    for attempt in range(attempts):
+        try:
+            with breakers.guard(kind, target):
+                return fn()
+        except BreakerOpen:
+            raise
+        except Exception as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff(
+                attempt,
+                settings.STAGE_RETRY_BASE_SECONDS,
+                settings.STAGE_RETRY_MAX_SECONDS,
+            )
+            logger.info(f"{kind} {target} call failed ({e}), retrying in {delay:.1f}s")
+            sleep(delay)
@@ -0,0 +1,103 @@
+"""
+Build Cache Grouping
+Groups Dockerfiles by the layers they can share in a builder's cache and
+spreads the groups over builders, so images with identical base layers
+are built on the same machine.
+
+A layer's cache key is its parent's key plus the instruction; COPY/ADD
+also hash the copied files, which differ per application. Each stage's
+shareable prefix is therefore every instruction before its first COPY/ADD.
+"""
+
+import hashlib
+import heapq
+from typing import Dict, Iterable, List, Tuple
+
+SOURCE_INSTRUCTIONS = ("COPY", "ADD")
+
+
+def parse_stages(dockerfile: str) -> List[List[str]]:
+    """Instructions per stage, continuation lines joined and comments dropped"""
+    stages, instruction = [], ""
+    for line in dockerfile.splitlines():
+        stripped = line.strip()
+        if not instruction and (not stripped or stripped.startswith("#")):
+            continue
+        if stripped.endswith("\\"):
+            instruction += stripped[:-1].strip() + " "
+            continue
+        instruction = " ".join((instruction + stripped).split())
+        if instruction:
+            if instruction.upper().startswith("FROM ") or not stages:
+                stages.append([])
+            stages[-1].append(instruction)
+        instruction = ""
+    return stages
+
+
+def shared_prefix(dockerfile: str) -> List[List[str]]:
+    """Per-stage instructions before the first file copy"""
+    prefixes = []
+    for stage in parse_stages(dockerfile):
+        prefix = []
+        for instruction in stage:
+            if instruction.split(" ", 1)[0].upper() in SOURCE_INSTRUCTIONS:
+                break
+            prefix.append(instruction)
+        prefixes.append(prefix)
+    return prefixes
+
+
+def cache_key(dockerfile: str) -> Tuple[str, dict]:
+    """Digest of the shareable layers and a description of them"""
+    prefixes = shared_prefix(dockerfile)
+    digest = hashlib.sha256(
+        "\0".join("\n".join(prefix) for prefix in prefixes).encode()
+    ).hexdigest()[:16]
+    return digest, {
+        "base_images": [
+            prefix[0].split()[1]
+            for prefix in prefixes
+            if prefix and prefix[0].upper().startswith("FROM ")
+        ],
+        "shared_layers": sum(len(prefix) for prefix in prefixes),
+    }
+
+
+def group_builds(items: Iterable[Tuple[int, str]], builders: int = 1) -> dict:
+    """
+    Group (migration_id, dockerfile) pairs by shareable layers and assign
+    whole groups to builders, largest first onto the least loaded builder.
+
+    The first build in each group populates the cache; the rest reuse it,
+    which is reported as cache_hit_ratio.
+    """
+    groups: Dict[str, dict] = {}
+    for migration_id, dockerfile in items:
+        digest, description = cache_key(dockerfile)
+        group = groups.setdefault(digest, {"digest": digest, **description})
+        group.setdefault("migration_ids", []).append(migration_id)
+
+    ordered = sorted(
+        groups.values(), key=lambda g: (-len(g["migration_ids"]), g["digest"])
+    )
+    builders = max(builders, 1)
+    loads = [(0, builder) for builder in range(builders)]
+    assignments = [
+        {"builder": builder, "migrations": 0, "groups": []}
+        for builder in range(builders)
+    ]
+    for group in ordered:
+        load, builder = heapq.heappop(loads)
+        group["builder"] = builder
+        assignments[builder]["migrations"] += len(group["migration_ids"])
+        assignments[builder]["groups"].append(group["digest"])
+        heapq.heappush(loads, (load + len(group["migration_ids"]), builder))
+
+    total = sum(len(group["migration_ids"]) for group in ordered)
+    return {
+        "migrations": total,
+        "cache_hit_ratio": (total - len(ordered)) / total if total else 0.0,
+        "groups": ordered,
+        "builders": assignments,
+    }
@@ -0,0 +1,279 @@
+"""
+Cluster Capacity Planning
+Bin-packs the pods of migrated workloads onto candidate node shapes to
+estimate how many nodes a target cluster needs.
+
+Pods of one workload are identical, and right-sized requests are rounded
+to allocation steps, so the fleet collapses into a few hundred distinct
+pod sizes. Each size is placed in bulk: how many copies fit on every open
+node is computed as an array, and a cumulative sum hands them out. This
+is exactly first-fit/best-fit decreasing, at the cost of one pass over the
+open nodes per pod size instead of per pod.
+"""
+
+import math
+from typing import List, Optional
+
+from sqlalchemy import select
+
+from app.lazy import lazy_import
+from app.models.migration import Migration, MigrationStatus, TargetPlatform
+from app.models.vm import VirtualMachine
+from app.services.artifact_generator import HPA_MAX_REPLICAS_FACTOR
+from app.services.rightsizing import RightSizingPolicy, recommend_observed
+
+np = lazy_import("numpy")
+
+FIRST_FIT = "first_fit_decreasing"
+BEST_FIT = "best_fit_decreasing"
+STRATEGIES = (FIRST_FIT, BEST_FIT)
+
+# Targets that run the generated Deployments
+CLUSTER_PLATFORMS = [
+    TargetPlatform.KUBERNETES,
+    TargetPlatform.OPENSHIFT,
+    TargetPlatform.EKS,
+    TargetPlatform.AKS,
+]
+PLANNED_STATUSES = [
+    MigrationStatus.PENDING,
+    MigrationStatus.IN_PROGRESS,
+    MigrationStatus.GENERATING_ARTIFACTS,
+    MigrationStatus.BUILDING_IMAGE,
+    MigrationStatus.PUSHING_IMAGE,
+    MigrationStatus.DEPLOYING,
+]
+
+
+class NodeShape:
+    """Allocatable resources of one node type"""
+
+    def __init__(
+        self,
+        name: str,
+        cpu_m: int,
+        memory_mb: int,
+        max_pods: int = 110,
+        cost: Optional[float] = None,
+    ):
+        self.name = name
+        self.cpu_m = cpu_m
+        self.memory_mb = memory_mb
+        self.max_pods = max_pods
+        self.cost = cost
+
+
+def workload_demands(
+    db,
+    migration_ids: Optional[List[int]] = None,
+    vm_ids: Optional[List[int]] = None,
+    include_hpa_max: bool = True,
+    policy: Optional[RightSizingPolicy] = None,
+) -> dict:
+    """
+    Per-workload pod requests and pod counts.
+
+    Migrations contribute their replicas (times the HPA ceiling when
+    include_hpa_max); bare VMs count as one replica. Without ids, every
+    planned migration to a cluster platform is used.
+    """
+    rows = []
+    if migration_ids is not None or vm_ids is None:
+        query = select(
+            Migration.id,
+            Migration.replicas,
+            VirtualMachine.id,
+            VirtualMachine.cpu_count,
+            VirtualMachine.memory_mb,
+        ).join(VirtualMachine, VirtualMachine.id == Migration.vm_id)
+        if migration_ids is not None:
+            query = query.where(Migration.id.in_(migration_ids))
+        else:
+            query = query.where(
+                Migration.status.in_(PLANNED_STATUSES),
+                Migration.target_platform.in_(CLUSTER_PLATFORMS),
+            )
+        factor = HPA_MAX_REPLICAS_FACTOR if include_hpa_max else 1
+        rows += [
+            (f"migration:{row_id}", (replicas or 1) * factor, vm_id, cpu, memory)
+            for row_id, replicas, vm_id, cpu, memory in db.execute(query)
+        ]
+    if vm_ids is not None:
+        rows += [
+            (f"vm:{row_id}", 1, row_id, cpu, memory)
+            for row_id, cpu, memory in db.execute(
+                select(
+                    VirtualMachine.id,
+                    VirtualMachine.cpu_count,
+                    VirtualMachine.memory_mb,
+                ).where(VirtualMachine.id.in_(vm_ids))
+            )
+        ]
+
+    if not rows:
+        empty = np.array([], dtype=np.int64)
+        return {"workloads": [], "pods": empty, "cpu_m": empty, "memory_mb": empty}
+
+    workloads, pods, vms, cpus, memory = zip(*rows)
+    sizing = recommend_observed(db, vms, cpus, memory, policy)
+    return {
+        "workloads": list(workloads),
+        "pods": np.asarray(pods, dtype=np.int64),
+        "cpu_m": sizing["cpu_request_m"],
+        "memory_mb": sizing["memory_request_mb"],
+    }
+
+
+def _fit_counts(free_cpu, free_memory, free_pods, cpu, memory):
+    return np.minimum(
+        np.minimum(free_cpu // max(cpu, 1), free_memory // max(memory, 1)),
+        free_pods,
+    )
+
+
+def pack(cpu_m, memory_mb, pods, shape: NodeShape, strategy: str = BEST_FIT) -> dict:
+    """
+    Pack pods onto as few nodes of one shape as the heuristic finds.
+
+    cpu_m, memory_mb and pods are per-workload arrays (requests per pod and
+    pod count). Pods larger than the node are reported as unplaceable by
+    workload index. Sizes are placed largest first by dominant share; first
+    fit takes open nodes in order, best fit takes the node with the least
+    dominant share left.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown packing strategy {strategy}")
+    cpu_m = np.asarray(cpu_m, dtype=np.int64)
+    memory_mb = np.asarray(memory_mb, dtype=np.int64)
+    pods = np.asarray(pods, dtype=np.int64)
+
+    fits_node = (cpu_m <= shape.cpu_m) & (memory_mb <= shape.memory_mb)
+    if shape.max_pods < 1:
+        fits_node[:] = False
+    unplaceable = np.flatnonzero(~fits_node & (pods > 0))
+
+    # Collapse identical pod sizes, largest dominant share first
+    sizes, inverse = np.unique(
+        np.stack([cpu_m[fits_node], memory_mb[fits_node]], axis=1),
+        axis=0,
+        return_inverse=True,
+    )
+    counts = np.bincount(
+        inverse.reshape(-1), weights=pods[fits_node], minlength=len(sizes)
+    ).astype(np.int64)
+    share = np.maximum(sizes[:, 0] / shape.cpu_m, sizes[:, 1] / shape.memory_mb)
+    order = np.lexsort((-sizes.sum(axis=1), -share))
+
+    capacity = max(int(counts.sum()), 1)  # Never more nodes than pods
+    free_cpu = np.zeros(capacity, dtype=np.int64)
+    free_memory = np.zeros(capacity, dtype=np.int64)
+    free_pods = np.zeros(capacity, dtype=np.int64)
+    opened = 0
+
+    for index in order:
+        cpu, memory = (int(v) for v in sizes[index])
+        remaining = int(counts[index])
+        if not remaining:
+            continue
+
+        # Cheap comparisons first, divisions only for nodes with room
+        candidates = np.flatnonzero(
+            (free_cpu[:opened] >= cpu)
+            & (free_memory[:opened] >= memory)
+            & (free_pods[:opened] > 0)
+        )
+        if len(candidates):
+            available = _fit_counts(
+                free_cpu[candidates],
+                free_memory[candidates],
+                free_pods[candidates],
+                cpu,
+                memory,
+            )
+            if strategy == BEST_FIT:
+                left = np.maximum(
+                    (free_cpu[candidates] - cpu) / shape.cpu_m,
+                    (free_memory[candidates] - memory) / shape.memory_mb,
+                )
+                tightest = np.argsort(left, kind="stable")
+                candidates, available = candidates[tightest], available[tightest]
+            before = np.cumsum(available) - available
+            take = np.clip(remaining - before, 0, available)
+            free_cpu[candidates] -= take * cpu
+            free_memory[candidates] -= take * memory
+            free_pods[candidates] -= take
+            remaining -= int(take.sum())
+
+        if remaining:
+            per_node = int(
+                _fit_counts(shape.cpu_m, shape.memory_mb, shape.max_pods, cpu, memory)
+            )
+            new_nodes = math.ceil(remaining / per_node)
+            placed = np.full(new_nodes, per_node, dtype=np.int64)
+            placed[-1] = remaining - per_node * (new_nodes - 1)
+            span = slice(opened, opened + new_nodes)
+            free_cpu[span] = shape.cpu_m - placed * cpu
+            free_memory[span] = shape.memory_mb - placed * memory
+            free_pods[span] = shape.max_pods - placed
+            opened += new_nodes
+
+    used_cpu = shape.cpu_m - free_cpu[:opened]
+    used_memory = shape.memory_mb - free_memory[:opened]
+    placed_pods = int(counts.sum())
+    lower_bound = max(
+        math.ceil(int(used_cpu.sum()) / shape.cpu_m),
+        math.ceil(int(used_memory.sum()) / shape.memory_mb),
+        math.ceil(placed_pods / max(shape.max_pods, 1)),
+    )
+    return {
+        "strategy": strategy,
+        "nodes": opened,
+        "lower_bound_nodes": lower_bound,
+        "pods": placed_pods,
+        "cpu_utilization": (
+            float(used_cpu.sum() / (opened * shape.cpu_m)) if opened else 0.0
+        ),
+        "memory_utilization": (
+            float(used_memory.sum() / (opened * shape.memory_mb)) if opened else 0.0
+        ),
+        "unplaceable": unplaceable,
+    }
+
+
+def plan_capacity(demands: dict, shapes: List[NodeShape], strategies=STRATEGIES):
+    """
+    Pack the demands onto every shape with every strategy.
+
+    Returns (plans, recommended) where recommended is the index of the plan
+    that places the most pods at the lowest cost (when every shape has a
+    cost) or with the least stranded capacity.
+    """
+    plans = []
+    for shape in shapes:
+        for strategy in strategies:
+            plan = pack(
+                demands["cpu_m"],
+                demands["memory_mb"],
+                demands["pods"],
+                shape,
+                strategy,
+            )
+            plan["shape"] = shape
+            plan["unplaceable"] = [
+                demands["workloads"][i] for i in plan["unplaceable"].tolist()
+            ]
+            plans.append(plan)
+
+    if not plans:
+        return plans, None
+    priced = all(shape.cost is not None for shape in shapes)
+
+    def rank(index):
+        plan = plans[index]
+        if priced:
+            waste = plan["nodes"] * plan["shape"].cost
+        else:
+            waste = -(plan["cpu_utilization"] + plan["memory_utilization"])
+        return (-plan["pods"], waste, plan["nodes"])
+
+    return plans, min(range(len(plans)), key=rank)
@@ -0,0 +1,154 @@
+"""
+Response Compression
+Content-Encoding negotiation, gzip/brotli compressors and a cache of
+precompressed bodies for immutable payloads (stored artifacts).
+
+Brotli is used only when the optional brotli package is installed.
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # optional - only gzip is offered without it
+    brotli = None
+
+GZIP = "gzip"
+BROTLI = "br"
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """Quality value per coding in an Accept-Encoding header"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def accepts(accept_encoding: Optional[str], coding: str) -> bool:
+    """Whether the client accepts coding (explicitly or through "*")"""
+    accepted = accepted_encodings(accept_encoding)
+    return accepted.get(coding, accepted.get("*", 0.0)) > 0
+
+
+def available_codings() -> tuple:
+    """Codings this process can produce, most preferred first"""
+    return (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+
+def choose_encoding(accept_encoding: Optional[str], codings=None) -> Optional[str]:
+    """
+    Best coding the client accepts, by quality and then by our preference
+    (None: send the body as-is)
+    """
+    accepted = accepted_encodings(accept_encoding)
+    best, best_quality = None, 0.0
+    for coding in codings or available_codings():
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class Compressor:
+    """Incremental compressor for one response body"""
+
+    def __init__(self, coding: str, level: Optional[int] = None):
+        self.coding = coding
+        if coding == BROTLI:
+            self._brotli = brotli.Compressor(
+                quality=settings.BROTLI_QUALITY if level is None else level
+            )
+        else:
+            # wbits 31: gzip header and trailer, mtime 0
+            self._zlib = zlib.compressobj(
+                settings.GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31
+            )
+
+    def compress(self, data: bytes) -> bytes:
+        if self.coding == BROTLI:
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        if self.coding == BROTLI:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def compress(data: bytes, coding: str, level: Optional[int] = None) -> bytes:
+    compressor = Compressor(coding, level)
+    return compressor.compress(data) + compressor.finish()
+
+
+class PrecompressedCache:
+    """
+    LRU of compressed bodies keyed by (content digest, coding), bounded by
+    total bytes. Only for content that never changes under its digest.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str, coding: str, produce: Callable[[], bytes]) -> bytes:
+        """Cached body, or produce() it (outside the lock) and cache it"""
+        key = (digest, coding)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+
+        body = produce()
+        if len(body) > self.max_bytes:
+            return body
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = body
+                self.size += len(body)
+                while self.size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return body
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_cache = None
+
+
+def get_precompressed_cache() -> PrecompressedCache:
+    global _cache
+    if _cache is None:
+        _cache = PrecompressedCache(settings.PRECOMPRESSED_CACHE_MB * 1024 * 1024)
+    return _cache
@@ -0,0 +1,46 @@
+"""
+Optimistic Concurrency
+Versioned rows (Migration, VirtualMachine) carry a version column that the
+ORM checks and increments on every flush. Writers that only touch a few
+columns use compare_and_set() instead of read-modify-write, and HTTP
+clients can make PUTs conditional with If-Match.
+"""
+
+from typing import Optional
+
+from sqlalchemy import update
+
+
+def compare_and_set(db, model, row_id: int, expected_version: Optional[int], **values):
+    """
+    UPDATE <model> SET <values>, version = version + 1
+    WHERE id = :row_id [AND version = :expected_version]
+
+    Only the given columns are written, so concurrent changes to other
+    columns are kept. With expected_version=None the update is
+    unconditional but still bumps the version. Returns True if a row
+    was updated. The caller commits.
+    """
+    statement = update(model).where(model.id == row_id)
+    if expected_version is not None:
+        statement = statement.where(model.version == expected_version)
+    result = db.execute(
+        statement.values(version=model.version + 1, **values).execution_options(
+            synchronize_session=False
+        )
+    )
+    return result.rowcount == 1
+
+
+def etag(version: int) -> str:
+    """Strong ETag for a row version"""
+    return f'"{version}"'
+
+
+def if_match_satisfied(if_match: Optional[str], version: int) -> bool:
+    """Evaluate an If-Match header against the current row version"""
+    if if_match is None or if_match.strip() == "*":
+        return True
+    # Weak tags never match for If-Match (RFC 9110 13.1.1)
+    candidates = [tag.strip() for tag in if_match.split(",")]
+    return etag(version) in candidates
@@ -0,0 +1,351 @@
+"""
+VM Dependency Graph
+Builds a directed graph of which VMs talk to which from the addresses in
+VirtualMachine.ip_address / network_config, stores it as CSR arrays, and
+groups VMs into migration waves that keep dependent VMs together.
+
+network_config may list extra addresses and observed outbound connections:
+
+    {"ip_addresses": ["10.0.1.5"],
+     "connections": ["10.0.2.7:1433", {"ip": "10.0.2.8", "port": 5432}]}
+
+A connection from A to B is an edge A -> B (A depends on B). Targets are
+matched against every VM's addresses and names; unknown targets are
+external and ignored.
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.lazy import lazy_import
+from app.models.vm import VirtualMachine
+
+np = lazy_import("numpy")
+
+
+class DependencyGraph:
+    """Directed VM graph in compressed sparse row form"""
+
+    def __init__(self, vm_ids, sources, targets):
+        self.vm_ids = np.asarray(vm_ids, dtype=np.int64)
+        n = len(self.vm_ids)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+
+        # Drop self-loops and duplicate edges, ordered by source
+        keys = np.unique(sources[sources != targets] * n + targets[sources != targets])
+        sources, targets = keys // max(n, 1), keys % max(n, 1)
+
+        self.indices = targets.astype(np.int32)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=self.indptr[1:])
+        self._sources = sources
+        self._reverse = None
+        self._index = {vm_id: i for i, vm_id in enumerate(self.vm_ids.tolist())}
+
+    @property
+    def node_count(self) -> int:
+        return len(self.vm_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    def node(self, vm_id: int) -> Optional[int]:
+        return self._index.get(vm_id)
+
+    def successors(self, node: int) -> "np.ndarray":
+        """Nodes this node depends on"""
+        return self.indices[self.indptr[node] : self.indptr[node + 1]]
+
+    def predecessors(self, node: int) -> "np.ndarray":
+        """Nodes depending on this node"""
+        if self._reverse is None:
+            order = np.argsort(self.indices, kind="stable")
+            indptr = np.zeros(self.node_count + 1, dtype=np.int64)
+            np.cumsum(
+                np.bincount(self.indices, minlength=self.node_count),
+                out=indptr[1:],
+            )
+            self._reverse = (indptr, self._sources[order].astype(np.int32))
+        indptr, indices = self._reverse
+        return indices[indptr[node] : indptr[node + 1]]
+
+    def weak_components(self) -> "np.ndarray":
+        """
+        Component label per node, ignoring edge direction.
+
+        Vectorized hook-and-shortcut: every edge hooks the larger root onto
+        the smaller, then labels are pointer-jumped to their roots, until no
+        edge joins two roots.
+        """
+        labels = np.arange(self.node_count, dtype=np.int64)
+        sources, targets = self._sources, self.indices.astype(np.int64)
+        while True:
+            low = np.minimum(labels[sources], labels[targets])
+            high = np.maximum(labels[sources], labels[targets])
+            joining = low != high
+            if not joining.any():
+                return labels
+            np.minimum.at(labels, high[joining], low[joining])
+            while True:
+                jumped = labels[labels]
+                if np.array_equal(jumped, labels):
+                    break
+                labels = jumped
+
+    def strong_components(self) -> "np.ndarray":
+        """
+        Strongly connected component label per node (iterative Tarjan).
+
+        Labels are numbered in the order Tarjan completes components, which
+        puts every component after the components it depends on.
+        """
+        n = self.node_count
+        indptr, indices = self.indptr.tolist(), self.indices.tolist()
+        index, low = [-1] * n, [0] * n
+        on_stack = [False] * n
+        labels = [-1] * n
+        stack, counter, component = [], 0, 0
+
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [[root, indptr[root]]]
+            while work:
+                frame = work[-1]
+                v, position = frame
+                if position < indptr[v + 1]:
+                    frame[1] += 1
+                    w = indices[position]
+                    if index[w] == -1:
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append([w, indptr[w]])
+                    elif on_stack[w] and index[w] < low[v]:
+                        low[v] = index[w]
+                    continue
+
+                work.pop()
+                if work and low[v] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[v]
+                if low[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        labels[w] = component
+                        if w == v:
+                            break
+                    component += 1
+
+        return np.asarray(labels, dtype=np.int64)
+
+
+def _address(entry) -> Optional[str]:
+    """Host part of a connection entry ("ip", "ip:port" or a dict)"""
+    if isinstance(entry, dict):
+        entry = entry.get("ip") or entry.get("address") or entry.get("host")
+    if not isinstance(entry, str) or not entry.strip():
+        return None
+    entry = entry.strip().lower()
+    if entry.count(":") == 1:  # IPv4/hostname with port; IPv6 has several
+        entry = entry.split(":", 1)[0]
+    return entry
+
+
+def build_graph(db, datacenter: Optional[str] = None) -> DependencyGraph:
+    """Dependency graph over all VMs (optionally of one datacenter)"""
+    query = select(
+        VirtualMachine.id,
+        VirtualMachine.name,
+        VirtualMachine.ip_address,
+        VirtualMachine.network_config,
+    ).order_by(VirtualMachine.id)
+    if datacenter:
+        query = query.where(VirtualMachine.datacenter == datacenter)
+
+    vm_ids = array("q")
+    addresses = {}
+    connections = []
+    for node, (vm_id, name, ip_address, config) in enumerate(
+        db.execute(query.execution_options(yield_per=5000))
+    ):
+        vm_ids.append(vm_id)
+        config = config if isinstance(config, dict) else {}
+        for address in [name, ip_address, *(config.get("ip_addresses") or [])]:
+            address = _address(address)
+            if address:
+                addresses.setdefault(address, node)
+        if config.get("connections"):
+            connections.append((node, config["connections"]))
+
+    sources, targets = array("q"), array("q")
+    for node, entries in connections:
+        for entry in entries:
+            target = addresses.get(_address(entry))
+            if target is not None:
+                sources.append(node)
+                targets.append(target)
+
+    return DependencyGraph(
+        vm_ids,
+        np.frombuffer(sources, dtype=np.int64) if sources else [],
+        np.frombuffer(targets, dtype=np.int64) if targets else [],
+    )
+
+
+def _split_component(members: "np.ndarray", strong: "np.ndarray", max_size: int):
+    """
+    Cut an oversized component into dependency-ordered chunks.
+
+    Members are sorted dependencies first; strongly connected groups are
+    never split, so a cycle larger than max_size becomes its own chunk.
+    """
+    boundaries = np.flatnonzero(np.r_[True, strong[1:] != strong[:-1]])
+    groups = np.split(members, boundaries[1:])
+    chunks, current = [], []
+    for group in groups:
+        if current and len(current) + len(group) > max_size:
+            chunks.append(np.concatenate(current))
+            current = []
+        current.append(group)
+        if sum(len(part) for part in current) >= max_size:
+            chunks.append(np.concatenate(current))
+            current = []
+    if current:
+        chunks.append(np.concatenate(current))
+    return chunks
+
+
+def plan_waves(graph: DependencyGraph, max_wave_size: int) -> dict:
+    """
+    Ordered migration waves of at most max_wave_size VMs.
+
+    Connected VMs migrate in the same wave where the component fits.
+    Components are packed best-fit decreasing; larger ones are cut into
+    consecutive waves in dependency order, keeping cycles together.
+    """
+    if graph.node_count == 0:
+        return {"components": 0, "cyclic_groups": 0, "waves": []}
+
+    weak = graph.weak_components()
+    strong = graph.strong_components()
+    order = np.lexsort((strong, weak))
+    weak_sorted, strong_sorted = weak[order], strong[order]
+    starts = np.flatnonzero(np.r_[True, weak_sorted[1:] != weak_sorted[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+
+    waves, split_waves = [], []
+    open_waves = []  # (free slots, wave index), sorted
+    for component in np.argsort(-sizes, kind="stable").tolist():
+        start, size = int(starts[component]), int(sizes[component])
+        members = order[start : start + size]
+        if size > max_wave_size:
+            split_waves.extend(
+                _split_component(
+                    members, strong_sorted[start : start + size], max_wave_size
+                )
+            )
+            continue
+        slot = bisect_left(open_waves, (size, -1))
+        if slot < len(open_waves):
+            free, wave = open_waves.pop(slot)
+            waves[wave].append(members)
+        else:
+            free, wave = max_wave_size, len(waves)
+            waves.append([members])
+        if free - size > 0:
+            insort(open_waves, (free - size, wave))
+
+    vm_ids = graph.vm_ids
+    planned = [
+        {"vm_ids": vm_ids[np.concatenate(parts)].tolist(), "oversized": False}
+        for parts in waves
+    ]
+    planned += [
+        {
+            "vm_ids": vm_ids[chunk].tolist(),
+            "oversized": len(chunk) > max_wave_size,
+        }
+        for chunk in split_waves
+    ]
+    strong_sizes = np.bincount(strong)
+    return {
+        "components": len(sizes),
+        "cyclic_groups": int((strong_sizes > 1).sum()),
+        "waves": planned,
+    }
+
+
+class GraphCache:
+    """
+    Reuses a built graph for a few seconds per datacenter filter.
+
+    VM writes through the API call invalidate(); a graph whose build started
+    before an invalidation is returned to its caller but not cached. The
+    cache is per process, so VMs discovered by workers appear once the
+    graph expires or a lookup misses their node and rebuilds.
+    """
+
+    def __init__(self, cache_seconds: float = 30.0):
+        self.cache_seconds = cache_seconds
+        self._graphs = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._graphs.clear()
+            self._generation += 1
+
+    def get(
+        self, db, datacenter: Optional[str] = None, refresh: bool = False
+    ) -> DependencyGraph:
+        """The cached graph, rebuilt when stale or when refresh is set"""
+        with self._lock:
+            cached = self._graphs.get(datacenter)
+            if (
+                not refresh
+                and cached
+                and time.monotonic() - cached[0] <= self.cache_seconds
+            ):
+                return cached[1]
+            generation = self._generation
+        graph = build_graph(db, datacenter)
+        with self._lock:
+            if generation == self._generation:
+                self._graphs[datacenter] = (time.monotonic(), graph)
+        return graph
+
+
+_cache = None
+
+
+def get_graph_cache() -> GraphCache:
+    global _cache
+    if _cache is None:
+        _cache = GraphCache(settings.DEPENDENCY_GRAPH_CACHE_SECONDS)
+    return _cache
+
+
+def dependencies_of(graph: DependencyGraph, vm_id: int) -> Optional[dict]:
+    """Direct dependencies and dependents of one VM, or None if unknown"""
+    node = graph.node(vm_id)
+    if node is None:
+        return None
+    return {
+        "depends_on": sorted(graph.vm_ids[graph.successors(node)].tolist()),
+        "dependents": sorted(graph.vm_ids[graph.predecessors(node)].tolist()),
+    }
@@ -0,0 +1,231 @@
+"""
+Migration ETA Estimation
+Keeps running count / sum / sum-of-squares of stage durations per segment
+(target platform, OS family, VM size bucket), updated with one upsert per
+key when a stage finishes, and predicts remaining time from them.
+
+Each observation also updates the coarser (platform) and global keys, so a
+segment without enough samples falls back to a broader one.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.config import settings
+from app.models.migration import MigrationStatus
+from app.models.stats import StageDurationStat
+from app.models.vm import VirtualMachine
+from app.services.migration_events import seconds_since
+
+ANY = "*"
+
+# Stages a running migration passes through, in order
+PIPELINE = [
+    MigrationStatus.IN_PROGRESS,
+    MigrationStatus.GENERATING_ARTIFACTS,
+    MigrationStatus.BUILDING_IMAGE,
+    MigrationStatus.PUSHING_IMAGE,
+    MigrationStatus.DEPLOYING,
+]
+
+
+def size_bucket(cpu_count, memory_mb) -> str:
+    cpu_count = cpu_count or 0
+    memory_mb = memory_mb or 0
+    if cpu_count <= 2 and memory_mb <= 4096:
+        return "small"
+    if cpu_count <= 8 and memory_mb <= 32768:
+        return "medium"
+    return "large"
+
+
+def segment_for(migration, vm) -> tuple:
+    """(target_platform, os_family, size_bucket) of a migration"""
+    platform = getattr(migration.target_platform, "value", migration.target_platform)
+    if vm is None:
+        return (platform or ANY, ANY, ANY)
+    return (
+        platform or ANY,
+        vm.os_family or ANY,
+        size_bucket(vm.cpu_count, vm.memory_mb),
+    )
+
+
+def _keys(stage: str, segment: tuple) -> list:
+    """
+    Distinct keys, most specific first. A segment with unknown parts
+    (e.g. no VM) collapses onto a broader key, which is counted once.
+    """
+    platform, os_family, bucket = segment
+    return list(
+        dict.fromkeys(
+            [
+                (stage, platform, os_family, bucket),
+                (stage, platform, ANY, ANY),
+                (stage, ANY, ANY, ANY),
+            ]
+        )
+    )
+
+
+def _upsert(db, key: tuple, seconds: float):
+    stage, platform, os_family, bucket = key
+    values = dict(
+        stage=stage,
+        target_platform=platform,
+        os_family=os_family,
+        size_bucket=bucket,
+        count=1,
+        total_seconds=seconds,
+        total_squared_seconds=seconds * seconds,
+    )
+    increments = dict(
+        count=StageDurationStat.count + 1,
+        total_seconds=StageDurationStat.total_seconds + seconds,
+        total_squared_seconds=StageDurationStat.total_squared_seconds
+        + seconds * seconds,
+    )
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        db.execute(
+            insert(StageDurationStat)
+            .values(**values)
+            .on_conflict_do_update(
+                index_elements=[
+                    "stage",
+                    "target_platform",
+                    "os_family",
+                    "size_bucket",
+                ],
+                set_=increments,
+            )
+        )
+        return
+
+    result = db.execute(
+        update(StageDurationStat)
+        .where(
+            StageDurationStat.stage == stage,
+            StageDurationStat.target_platform == platform,
+            StageDurationStat.os_family == os_family,
+            StageDurationStat.size_bucket == bucket,
+        )
+        .values(**increments)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.add(StageDurationStat(**values))
+
+
+def observe_stage(db, stage, seconds: float, segment: tuple):
+    """Add one finished stage duration; committed with the caller's transaction"""
+    stage = getattr(stage, "value", stage)
+    for key in _keys(stage, segment):
+        _upsert(db, key, seconds)
+
+
+class EtaEstimator:
+    """Predicts remaining time from cached stage statistics"""
+
+    def __init__(self, min_samples: int = 5, cache_seconds: float = 30.0):
+        self.min_samples = min_samples
+        self.cache_seconds = cache_seconds
+        self._stats = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._stats = None
+
+    def _load(self, db):
+        with self._lock:
+            if (
+                self._stats is None
+                or time.monotonic() - self._loaded_at > self.cache_seconds
+            ):
+                rows = db.execute(select(StageDurationStat)).scalars()
+                self._stats = {
+                    (r.stage, r.target_platform, r.os_family, r.size_bucket): (
+                        r.count,
+                        r.total_seconds,
+                        r.total_squared_seconds,
+                    )
+                    for r in rows
+                }
+                self._loaded_at = time.monotonic()
+            return self._stats
+
+    def _stage_estimate(self, stats, stage: str, segment: tuple):
+        """(mean, variance, samples) from the most specific key with enough data"""
+        for key in _keys(stage, segment):
+            count, total, squares = stats.get(key, (0, 0.0, 0.0))
+            if count >= self.min_samples:
+                mean = total / count
+                variance = max(squares / count - mean * mean, 0.0)
+                return mean, variance, count
+        return None
+
+    def estimate(self, db, migration, vm):
+        """ETA dict for a running migration, or None when it can't be predicted"""
+        if migration.status not in PIPELINE:
+            return None
+        stats = self._load(db)
+        segment = segment_for(migration, vm)
+
+        remaining = variance = 0.0
+        samples = None
+        for stage in PIPELINE[PIPELINE.index(migration.status) :]:
+            estimate = self._stage_estimate(stats, stage.value, segment)
+            if estimate is None:
+                return None
+            mean, stage_variance, count = estimate
+            if stage == migration.status:
+                elapsed = seconds_since(
+                    migration.stage_started_at or migration.started_at
+                )
+                mean = max(mean - (elapsed or 0.0), 0.0)
+            remaining += mean
+            variance += stage_variance
+            samples = count if samples is None else min(samples, count)
+
+        return {
+            "seconds": round(remaining, 3),
+            "estimated_completion_at": datetime.now(timezone.utc)
+            + timedelta(seconds=remaining),
+            "stddev_seconds": round(math.sqrt(variance), 3),
+            "samples": samples,
+        }
+
+    def estimate_many(self, db, migrations):
+        """ETAs for several migrations with one VM lookup"""
+        active = [m for m in migrations if m.status in PIPELINE]
+        if not active:
+            return [None] * len(migrations)
+        vm_ids = {m.vm_id for m in active}
+        vms = {
+            vm.id: vm
+            for vm in db.execute(
+                select(VirtualMachine).where(VirtualMachine.id.in_(vm_ids))
+            ).scalars()
+        }
+        return [self.estimate(db, m, vms.get(m.vm_id)) for m in migrations]
+
+
+_estimator = None
+
+
+def get_eta_estimator() -> EtaEstimator:
+    global _estimator
+    if _estimator is None:
+        _estimator = EtaEstimator(
+            min_samples=settings.ETA_MIN_SAMPLES,
+            cache_seconds=settings.ETA_STATS_CACHE_SECONDS,
+        )
+    return _estimator
@@ -0,0 +1,205 @@
+"""
+Service Fingerprint Index
+Maps normalized service/software tokens to container recommendations
+(base image, start command, packages and Dockerfile sections) using rules
+from a YAML file (app/data/fingerprint_rules.yaml by default).
+
+Rules are compiled into a dict from token to a bitmask of rules, so
+matching a VM is one dict lookup per token; the result for each distinct
+(OS family, rule mask) is built once and cached. The rules file is
+re-read when it changes on disk.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.lazy import lazy_import
+
+yaml = lazy_import("yaml")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "fingerprint_rules.yaml"
+)
+ANY_OS = "*"
+SECTIONS = ("setup", "build_stage", "dependencies", "source")
+
+_VERSION_SUFFIX = re.compile(r"(\s+v?\d[\w.\-]*)+$")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class InvalidRules(ValueError):
+    """The fingerprint rules file is malformed"""
+
+
+def normalize(token) -> str:
+    """Lowercase, collapse whitespace and drop trailing version numbers"""
+    token = _WHITESPACE.sub(" ", str(token).strip().lower())
+    return _VERSION_SUFFIX.sub("", token)
+
+
+class FingerprintIndex:
+    """Compiled fingerprint rules"""
+
+    def __init__(self, config: dict):
+        if not isinstance(config, dict) or not isinstance(
+            config.get("rules", []), list
+        ):
+            raise InvalidRules("Expected a mapping with a 'rules' list")
+        self.defaults = config.get("defaults") or {}
+        self.rules = []
+        self._tokens: Dict[str, int] = {}
+        self._os_masks: Dict[str, int] = {}
+        self._cache: Dict[tuple, dict] = {}
+
+        for position, rule in enumerate(config.get("rules") or []):
+            if not isinstance(rule, dict) or not rule.get("name"):
+                raise InvalidRules(f"Rule {position} needs a name")
+            if not rule.get("match"):
+                raise InvalidRules(f"Rule '{rule['name']}' has no match tokens")
+            bit = 1 << position
+            os_family = (rule.get("os_family") or ANY_OS).lower()
+            self._os_masks[os_family] = self._os_masks.get(os_family, 0) | bit
+            for token in rule["match"]:
+                key = normalize(token)
+                self._tokens[key] = self._tokens.get(key, 0) | bit
+            compiled = {
+                "name": rule["name"],
+                "base_image": rule.get("base_image"),
+                "command": rule.get("command"),
+                "packages": list(rule.get("packages") or []),
+                "priority": rule.get("priority", 0),
+            }
+            compiled.update({section: rule.get(section) or "" for section in SECTIONS})
+            self.rules.append(compiled)
+
+    def mask(self, os_family: Optional[str], tokens) -> int:
+        """Bitmask of the rules matching the tokens for this OS family"""
+        mask = 0
+        for token in tokens or ():
+            mask |= self._tokens.get(normalize(token), 0)
+        allowed = self._os_masks.get(ANY_OS, 0)
+        allowed |= self._os_masks.get((os_family or "").lower(), 0)
+        return mask & allowed
+
+    def resolve(self, os_family: Optional[str], mask: int) -> dict:
+        """Recommendation for an OS family and rule mask (cached)"""
+        key = (os_family, mask)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        defaults = self.defaults.get(os_family or "linux") or self.defaults.get(
+            "linux", {}
+        )
+        matched = [rule for i, rule in enumerate(self.rules) if mask >> i & 1]
+        by_priority = sorted(matched, key=lambda rule: -rule["priority"])
+        base_image = next(
+            (r["base_image"] for r in by_priority if r["base_image"]),
+            defaults.get("base_image"),
+        )
+        packages = set(defaults.get("packages") or [])
+        for rule in matched:
+            packages.update(rule["packages"])
+
+        result = {
+            "base_image": base_image,
+            "command": next(
+                (r["command"] for r in by_priority if r["command"]),
+                defaults.get("command"),
+            ),
+            "rules": [rule["name"] for rule in matched],
+            # Sorted so VMs with the same package set share the layer
+            "packages": sorted(packages, key=str.lower),
+        }
+        for section in SECTIONS:
+            result[section] = [rule[section] for rule in matched if rule[section]]
+        self._cache[key] = result
+        return result
+
+    def recommend(self, vm) -> dict:
+        """Recommendation for one VM"""
+        return self.resolve(
+            vm.os_family,
+            self.mask(
+                vm.os_family,
+                (vm.discovered_services or []) + (vm.installed_software or []),
+            ),
+        )
+
+    def recommend_many(self, rows) -> List[dict]:
+        """
+        Recommendations for (os_family, services, software) rows.
+
+        VMs with identical token sets share one mask computation.
+        """
+        masks = {}
+        results = []
+        for os_family, services, software in rows:
+            tokens = tuple(services or ()) + tuple(software or ())
+            key = (os_family, tokens)
+            if key not in masks:
+                masks[key] = self.mask(os_family, tokens)
+            results.append(self.resolve(os_family, masks[key]))
+        return results
+
+
+def load_rules(path: str) -> FingerprintIndex:
+    with open(path) as f:
+        return FingerprintIndex(yaml.safe_load(f))
+
+
+class FingerprintRegistry:
+    """Serves the current index, reloading the rules file when it changes"""
+
+    def __init__(self, path: str, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._index = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> FingerprintIndex:
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < self.check_interval:
+            return self._index
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                if self._index is None:
+                    raise
+                logger.warning(f"Keeping fingerprint rules, cannot stat: {e}")
+                return self._index
+            if mtime != self._mtime:
+                try:
+                    self._index = load_rules(self.path)
+                    self._mtime = mtime
+                    logger.info(f"Loaded fingerprint rules from {self.path}")
+                except (OSError, yaml.YAMLError, InvalidRules) as e:
+                    if self._index is None:
+                        raise
+                    logger.warning(f"Keeping previous fingerprint rules: {e}")
+            return self._index
+
+
+_registry = None
+
+
+def get_fingerprint_index() -> FingerprintIndex:
+    """Process-wide index built from FINGERPRINT_RULES_PATH"""
+    global _registry
+    if _registry is None:
+        _registry = FingerprintRegistry(
+            settings.FINGERPRINT_RULES_PATH or DEFAULT_RULES_PATH,
+            settings.FINGERPRINT_RELOAD_INTERVAL,
+        )
+    return _registry.get()
@@ -0,0 +1,156 @@
+"""
+Dependency Health Checks
+Runs dependency checks concurrently in a small thread pool, each with its
+own timeout, and caches the combined result for a short TTL so that probe
+storms (kubelets, load balancers, dashboards) cost one round of checks
+per interval.
+
+A check that is still running from an earlier round (e.g. a hung
+connection) is reported as timed out instead of being started again.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+from sqlalchemy import text
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+HEALTHY = "healthy"
+UNHEALTHY = "unhealthy"
+DEGRADED = "degraded"
+
+
+class HealthChecker:
+    """Cached, concurrent, time-limited checks; each check returns a dict"""
+
+    def __init__(
+        self,
+        checks: Dict[str, Callable[[], dict]],
+        ttl: float = 2.0,
+        timeout: float = 2.0,
+    ):
+        self.checks = checks
+        self.ttl = ttl
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(len(checks), 1), thread_name_prefix="health"
+        )
+        self._pending = {}
+        self._result = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def results(self) -> dict:
+        if self._fresh():
+            return self._result
+        async with self._lock:
+            # Concurrent callers wait here for the round already running
+            if not self._fresh():
+                self._result = await self._run()
+                self._checked_at = time.monotonic()
+            return self._result
+
+    def _fresh(self) -> bool:
+        return (
+            self._result is not None and time.monotonic() - self._checked_at < self.ttl
+        )
+
+    async def _run(self) -> dict:
+        names = list(self.checks)
+        outcomes = await asyncio.gather(*(self._check(name) for name in names))
+        dependencies = dict(zip(names, outcomes))
+        healthy = all(d["status"] == HEALTHY for d in dependencies.values())
+        return {
+            "status": HEALTHY if healthy else DEGRADED,
+            "checked_at": time.time(),
+            "dependencies": dependencies,
+        }
+
+    async def _check(self, name: str) -> dict:
+        future = self._pending.get(name)
+        if future is not None and not future.done():
+            return {
+                "status": UNHEALTHY,
+                "error": "previous check still running",
+            }
+        future = self._executor.submit(self.checks[name])
+        self._pending[name] = future
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)), self.timeout
+            )
+        except asyncio.TimeoutError:
+            return {"status": UNHEALTHY, "error": f"timed out after {self.timeout}s"}
+        except Exception as e:
+            return {"status": UNHEALTHY, "error": str(e)}
+        return {
+            "status": HEALTHY,
+            **result,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+
+def check_database() -> dict:
+    from app.database import engine, get_pool_stats
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    return {"type": engine.dialect.name, "pool": get_pool_stats()}
+
+
+def check_redis() -> dict:
+    from app.redis_client import get_redis
+
+    get_redis().ping()
+    return {"type": "redis"}
+
+
+def check_broker() -> dict:
+    """Broker reachability and messages waiting per queue"""
+    from app.celery_app import celery_queues
+    from app.redis_client import get_redis
+
+    queues = celery_queues()
+    pipe = get_redis(settings.CELERY_BROKER_URL).pipeline(transaction=False)
+    for queue in queues:
+        pipe.llen(queue)
+    depths = dict(zip(queues, pipe.execute()))
+    return {"type": "redis", "queue_depth": depths, "queued": sum(depths.values())}
+
+
+def check_workers() -> dict:
+    """Worker liveness from the event-driven worker snapshot"""
+    from app.services.worker_state import get_worker_monitor
+
+    monitor = get_worker_monitor()
+    workers = monitor.workers()
+    alive = sorted(name for name, worker in workers.items() if worker["alive"])
+    if not alive:
+        raise RuntimeError(
+            "no live workers"
+            + (" (event stream not connected)" if not monitor.connected else "")
+        )
+    return {"alive": len(alive), "known": len(workers), "workers": alive}
+
+
+_checkers = {}
+
+
+def get_health_checker(kind: str = "detailed") -> HealthChecker:
+    """Process-wide checkers: "readiness" (database) and "detailed" (all)"""
+    checker = _checkers.get(kind)
+    if checker is None:
+        checks = {"database": check_database}
+        if kind == "detailed":
+            checks.update(redis=check_redis, broker=check_broker, workers=check_workers)
+        checker = _checkers[kind] = HealthChecker(
+            checks, settings.HEALTH_CACHE_SECONDS, settings.HEALTH_CHECK_TIMEOUT
+        )
+    return checker
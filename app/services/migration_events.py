@@ -0,0 +1,129 @@
+"""
+Migration Event Log
+Append-only record of migration status transitions, with per-migration
+timelines and stage duration statistics computed from it.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import func, insert, select
+
+from app.models.event import MigrationEvent
+
+DEFAULT_PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def _value(status):
+    return getattr(status, "value", status)
+
+
+def seconds_since(timestamp: Optional[datetime]) -> Optional[float]:
+    """Seconds elapsed since a naive-UTC or aware timestamp"""
+    if timestamp is None:
+        return None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return max((datetime.now(timezone.utc) - timestamp).total_seconds(), 0.0)
+
+
+def record_event(
+    db,
+    migration_id: int,
+    status,
+    from_status=None,
+    from_status_seconds: Optional[float] = None,
+    progress_percent: Optional[int] = None,
+    message: Optional[str] = None,
+):
+    """Insert a transition event; committed with the caller's transaction"""
+    db.execute(
+        insert(MigrationEvent).values(
+            migration_id=migration_id,
+            status=_value(status),
+            from_status=_value(from_status),
+            from_status_seconds=from_status_seconds,
+            progress_percent=progress_percent,
+            message=message,
+        )
+    )
+
+
+def get_timeline(db, migration_id: int):
+    """Events of one migration in order (served by the migration_id index)"""
+    return (
+        db.execute(
+            select(MigrationEvent)
+            .where(MigrationEvent.migration_id == migration_id)
+            .order_by(MigrationEvent.created_at, MigrationEvent.id)
+        )
+        .scalars()
+        .all()
+    )
+
+
+def _percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Linear interpolation, matching Postgres percentile_cont"""
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def _label(fraction: float) -> str:
+    return f"p{fraction * 100:g}_seconds"
+
+
+def stage_duration_stats(
+    db,
+    since: Optional[datetime] = None,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+) -> Dict[str, dict]:
+    """
+    Duration statistics per stage for transitions recorded since a time.
+
+    Postgres aggregates with percentile_cont in the database; other
+    databases fetch the (stage, seconds) pairs in the window and compute the
+    same interpolated percentiles in Python.
+    """
+    since = since or datetime.now(timezone.utc) - timedelta(days=7)
+    seconds = MigrationEvent.from_status_seconds
+    window = (
+        MigrationEvent.created_at >= since,
+        MigrationEvent.from_status.isnot(None),
+        seconds.isnot(None),
+    )
+
+    stats = {}
+    if db.get_bind().dialect.name == "postgresql":
+        rows = db.execute(
+            select(
+                MigrationEvent.from_status,
+                func.count(),
+                func.avg(seconds),
+                func.max(seconds),
+                *[func.percentile_cont(p).within_group(seconds) for p in percentiles],
+            )
+            .where(*window)
+            .group_by(MigrationEvent.from_status)
+        ).all()
+        for stage, count, mean, maximum, *values in rows:
+            stats[stage] = {"count": count, "mean_seconds": float(mean)}
+            stats[stage].update(
+                {_label(p): float(v) for p, v in zip(percentiles, values)}
+            )
+            stats[stage]["max_seconds"] = float(maximum)
+        return stats
+
+    grouped = {}
+    for stage, value in db.execute(
+        select(MigrationEvent.from_status, seconds).where(*window)
+    ):
+        grouped.setdefault(stage, []).append(value)
+    for stage, values in grouped.items():
+        values.sort()
+        stats[stage] = {"count": len(values), "mean_seconds": sum(values) / len(values)}
+        stats[stage].update({_label(p): _percentile(values, p) for p in percentiles})
+        stats[stage]["max_seconds"] = values[-1]
+    return stats
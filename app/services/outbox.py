@@ -0,0 +1,153 @@
+"""
+Transactional Outbox
+Task enqueues are written to the task_outbox table in the same transaction
+as the state change that needs them, and published to the broker later by
+dispatch_pending(). A rollback therefore never leaves a phantom task, and
+broker latency or outages stay out of the request path.
+
+Delivery is at-least-once: if the commit marking a batch as sent fails,
+those messages are published again with the same task ids. A message the
+broker rejects is skipped, so it does not hold up the ones behind it, and
+is dead-lettered (dead_at set, kept for inspection) after
+OUTBOX_MAX_ATTEMPTS failures. Broker connection errors stop the run
+without counting against any message.
+"""
+
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.outbox import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_task(db, task, args=(), kwargs=None) -> str:
+    """
+    Record a task to be published once the current transaction commits.
+
+    task is a Celery task or a task name. Returns the pre-assigned task id,
+    so callers can store it alongside their own state change.
+    """
+    task_id = str(uuid.uuid4())
+    db.add(
+        OutboxMessage(
+            task_name=getattr(task, "name", task),
+            task_id=task_id,
+            args=list(args),
+            kwargs=kwargs or {},
+        )
+    )
+    return task_id
+
+
+def dispatch_pending(
+    db,
+    app=None,
+    batch_size: int = None,
+    max_batches: int = None,
+    max_attempts: int = None,
+):
+    """
+    Publish unsent outbox messages in id order.
+
+    Each batch is sent over one broker connection and marked sent with a
+    single commit. A failed message is skipped and retried on later runs;
+    a connection error stops the run, leaving the rest for the next one.
+    Returns counts of sent, failed and dead-lettered messages.
+    """
+    from kombu.exceptions import OperationalError
+
+    if app is None:
+        from app.celery_app import celery_app
+
+        app = celery_app
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    max_batches = max_batches or settings.OUTBOX_MAX_BATCHES
+    max_attempts = max_attempts or settings.OUTBOX_MAX_ATTEMPTS
+    report = {"sent": 0, "failed": 0, "dead": 0, "batches": 0}
+    last_id, broker_down = 0, False
+
+    with app.producer_or_acquire() as producer:
+        for _ in range(max_batches):
+            query = (
+                select(OutboxMessage)
+                .where(
+                    OutboxMessage.sent_at.is_(None),
+                    OutboxMessage.dead_at.is_(None),
+                    OutboxMessage.id > last_id,
+                )
+                .order_by(OutboxMessage.id)
+                .limit(batch_size)
+            )
+            if db.get_bind().dialect.name == "postgresql":
+                # Concurrent dispatchers take disjoint batches
+                query = query.with_for_update(skip_locked=True)
+
+            messages = db.execute(query).scalars().all()
+            if not messages:
+                break
+
+            now = datetime.now(timezone.utc)
+            for message in messages:
+                try:
+                    app.send_task(
+                        message.task_name,
+                        args=message.args,
+                        kwargs=message.kwargs,
+                        task_id=message.task_id,
+                        producer=producer,
+                    )
+                except (OSError, OperationalError) as e:
+                    message.last_error = str(e)
+                    report["failed"] += 1
+                    logger.warning(f"Broker unavailable, outbox dispatch stopped: {e}")
+                    broker_down = True
+                    break
+                except Exception as e:
+                    message.attempts = (message.attempts or 0) + 1
+                    message.last_error = str(e)
+                    report["failed"] += 1
+                    if message.attempts >= max_attempts:
+                        message.dead_at = now
+                        report["dead"] += 1
+                        logger.error(
+                            f"Outbox message {message.task_id} dead-lettered after "
+                            f"{message.attempts} attempts: {str(e)}"
+                        )
+                    else:
+                        logger.warning(
+                            f"Could not publish outbox message {message.task_id}: "
+                            f"{str(e)}"
+                        )
+                    continue
+                message.sent_at = now
+                report["sent"] += 1
+
+            db.commit()
+            report["batches"] += 1
+            last_id = messages[-1].id
+            if broker_down or len(messages) < batch_size:
+                break
+
+    return report
+
+
+def dispatch_soon():
+    """
+    Publish pending messages right away, e.g. from a FastAPI background task
+    after the response is sent. Errors are logged; the periodic dispatcher
+    picks up anything left behind.
+    """
+    db = SessionLocal()
+    try:
+        dispatch_pending(db)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Outbox dispatch failed: {str(e)}")
+    finally:
+        db.close()
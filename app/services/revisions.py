@@ -0,0 +1,203 @@
+"""
+Artifact Revisions
+Keeps the history of a migration's generated artifacts as line deltas.
+
+Each revision stores, per artifact, the edit script from the previous
+revision's lines (copy n / skip n / insert lines). Every
+ARTIFACT_KEYFRAME_INTERVAL-th revision stores full texts instead, so
+rebuilding any revision applies at most that many deltas. Regenerating
+identical artifacts writes nothing.
+"""
+
+import difflib
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.models.migration import Migration
+from app.models.revision import ArtifactRevision
+
+# Revisioned artifacts: API name -> Migration column
+ARTIFACT_COLUMNS = {
+    "dockerfile": "dockerfile_content",
+    "kubernetes_manifest": "kubernetes_manifest",
+    "docker_compose": "docker_compose",
+}
+
+COPY, SKIP, INSERT = "=", "-", "+"
+
+
+def line_delta(old: str, new: str) -> list:
+    """Edit script turning old into new, line by line"""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([COPY, i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append([SKIP, i2 - i1])
+        if j2 > j1:
+            ops.append([INSERT, new_lines[j1:j2]])
+    return ops
+
+
+def apply_delta(old: str, ops: list) -> str:
+    old_lines = old.splitlines(keepends=True)
+    position, lines = 0, []
+    for op, arg in ops:
+        if op == COPY:
+            lines.extend(old_lines[position : position + arg])
+            position += arg
+        elif op == SKIP:
+            position += arg
+        else:
+            lines.extend(arg)
+    return "".join(lines)
+
+
+def artifacts_digest(artifacts: Dict[str, Optional[str]]) -> str:
+    return hashlib.sha256(json.dumps(artifacts, sort_keys=True).encode()).hexdigest()
+
+
+def _latest(db, migration_id: int) -> Optional[ArtifactRevision]:
+    return db.execute(
+        select(ArtifactRevision)
+        .where(ArtifactRevision.migration_id == migration_id)
+        .order_by(ArtifactRevision.revision.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+
+
+def record_revision(
+    db, migration_id: int, artifacts: Dict[str, Optional[str]]
+) -> Optional[ArtifactRevision]:
+    """
+    Add a revision for these artifacts unless they equal the latest one
+    (returns None then). Artifacts not given are carried over unchanged.
+
+    The migration row is locked until the caller commits, so concurrent
+    writers take revision numbers one after another.
+    """
+    # FOR UPDATE is left out on SQLite, which serializes writers anyway
+    db.execute(
+        select(Migration.id).where(Migration.id == migration_id).with_for_update()
+    )
+    latest = _latest(db, migration_id)
+    previous = (
+        get_revision(db, migration_id, latest.revision)["artifacts"] if latest else {}
+    )
+    current = {
+        name: artifacts.get(name, previous.get(name)) for name in ARTIFACT_COLUMNS
+    }
+    digest = artifacts_digest(current)
+    if latest is not None and latest.digest == digest:
+        return None
+
+    revision = latest.revision + 1 if latest else 1
+    interval = max(settings.ARTIFACT_KEYFRAME_INTERVAL, 1)
+    keyframe = (revision - 1) % interval == 0
+    if keyframe:
+        payload = current
+    else:
+        # None (not generated) is stored as is rather than as a delta
+        payload = {
+            name: (
+                line_delta(previous.get(name) or "", text)
+                if text is not None and previous.get(name) is not None
+                else text
+            )
+            for name, text in current.items()
+        }
+    row = ArtifactRevision(
+        migration_id=migration_id,
+        revision=revision,
+        digest=digest,
+        is_keyframe=keyframe,
+        payload=json.dumps(payload, separators=(",", ":")),
+    )
+    db.add(row)
+    db.flush()
+    return row
+
+
+def list_revisions(db, migration_id: int) -> List[ArtifactRevision]:
+    return (
+        db.execute(
+            select(ArtifactRevision)
+            .where(ArtifactRevision.migration_id == migration_id)
+            .order_by(ArtifactRevision.revision)
+        )
+        .scalars()
+        .all()
+    )
+
+
+def get_revision(db, migration_id: int, revision: int) -> Optional[dict]:
+    """Artifacts as of a revision, rebuilt from the nearest keyframe"""
+    keyframe = db.execute(
+        select(func.max(ArtifactRevision.revision)).where(
+            ArtifactRevision.migration_id == migration_id,
+            ArtifactRevision.revision <= revision,
+            ArtifactRevision.is_keyframe.is_(True),
+        )
+    ).scalar()
+    if keyframe is None:
+        return None
+    rows = (
+        db.execute(
+            select(ArtifactRevision)
+            .where(
+                ArtifactRevision.migration_id == migration_id,
+                ArtifactRevision.revision.between(keyframe, revision),
+            )
+            .order_by(ArtifactRevision.revision)
+        )
+        .scalars()
+        .all()
+    )
+    if not rows or rows[-1].revision != revision:
+        return None
+
+    artifacts = {}
+    for row in rows:
+        payload = json.loads(row.payload)
+        for name in ARTIFACT_COLUMNS:
+            value = payload.get(name)
+            if row.is_keyframe or not isinstance(value, list):
+                artifacts[name] = value
+            else:
+                artifacts[name] = apply_delta(artifacts.get(name) or "", value)
+    return {
+        "revision": revision,
+        "digest": rows[-1].digest,
+        "created_at": rows[-1].created_at,
+        "artifacts": artifacts,
+    }
+
+
+def diff_revisions(db, migration_id: int, old: int, new: int) -> Optional[dict]:
+    """Unified diff per changed artifact between two revisions"""
+    before = get_revision(db, migration_id, old)
+    after = get_revision(db, migration_id, new)
+    if before is None or after is None:
+        return None
+    diffs = {}
+    for name in ARTIFACT_COLUMNS:
+        a = before["artifacts"].get(name) or ""
+        b = after["artifacts"].get(name) or ""
+        if a != b:
+            diffs[name] = "".join(
+                difflib.unified_diff(
+                    a.splitlines(keepends=True),
+                    b.splitlines(keepends=True),
+                    fromfile=f"{name}@{old}",
+                    tofile=f"{name}@{new}",
+                )
+            )
+    return diffs
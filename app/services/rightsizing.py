@@ -0,0 +1,246 @@
+"""
+Right-Sizing Engine
+Computes container CPU/memory requests and limits for many VMs at once
+with NumPy array operations.
+
+Requests cover the observed utilization percentile plus headroom; without
+utilization data a policy default is assumed. Limits are a multiple of
+the request. Everything is clamped and rounded to allocation steps.
+
+recommend_observed() takes the utilization from the hourly rollups, the
+peak hourly p95 within RIGHTSIZING_LOOKBACK_DAYS. The policy percentiles
+only reduce raw sample matrices passed to recommend() directly.
+"""
+
+import time
+from typing import Optional
+
+from app.config import settings
+from app.lazy import lazy_import
+from app.services.utilization import peak_p95
+
+np = lazy_import("numpy")
+
+DEFAULT_CPU_COUNT = 1
+DEFAULT_MEMORY_MB = 512
+
+
+class RightSizingPolicy:
+    """
+    Tunables for turning VM specs and utilization into container resources.
+    cpu_percentile / memory_percentile reduce 2-D sample input only.
+    """
+
+    def __init__(
+        self,
+        cpu_percentile: float = 95.0,
+        memory_percentile: float = 99.0,
+        cpu_headroom: float = 0.25,
+        memory_headroom: float = 0.25,
+        cpu_limit_ratio: float = 2.0,
+        memory_limit_ratio: float = 1.25,
+        default_cpu_utilization: float = 0.15,
+        default_memory_utilization: float = 0.7,
+        min_cpu_millicores: int = 50,
+        max_cpu_millicores: int = 16000,
+        min_memory_mb: int = 64,
+        max_memory_mb: int = 65536,
+        cpu_step_millicores: int = 10,
+        memory_step_mb: int = 16,
+    ):
+        self.cpu_percentile = cpu_percentile
+        self.memory_percentile = memory_percentile
+        self.cpu_headroom = cpu_headroom
+        self.memory_headroom = memory_headroom
+        self.cpu_limit_ratio = cpu_limit_ratio
+        self.memory_limit_ratio = memory_limit_ratio
+        self.default_cpu_utilization = default_cpu_utilization
+        self.default_memory_utilization = default_memory_utilization
+        self.min_cpu_millicores = min_cpu_millicores
+        self.max_cpu_millicores = max_cpu_millicores
+        self.min_memory_mb = min_memory_mb
+        self.max_memory_mb = max_memory_mb
+        self.cpu_step_millicores = cpu_step_millicores
+        self.memory_step_mb = memory_step_mb
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            cpu_headroom=settings.RIGHTSIZING_CPU_HEADROOM,
+            memory_headroom=settings.RIGHTSIZING_MEMORY_HEADROOM,
+            cpu_limit_ratio=settings.RIGHTSIZING_CPU_LIMIT_RATIO,
+            memory_limit_ratio=settings.RIGHTSIZING_MEMORY_LIMIT_RATIO,
+            default_cpu_utilization=settings.RIGHTSIZING_DEFAULT_CPU_UTILIZATION,
+            default_memory_utilization=settings.RIGHTSIZING_DEFAULT_MEMORY_UTILIZATION,
+        )
+
+
+def _as_array(values, default) -> "np.ndarray":
+    """Float array with missing entries (None/NaN/<=0) replaced by default"""
+    array = np.array(
+        (
+            [np.nan if v is None else v for v in values]
+            if not isinstance(values, np.ndarray)
+            else values
+        ),
+        dtype=np.float64,
+    )
+    return np.where(np.isfinite(array) & (array > 0), array, default)
+
+
+def _utilization(values, count: int, percentile: float, default: float):
+    """
+    Reduce utilization to one fraction per VM.
+
+    Accepts None, a 1-D array of per-VM fractions, or a 2-D (vms, samples)
+    array padded with NaN, which is reduced with nanpercentile. VMs without
+    data get the default.
+    """
+    if values is None:
+        return np.full(count, default), np.zeros(count, dtype=bool)
+    array = np.asarray(values, dtype=np.float64)
+    if array.ndim == 2:
+        observed = ~np.all(np.isnan(array), axis=1)
+        reduced = np.full(count, np.nan)
+        if observed.any():
+            reduced[observed] = np.nanpercentile(array[observed], percentile, axis=1)
+        array = reduced
+    observed = np.isfinite(array)
+    return np.where(observed, np.clip(array, 0.0, 1.0), default), observed
+
+
+def _round_up(values: "np.ndarray", step: int) -> "np.ndarray":
+    return (np.ceil(values / step) * step).astype(np.int64)
+
+
+def recommend(
+    cpu_count,
+    memory_mb,
+    cpu_utilization=None,
+    memory_utilization=None,
+    policy: Optional[RightSizingPolicy] = None,
+) -> dict:
+    """
+    Container resources for a fleet of VMs.
+
+    cpu_utilization / memory_utilization are fractions of the VM's
+    allocation (see _utilization for accepted shapes). Returns a dict of
+    equal-length arrays: cpu_request_m, cpu_limit_m, memory_request_mb,
+    memory_limit_mb, and observed (True where utilization data was used).
+    """
+    policy = policy or RightSizingPolicy()
+    cores = _as_array(cpu_count, DEFAULT_CPU_COUNT)
+    memory = _as_array(memory_mb, DEFAULT_MEMORY_MB)
+    count = len(cores)
+
+    cpu_used, cpu_observed = _utilization(
+        cpu_utilization,
+        count,
+        policy.cpu_percentile,
+        policy.default_cpu_utilization,
+    )
+    memory_used, memory_observed = _utilization(
+        memory_utilization,
+        count,
+        policy.memory_percentile,
+        policy.default_memory_utilization,
+    )
+
+    cpu_request = np.clip(
+        _round_up(
+            cores * 1000 * cpu_used * (1 + policy.cpu_headroom),
+            policy.cpu_step_millicores,
+        ),
+        policy.min_cpu_millicores,
+        policy.max_cpu_millicores,
+    )
+    memory_request = np.clip(
+        _round_up(
+            memory * memory_used * (1 + policy.memory_headroom),
+            policy.memory_step_mb,
+        ),
+        policy.min_memory_mb,
+        policy.max_memory_mb,
+    )
+
+    # Limits never drop below the request, even when the clamp bites
+    cpu_limit = np.maximum(
+        np.minimum(
+            _round_up(cpu_request * policy.cpu_limit_ratio, policy.cpu_step_millicores),
+            policy.max_cpu_millicores,
+        ),
+        cpu_request,
+    )
+    memory_limit = np.maximum(
+        np.minimum(
+            _round_up(
+                memory_request * policy.memory_limit_ratio, policy.memory_step_mb
+            ),
+            policy.max_memory_mb,
+        ),
+        memory_request,
+    )
+
+    return {
+        "cpu_request_m": cpu_request,
+        "cpu_limit_m": cpu_limit,
+        "memory_request_mb": memory_request,
+        "memory_limit_mb": memory_limit,
+        "observed": cpu_observed | memory_observed,
+    }
+
+
+def kubernetes_resources(recommendations: dict, index: int = 0) -> dict:
+    """Kubernetes resources block for one VM of a recommend() result"""
+    return {
+        "requests": {
+            "memory": f"{int(recommendations['memory_request_mb'][index])}Mi",
+            "cpu": f"{int(recommendations['cpu_request_m'][index])}m",
+        },
+        "limits": {
+            "memory": f"{int(recommendations['memory_limit_mb'][index])}Mi",
+            "cpu": f"{int(recommendations['cpu_limit_m'][index])}m",
+        },
+    }
+
+
+def recommend_for_vm(
+    vm, cpu_utilization=None, memory_utilization=None, policy=None
+) -> dict:
+    """Kubernetes resources block for a single VM"""
+    return kubernetes_resources(
+        recommend(
+            [vm.cpu_count],
+            [vm.memory_mb],
+            None if cpu_utilization is None else [cpu_utilization],
+            None if memory_utilization is None else [memory_utilization],
+            policy or RightSizingPolicy.from_settings(),
+        )
+    )
+
+
+def recommend_observed(
+    db,
+    vm_ids,
+    cpu_count,
+    memory_mb,
+    policy: Optional[RightSizingPolicy] = None,
+    now_epoch: Optional[int] = None,
+) -> dict:
+    """recommend() for VMs by id, using their utilization rollups"""
+    since = int(now_epoch or time.time()) - settings.RIGHTSIZING_LOOKBACK_DAYS * 86400
+    observed = peak_p95(db, vm_ids, since)
+    return recommend(
+        cpu_count,
+        memory_mb,
+        observed["cpu"],
+        observed["memory"],
+        policy or RightSizingPolicy.from_settings(),
+    )
+
+
+def resources_for_vm(db, vm, policy=None) -> dict:
+    """Kubernetes resources block for a single VM from its utilization"""
+    return kubernetes_resources(
+        recommend_observed(db, [vm.id], [vm.cpu_count], [vm.memory_mb], policy)
+    )
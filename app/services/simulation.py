@@ -0,0 +1,154 @@
+"""
+Simulation Backend
+Stands in for hypervisor, registry and cluster calls with configurable
+per-stage latency distributions and injected failure rates.
+
+Outcomes are derived from (seed, stage, key), so a given migration behaves
+the same way no matter which worker runs it or in which order.
+"""
+
+import json
+import math
+import random
+import time
+from typing import Dict, Optional
+
+from app.config import settings
+
+# Matches the fixed delays the demo tasks have always used
+DEFAULT_PROFILE = {
+    "migration.generate": {"latency": "fixed:2"},
+    "migration.build": {"latency": "fixed:3"},
+    "migration.push": {"latency": "fixed:2"},
+    "migration.deploy": {"latency": "fixed:3"},
+    "migration.rollback": {"latency": "fixed:2"},
+    "discovery.connect": {"latency": "fixed:2"},
+    "analysis.software": {"latency": "fixed:2"},
+    "analysis.services": {"latency": "fixed:2"},
+}
+
+
+class SimulatedFailure(Exception):
+    """Raised when a simulated stage is configured to fail"""
+
+
+class LatencyDistribution:
+    """
+    Parsed latency spec, in seconds:
+
+    - "zero"
+    - "fixed:<s>"
+    - "uniform:<low>,<high>"
+    - "normal:<mean>,<stddev>"      (truncated at zero)
+    - "lognormal:<median>,<sigma>"
+    - "exponential:<mean>"
+    """
+
+    KINDS = {"zero", "fixed", "uniform", "normal", "lognormal", "exponential"}
+
+    def __init__(self, spec):
+        if isinstance(spec, (int, float)):
+            spec = f"fixed:{spec}"
+        kind, _, raw_params = str(spec).partition(":")
+        kind = kind.strip().lower()
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution '{spec}'")
+        self.kind = kind
+        self.params = [float(p) for p in raw_params.split(",") if p.strip()]
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "zero":
+            return 0.0
+        if self.kind == "fixed":
+            return p[0]
+        if self.kind == "uniform":
+            return rng.uniform(p[0], p[1])
+        if self.kind == "normal":
+            return max(rng.gauss(p[0], p[1]), 0.0)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(p[0]), p[1])
+        return rng.expovariate(1.0 / p[0])
+
+
+class StageSpec:
+    def __init__(self, latency="zero", failure_rate: float = 0.0):
+        self.latency = LatencyDistribution(latency)
+        self.failure_rate = float(failure_rate)
+
+
+class Simulator:
+    """Sleeps and fails according to a per-stage profile"""
+
+    def __init__(
+        self,
+        profile: Optional[Dict[str, dict]] = None,
+        seed: Optional[int] = None,
+        time_scale: float = 1.0,
+        sleep=time.sleep,
+    ):
+        profile = DEFAULT_PROFILE if profile is None else profile
+        self.stages = {name: StageSpec(**spec) for name, spec in profile.items()}
+        self.seed = seed
+        self.time_scale = time_scale
+        self.sleep = sleep
+        self._rng = random.Random(seed)
+
+    def _spec(self, stage: str) -> StageSpec:
+        if stage in self.stages:
+            return self.stages[stage]
+        prefix = stage.split(".")[0] + ".*"
+        return self.stages.get(prefix) or self.stages.get("*") or StageSpec()
+
+    def _rng_for(self, stage: str, key) -> random.Random:
+        if self.seed is None or key is None:
+            return self._rng
+        return random.Random(f"{self.seed}:{stage}:{key}")
+
+    def stage(self, stage: str, key=None) -> float:
+        """
+        Simulate one stage: sleep for a sampled latency, then maybe fail.
+
+        key identifies the unit of work (e.g. migration id) for deterministic
+        per-item outcomes. Returns the simulated latency in seconds.
+        """
+        spec = self._spec(stage)
+        rng = self._rng_for(stage, key)
+        latency = spec.latency.sample(rng) * self.time_scale
+        if latency > 0:
+            self.sleep(latency)
+        if spec.failure_rate and rng.random() < spec.failure_rate:
+            raise SimulatedFailure(f"Simulated failure in stage '{stage}'")
+        return latency
+
+
+def load_profile(raw: str) -> Optional[Dict[str, dict]]:
+    """Parse SIMULATION_PROFILE: inline JSON, a path to a JSON file, or empty"""
+    raw = (raw or "").strip()
+    if not raw:
+        return None
+    if not raw.startswith("{"):
+        with open(raw) as f:
+            raw = f.read()
+    return json.loads(raw)
+
+
+_simulator = None
+
+
+def get_simulator() -> Simulator:
+    """Process-wide simulator built from settings"""
+    global _simulator
+    if _simulator is None:
+        _simulator = Simulator(
+            profile=load_profile(settings.SIMULATION_PROFILE),
+            seed=settings.SIMULATION_SEED,
+            time_scale=settings.SIMULATION_TIME_SCALE,
+        )
+    return _simulator
+
+
+def set_simulator(simulator: Optional[Simulator]):
+    """Replace the process-wide simulator (None rebuilds it from settings)"""
+    global _simulator
+    _simulator = simulator
@@ -0,0 +1,277 @@
+"""
+Per-Target Throttling
+Distributed limits on how hard workers hit one external system
+(hypervisor/vCenter, container registry, target cluster), shared by every
+worker through Redis.
+
+Each target has a token bucket (sustained requests per second plus a
+burst) and a concurrency cap. Both are checked and taken in one Lua
+script, so workers never race each other. Concurrency slots are leases
+that expire if a worker dies while holding one; holders renew them from a
+heartbeat thread, so long runs keep their slot. If Redis is unreachable
+work proceeds unthrottled. A task that can't acquire
+a slot is not blocked waiting for it: it retries later with a countdown,
+via defer(). Tokens taken from targets before a later one refused are
+refunded.
+"""
+
+import logging
+import random
+import threading
+import uuid
+from contextlib import ExitStack, contextmanager
+from typing import Iterable, Optional, Tuple
+
+from app.config import settings
+from app.lazy import lazy_import
+from app.redis_client import get_redis
+
+redis = lazy_import("redis")
+
+logger = logging.getLogger(__name__)
+
+HYPERVISOR = "hypervisor"
+REGISTRY = "registry"
+CLUSTER = "cluster"
+
+# KEYS: bucket hash, slots sorted set
+# ARGV: rate/s, burst, max concurrent, lease ms, lease id
+# Returns {1, 0} when acquired, else {0, milliseconds until worth retrying}
+_ACQUIRE = """
+-- Lets TIME precede writes on Redis < 5; a no-op (or absent) elsewhere
+if redis.replicate_commands then redis.replicate_commands() end
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local rate = tonumber(ARGV[1]) / 1000
+local burst = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local lease_ms = tonumber(ARGV[4])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+if limit > 0 and redis.call('ZCARD', KEYS[2]) >= limit then
+    local first = redis.call('ZRANGE', KEYS[2], 0, 0, 'WITHSCORES')
+    return {0, math.max(tonumber(first[2]) - now, 1)}
+end
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(state[1]) or burst
+local at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(now - at, 0) * rate)
+if tokens < 1 then
+    return {0, math.ceil((1 - tokens) / rate)}
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate) + 1000)
+if limit > 0 then
+    redis.call('ZADD', KEYS[2], now + lease_ms, ARGV[5])
+    redis.call('PEXPIRE', KEYS[2], lease_ms)
+end
+return {1, 0}
+"""
+
+
+# KEYS: slots sorted set; ARGV: lease ms, lease id
+# Returns 1 if the lease was still held and is extended, else 0
+_RENEW = """
+if redis.replicate_commands then redis.replicate_commands() end
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+if not redis.call('ZSCORE', KEYS[1], ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], 'XX', now + tonumber(ARGV[1]), ARGV[2])
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[1]))
+return 1
+"""
+
+# KEYS: bucket hash; ARGV: burst
+_REFUND = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    redis.call('HSET', KEYS[1], 'tokens', math.min(tokens + 1, tonumber(ARGV[1])))
+end
+return 1
+"""
+
+
+class Throttled(Exception):
+    """A target is at its rate or concurrency limit"""
+
+    def __init__(self, kind: str, target: str, retry_after: float):
+        super().__init__(f"{kind} {target} is busy, retry in {retry_after:.1f}s")
+        self.kind = kind
+        self.target = target
+        self.retry_after = retry_after
+
+
+def limits_for(kind: str) -> Tuple[float, int, int]:
+    """(requests per second, burst, max concurrent) for a kind of target"""
+    prefix = kind.upper()
+    return (
+        getattr(settings, f"{prefix}_RATE_PER_SECOND"),
+        getattr(settings, f"{prefix}_BURST"),
+        getattr(settings, f"{prefix}_MAX_CONCURRENT"),
+    )
+
+
+class TargetThrottle:
+    """Token buckets and concurrency slots per (kind, target) in Redis"""
+
+    def __init__(self, redis_client, lease_seconds: float = 3600.0):
+        self.redis = redis_client
+        self.lease_seconds = lease_seconds
+        self._acquire = redis_client.register_script(_ACQUIRE)
+        self._renew = redis_client.register_script(_RENEW)
+        self._refund = redis_client.register_script(_REFUND)
+
+    @staticmethod
+    def keys(kind: str, target: str) -> Tuple[str, str]:
+        # One hash tag, so both keys live on the same Redis Cluster slot
+        tag = f"{{throttle:{kind}:{target}}}"
+        return f"{tag}:bucket", f"{tag}:slots"
+
+    def acquire(self, kind: str, target: str) -> Optional[str]:
+        """Take a token and a slot, returning the lease id; raises Throttled"""
+        rate, burst, limit = limits_for(kind)
+        lease = uuid.uuid4().hex
+        acquired, wait_ms = self._acquire(
+            keys=self.keys(kind, target),
+            args=[rate, max(burst, 1), limit, int(self.lease_seconds * 1000), lease],
+        )
+        if not acquired:
+            raise Throttled(kind, target, int(wait_ms) / 1000)
+        return lease if limit > 0 else None
+
+    def release(self, kind: str, target: str, lease: Optional[str]):
+        if lease is not None:
+            self.redis.zrem(self.keys(kind, target)[1], lease)
+
+    def renew(self, kind: str, target: str, lease: str) -> bool:
+        """Extend a held lease; False if it had already expired"""
+        return bool(
+            self._renew(
+                keys=[self.keys(kind, target)[1]],
+                args=[int(self.lease_seconds * 1000), lease],
+            )
+        )
+
+    def refund(self, kind: str, target: str):
+        """Give back a token that was taken for work that never ran"""
+        _, burst, _ = limits_for(kind)
+        self._refund(keys=[self.keys(kind, target)[0]], args=[max(burst, 1)])
+
+    @contextmanager
+    def hold(self, kind: str, target: str):
+        """
+        Hold a token and slot for the block, yielding (taken, lease id);
+        taken is False when Redis was unavailable and nothing was checked
+        """
+        taken, lease = True, None
+        try:
+            lease = self.acquire(kind, target)
+        except redis.RedisError as e:
+            # Fail open: an unavailable Redis must not stop all work
+            logger.warning(f"Throttle unavailable for {kind} {target}: {e}")
+            taken = False
+        try:
+            yield taken, lease
+        finally:
+            try:
+                self.release(kind, target, lease)
+            except Exception as e:  # the lease expires on its own
+                logger.warning(f"Could not release {kind} {target} slot: {e}")
+
+    @contextmanager
+    def heartbeat(self, leases: Iterable[Tuple[str, str, str]]):
+        """Renew (kind, target, lease) leases every third of their length"""
+        leases = [lease for lease in leases if lease[2] is not None]
+        if not leases:
+            yield
+            return
+        stopped = threading.Event()
+
+        def beat():
+            while not stopped.wait(self.lease_seconds / 3):
+                for kind, target, lease in leases:
+                    try:
+                        if not self.renew(kind, target, lease):
+                            logger.warning(f"Lost {kind} {target} slot, lease expired")
+                    except Exception as e:  # retried on the next beat
+                        logger.warning(f"Could not renew {kind} {target} slot: {e}")
+
+        thread = threading.Thread(target=beat, name="throttle-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+
+_throttle = None
+
+
+def get_throttle() -> TargetThrottle:
+    global _throttle
+    if _throttle is None:
+        _throttle = TargetThrottle(get_redis(), settings.THROTTLE_LEASE_SECONDS)
+    return _throttle
+
+
+@contextmanager
+def throttled(targets: Iterable[Tuple[str, Optional[str]]]):
+    """
+    Hold a slot on every (kind, target) for the duration of the block,
+    renewing the leases while it runs.
+
+    Slots and tokens taken before a target refuses are given back before
+    Throttled propagates. Targets that are None are skipped; with
+    THROTTLE_ENABLED off nothing is checked.
+    """
+    if not settings.THROTTLE_ENABLED:
+        yield
+        return
+    throttle = get_throttle()
+    with ExitStack() as stack:
+        held = []
+        try:
+            for kind, target in targets:
+                if target:
+                    target = str(target).lower()
+                    taken, lease = stack.enter_context(throttle.hold(kind, target))
+                    if taken:
+                        held.append((kind, target, lease))
+        except Throttled:
+            for kind, target, _ in held:
+                try:
+                    throttle.refund(kind, target)
+                except Exception as e:  # the bucket refills on its own
+                    logger.warning(f"Could not refund {kind} {target} token: {e}")
+            raise
+        with throttle.heartbeat(held):
+            yield
+
+
+def deferrals_left(task) -> bool:
+    """Whether defer() may still retry the task"""
+    return task.request.retries < settings.THROTTLE_MAX_DEFERRALS
+
+
+def defer(task, throttled_error: Throttled):
+    """
+    Retry a bound task once the target should have capacity again.
+
+    Random extra delay spreads out tasks deferred by the same target.
+    Callers check deferrals_left() first and fail the task themselves once
+    it is False: retry() would re-raise the Throttled error from inside
+    their except clause, skipping their failure handling.
+    """
+    countdown = max(throttled_error.retry_after, 1.0)
+    countdown += random.uniform(0, countdown)
+    logger.info(f"Deferring {task.name}: {throttled_error}")
+    raise task.retry(
+        exc=throttled_error,
+        countdown=countdown,
+        max_retries=settings.THROTTLE_MAX_DEFERRALS,
+    )
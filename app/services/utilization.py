@@ -0,0 +1,391 @@
+"""
+VM Utilization Time Series
+Ingests batched samples as packed array chunks, downsamples them into
+5-minute and hourly rollups (min/avg/p95/max) with NumPy, and bounds raw
+retention.
+"""
+
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+
+from app.lazy import lazy_import
+from app.models.utilization import UtilizationChunk, UtilizationRollup
+
+np = lazy_import("numpy")
+
+METRICS = ("cpu", "memory", "disk", "network")
+RESOLUTIONS = {"5m": 300, "1h": 3600}
+STATS = ("count", "min", "avg", "p95", "max")
+
+
+class InvalidSeries(ValueError):
+    """A submitted series is malformed"""
+
+
+def pack_series(vm_id: int, timestamps, values: Dict[str, Optional[list]]) -> dict:
+    """Row values for one UtilizationChunk from epoch-second timestamps"""
+    ts = np.asarray(timestamps, dtype=np.float64)
+    if ts.ndim != 1 or not len(ts):
+        raise InvalidSeries(f"VM {vm_id}: timestamps must be a non-empty list")
+    start = int(ts.min())
+    offsets = ts.astype(np.int64) - start
+    if offsets.max() > np.iinfo(np.uint32).max:
+        raise InvalidSeries(f"VM {vm_id}: batch spans too much time")
+
+    row = {
+        "vm_id": vm_id,
+        "start_epoch": start,
+        "end_epoch": int(ts.max()),
+        "sample_count": len(ts),
+        "offsets": offsets.astype(np.uint32).tobytes(),
+    }
+    for metric in METRICS:
+        series = values.get(metric)
+        if series is None:
+            row[metric] = None
+            continue
+        if len(series) != len(ts):
+            raise InvalidSeries(
+                f"VM {vm_id}: {metric} has {len(series)} values "
+                f"for {len(ts)} timestamps"
+            )
+        row[metric] = np.asarray(series, dtype=np.float32).tobytes()
+    return row
+
+
+def ingest(db, rows: List[dict]) -> int:
+    """Insert packed chunks in one statement; the caller commits"""
+    if rows:
+        db.execute(insert(UtilizationChunk), rows)
+    return sum(row["sample_count"] for row in rows)
+
+
+def unpack(chunk):
+    """(epoch seconds int64, {metric: float64 values or None}) of a chunk"""
+    ts = np.frombuffer(chunk.offsets, dtype=np.uint32).astype(np.int64)
+    ts += chunk.start_epoch
+    values = {}
+    for metric in METRICS:
+        raw = getattr(chunk, metric)
+        values[metric] = (
+            None
+            if raw is None
+            else np.frombuffer(raw, dtype=np.float32).astype(np.float64)
+        )
+    return ts, values
+
+
+def aggregate(ts: "np.ndarray", values: "np.ndarray", width: int) -> dict:
+    """
+    Bucket samples into fixed windows of width seconds.
+
+    Returns equal-length arrays: bucket (start epoch), count, min, avg, p95
+    (linear interpolation) and max. NaN samples are ignored.
+    """
+    keep = ~np.isnan(values)
+    ts, values = ts[keep], values[keep]
+    if not len(ts):
+        return {"bucket": np.array([], dtype=np.int64)}
+
+    buckets = ts // width * width
+    # Sort by bucket, then value, so each bucket is a sorted run
+    order = np.lexsort((values, buckets))
+    buckets, values = buckets[order], values[order]
+
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, len(values)])
+    ends = starts + counts - 1
+
+    position = (counts - 1) * 0.95
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, counts - 1)
+    fraction = position - lower
+    p95 = values[starts + lower] * (1 - fraction) + values[starts + upper] * fraction
+
+    return {
+        "bucket": buckets[starts],
+        "count": counts,
+        "min": values[starts],
+        "avg": np.add.reduceat(values, starts) / counts,
+        "p95": p95,
+        "max": values[ends],
+    }
+
+
+def _load_window(db, vm_id: int, start: int, end: int, pending_ids=()):
+    """
+    All raw samples of a VM in [start, end), plus a mask of the samples
+    that come from the pending (not yet rolled up) chunks
+    """
+    chunks = db.execute(
+        select(UtilizationChunk).where(
+            UtilizationChunk.vm_id == vm_id,
+            UtilizationChunk.start_epoch < end,
+            UtilizationChunk.end_epoch >= start,
+        )
+    ).scalars()
+
+    ts_parts, pending_parts = [], []
+    value_parts = {metric: [] for metric in METRICS}
+    for chunk in chunks:
+        ts, values = unpack(chunk)
+        ts_parts.append(ts)
+        pending_parts.append(np.full(len(ts), chunk.id in pending_ids))
+        for metric in METRICS:
+            series = values[metric]
+            value_parts[metric].append(
+                np.full(len(ts), np.nan) if series is None else series
+            )
+
+    if not ts_parts:
+        return np.array([], dtype=np.int64), {}, np.array([], dtype=bool)
+    ts = np.concatenate(ts_parts)
+    keep = (ts >= start) & (ts < end)
+    return (
+        ts[keep],
+        {metric: np.concatenate(parts)[keep] for metric, parts in value_parts.items()},
+        np.concatenate(pending_parts)[keep],
+    )
+
+
+def _hour_ranges(hours) -> List[tuple]:
+    """Sorted hour starts collapsed into contiguous [start, end) ranges"""
+    width = RESOLUTIONS["1h"]
+    ranges = []
+    for hour in sorted(hours):
+        if ranges and ranges[-1][1] == hour:
+            ranges[-1][1] = hour + width
+        else:
+            ranges.append([hour, hour + width])
+    return [tuple(r) for r in ranges]
+
+
+def _merge(existing, stats: dict, i: int) -> dict:
+    """
+    Fold new samples into a rollup whose raw samples are partly purged.
+
+    The combined p95 is at most the larger of the two, which is what is
+    kept: an upper bound is the safe side for right-sizing.
+    """
+    added = int(stats["count"][i])
+    count = existing["count"] + added
+    return {
+        "count": count,
+        "min": min(existing["min"], float(stats["min"][i])),
+        "avg": (existing["avg"] * existing["count"] + float(stats["avg"][i]) * added)
+        / count,
+        "p95": max(existing["p95"], float(stats["p95"][i])),
+        "max": max(existing["max"], float(stats["max"][i])),
+    }
+
+
+def _rollup_rows(vm_id: int, ts, values: dict, pending, existing: dict) -> list:
+    """
+    Rollup rows for a window from its loaded samples and existing rollups.
+
+    A bucket is rebuilt from raw samples when all the samples of its
+    existing rollup are still there; once raw retention has dropped some
+    of them, only the pending samples are merged into the existing row.
+    Existing buckets without any raw samples left are kept as they are.
+    """
+    rows = dict(existing)
+    for resolution, width in RESOLUTIONS.items():
+        for metric, series in values.items():
+            full = aggregate(ts, series, width)
+            old_buckets = ts[~pending & ~np.isnan(series)] // width * width
+            old_buckets, old_counts = np.unique(old_buckets, return_counts=True)
+            old_count = dict(zip(old_buckets.tolist(), old_counts.tolist()))
+            new = None
+
+            for i, bucket in enumerate(full["bucket"].tolist()):
+                key = (resolution, metric, bucket)
+                row = existing.get(key)
+                if row is None or row["count"] <= old_count.get(bucket, 0):
+                    rows[key] = {stat: full[stat][i].item() for stat in STATS}
+                    continue
+                if new is None:
+                    new = aggregate(ts[pending], series[pending], width)
+                    new_index = {b: j for j, b in enumerate(new["bucket"].tolist())}
+                if bucket in new_index:
+                    rows[key] = _merge(row, new, new_index[bucket])
+    return [
+        {
+            "vm_id": vm_id,
+            "resolution": resolution,
+            "metric": metric,
+            "bucket_epoch": bucket,
+            **stats,
+        }
+        for (resolution, metric, bucket), stats in rows.items()
+    ]
+
+
+def rollup_pending(db, max_chunks: int = 1000) -> dict:
+    """
+    Recompute the rollups of the hours that chunks not yet rolled up have
+    samples in.
+
+    Those buckets are rebuilt from all their raw samples, so late or
+    out-of-order batches give the same result as in-order ones. Samples
+    landing in a bucket whose raw data has already been purged are merged
+    into its rollup instead, so retention never shrinks history.
+    """
+    pending = (
+        db.execute(
+            select(UtilizationChunk)
+            .where(UtilizationChunk.rolled_up.is_(False))
+            .order_by(UtilizationChunk.id)
+            .limit(max_chunks)
+        )
+        .scalars()
+        .all()
+    )
+    if not pending:
+        return {"chunks": 0, "rollups": 0}
+
+    hour = RESOLUTIONS["1h"]
+    touched = {}
+    for chunk in pending:
+        ts, _ = unpack(chunk)
+        touched.setdefault(chunk.vm_id, set()).update((ts // hour * hour).tolist())
+    pending_ids = {chunk.id for chunk in pending}
+
+    written = 0
+    for vm_id, hours in touched.items():
+        for start, end in _hour_ranges(hours):
+            ts, values, from_pending = _load_window(db, vm_id, start, end, pending_ids)
+            in_window = (
+                UtilizationRollup.vm_id == vm_id,
+                UtilizationRollup.bucket_epoch >= start,
+                UtilizationRollup.bucket_epoch < end,
+            )
+            existing = {
+                (row.resolution, row.metric, row.bucket_epoch): {
+                    stat: row._mapping[stat] for stat in STATS
+                }
+                for row in db.execute(
+                    select(
+                        UtilizationRollup.resolution,
+                        UtilizationRollup.metric,
+                        UtilizationRollup.bucket_epoch,
+                        *(getattr(UtilizationRollup, stat) for stat in STATS),
+                    ).where(*in_window)
+                )
+            }
+            rows = _rollup_rows(vm_id, ts, values, from_pending, existing)
+            db.execute(delete(UtilizationRollup).where(*in_window))
+            if rows:
+                db.execute(insert(UtilizationRollup), rows)
+            written += len(rows)
+
+    db.execute(
+        update(UtilizationChunk)
+        .where(UtilizationChunk.id.in_(list(pending_ids)))
+        .values(rolled_up=True)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return {"chunks": len(pending), "rollups": written}
+
+
+def query_rollups(
+    db,
+    vm_id: int,
+    resolution: str,
+    start: int,
+    end: int,
+    metrics=METRICS,
+):
+    """Rollup rows of a VM in [start, end), ordered by metric and time"""
+    return (
+        db.execute(
+            select(UtilizationRollup)
+            .where(
+                UtilizationRollup.vm_id == vm_id,
+                UtilizationRollup.resolution == resolution,
+                UtilizationRollup.metric.in_(list(metrics)),
+                UtilizationRollup.bucket_epoch >= start,
+                UtilizationRollup.bucket_epoch < end,
+            )
+            .order_by(UtilizationRollup.metric, UtilizationRollup.bucket_epoch)
+        )
+        .scalars()
+        .all()
+    )
+
+
+def peak_p95(
+    db, vm_ids, since_epoch: int, metrics=("cpu", "memory"), batch_size: int = 5000
+) -> dict:
+    """
+    Busiest hourly p95 of each metric per VM since since_epoch, as
+    {metric: float array aligned with vm_ids}; NaN where a VM has no rollups
+    """
+    vm_ids = list(vm_ids)
+    position = {vm_id: i for i, vm_id in enumerate(vm_ids)}
+    peaks = {metric: np.full(len(vm_ids), np.nan) for metric in metrics}
+    for offset in range(0, len(vm_ids), batch_size):
+        rows = db.execute(
+            select(
+                UtilizationRollup.vm_id,
+                UtilizationRollup.metric,
+                func.max(UtilizationRollup.p95),
+            )
+            .where(
+                UtilizationRollup.vm_id.in_(vm_ids[offset : offset + batch_size]),
+                UtilizationRollup.resolution == "1h",
+                UtilizationRollup.metric.in_(list(metrics)),
+                UtilizationRollup.bucket_epoch >= since_epoch,
+            )
+            .group_by(UtilizationRollup.vm_id, UtilizationRollup.metric)
+        )
+        for vm_id, metric, p95 in rows:
+            peaks[metric][position[vm_id]] = p95
+    return peaks
+
+
+def purge_expired(
+    db,
+    now_epoch: int,
+    raw_days: int,
+    rollup_5m_days: int,
+    rollup_1h_days: int,
+    chunk_size: int = 500,
+    max_chunks: int = 200,
+) -> dict:
+    """Delete rolled-up raw chunks and rollups past their retention"""
+    raw = 0
+    for _ in range(max_chunks):
+        ids = (
+            db.execute(
+                select(UtilizationChunk.id)
+                .where(
+                    UtilizationChunk.end_epoch < now_epoch - raw_days * 86400,
+                    UtilizationChunk.rolled_up.is_(True),
+                )
+                .limit(chunk_size)
+            )
+            .scalars()
+            .all()
+        )
+        if not ids:
+            break
+        db.execute(delete(UtilizationChunk).where(UtilizationChunk.id.in_(ids)))
+        db.commit()
+        raw += len(ids)
+        if len(ids) < chunk_size:
+            break
+
+    rollups = 0
+    for resolution, days in (("5m", rollup_5m_days), ("1h", rollup_1h_days)):
+        result = db.execute(
+            delete(UtilizationRollup).where(
+                UtilizationRollup.resolution == resolution,
+                UtilizationRollup.bucket_epoch < now_epoch - days * 86400,
+            )
+        )
+        db.commit()
+        rollups += result.rowcount
+
+    return {"raw_chunks": raw, "rollups": rollups}
@@ -0,0 +1,199 @@
+"""
+Worker State Monitor
+Keeps an in-memory snapshot of Celery workers, tasks and queue lengths
+from the Celery event stream, so API endpoints don't need broadcast
+inspect calls.
+"""
+
+import logging
+import threading
+import time
+
+from celery.events.state import State
+
+from app.celery_app import celery_app, celery_queues
+from app.config import settings
+from app.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+RESERVED_STATES = {"RECEIVED"}
+ACTIVE_STATES = {"STARTED"}
+
+
+class WorkerStateMonitor:
+    """Background consumer of Celery events maintaining a cluster snapshot"""
+
+    def __init__(
+        self,
+        app,
+        queues,
+        redis_client_factory,
+        stale_after: float = 10.0,
+        queue_poll_interval: float = 2.0,
+    ):
+        self.app = app
+        self.queues = list(queues)
+        self.redis_client_factory = redis_client_factory
+        self.stale_after = stale_after
+        self.queue_poll_interval = queue_poll_interval
+
+        self.state = State()
+        self.queue_lengths = {}
+        self.connected = False
+        self.last_event_at = None
+        self.queues_polled_at = None
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._receiver = None
+        self._stopped = threading.Event()
+
+    # Lifecycle
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="celery-event-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._receiver is not None:
+            self._receiver.should_stop = True
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stopped.is_set():
+            try:
+                with self.app.connection_for_read() as connection:
+                    self._receiver = self.app.events.Receiver(
+                        connection, handlers={"*": self.handle_event}
+                    )
+                    # Called at least once a second, even without events
+                    self._receiver.on_iteration = self._poll_queues_if_due
+                    self.connected = True
+                    backoff = 1.0
+                    self._receiver.capture(limit=None, timeout=None, wakeup=True)
+            except Exception as e:
+                logger.warning(f"Celery event monitor disconnected: {str(e)}")
+            finally:
+                self.connected = False
+            self._stopped.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    # Event handling
+
+    def handle_event(self, event):
+        with self._lock:
+            self.state.event(event)
+            self.last_event_at = time.time()
+
+    def _poll_queues_if_due(self):
+        now = time.time()
+        if self.queues_polled_at and now - self.queues_polled_at < (
+            self.queue_poll_interval
+        ):
+            return
+        self.poll_queues()
+
+    def poll_queues(self):
+        try:
+            pipe = self.redis_client_factory().pipeline(transaction=False)
+            for queue in self.queues:
+                pipe.llen(queue)
+            lengths = dict(zip(self.queues, pipe.execute()))
+        except Exception as e:
+            logger.warning(f"Could not read queue lengths: {str(e)}")
+            return
+
+        with self._lock:
+            self.queue_lengths = lengths
+            self.queues_polled_at = time.time()
+
+    # Snapshot
+
+    def freshness(self):
+        """Describe how current the snapshot is"""
+        now = time.time()
+        age = None if self.last_event_at is None else now - self.last_event_at
+        return {
+            "source": "events",
+            "connected": self.connected,
+            "last_event_at": self.last_event_at,
+            "age_seconds": None if age is None else round(age, 3),
+            "queues_polled_at": self.queues_polled_at,
+            "stale": age is None or age > self.stale_after,
+        }
+
+    def tasks_by_worker(self):
+        """Active, reserved and scheduled tasks grouped by worker hostname"""
+        active, reserved, scheduled = {}, {}, {}
+        with self._lock:
+            for uuid, task in self.state.tasks.items():
+                if task.worker is None:
+                    continue
+                info = {
+                    "id": uuid,
+                    "name": task.name,
+                    "args": task.args,
+                    "kwargs": task.kwargs,
+                    "received": task.received,
+                    "started": task.started,
+                }
+                hostname = task.worker.hostname
+                if task.state in ACTIVE_STATES:
+                    active.setdefault(hostname, []).append(info)
+                elif task.state in RESERVED_STATES:
+                    target = scheduled if task.eta else reserved
+                    target.setdefault(hostname, []).append({**info, "eta": task.eta})
+        return {"active": active, "reserved": reserved, "scheduled": scheduled}
+
+    def workers(self):
+        """Known workers with liveness and load figures from heartbeats"""
+        with self._lock:
+            return {
+                hostname: {
+                    "alive": worker.alive,
+                    "last_heartbeat": (
+                        worker.heartbeats[-1] if worker.heartbeats else None
+                    ),
+                    "active": worker.active,
+                    "processed": worker.processed,
+                    "loadavg": worker.loadavg,
+                    "freq": worker.freq,
+                    "sw_ver": worker.sw_ver,
+                }
+                for hostname, worker in self.state.workers.items()
+            }
+
+    def queues_snapshot(self):
+        with self._lock:
+            return dict(self.queue_lengths)
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_worker_monitor():
+    """Return the process-wide monitor, starting it on first use"""
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = WorkerStateMonitor(
+                    celery_app,
+                    celery_queues(),
+                    lambda: get_redis(settings.CELERY_BROKER_URL),
+                    stale_after=settings.WORKER_STATE_STALE_AFTER,
+                )
+                _monitor.start()
+    return _monitor
+
+
+def stop_worker_monitor():
+    if _monitor is not None:
+        _monitor.stop()
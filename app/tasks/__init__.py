@@ -1,3 +1,6 @@
+from app.tasks.maintenance import cleanup_old_tasks
 from app.tasks.migration_tasks import (rollback_migration_task,
                                        run_migration_task)
+from app.tasks.outbox_tasks import dispatch_outbox
+from app.tasks.utilization_tasks import rollup_utilization
 from app.tasks.vm_tasks import analyze_vm_task, discover_vms_task
@@ -0,0 +1,290 @@
+"""
+Maintenance Tasks
+Periodic housekeeping scheduled by Celery beat
+"""
+
+import gzip
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select
+
+from app.celery_app import celery_app
+from app.config import settings
+from app.database import SessionLocal
+from app.models.event import MigrationEvent
+from app.models.migration import Migration, MigrationArchive, MigrationStatus
+from app.models.outbox import OutboxMessage
+from app.models.revision import ArtifactRevision
+from app.models.types import raw_column
+from app.redis_client import get_redis
+from app.services.utilization import purge_expired
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = (
+    MigrationStatus.COMPLETED,
+    MigrationStatus.FAILED,
+    MigrationStatus.CANCELLED,
+)
+RESULT_KEY_PATTERN = "celery-task-meta-*"
+
+
+def _as_dict(obj) -> dict:
+    row = {}
+    for column in obj.__table__.columns:
+        value = getattr(obj, column.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif hasattr(value, "value"):
+            value = value.value
+        row[column.key] = value
+    return row
+
+
+def _row_payload(migration: Migration, events=(), revisions=()) -> bytes:
+    """
+    Full migration row, its event history and its artifact revisions (as
+    stored: keyframes and line deltas) as gzip-compressed JSON
+    """
+    row = _as_dict(migration)
+    row["events"] = [_as_dict(event) for event in events]
+    row["revisions"] = [_as_dict(revision) for revision in revisions]
+    return gzip.compress(json.dumps(row).encode(), mtime=0)
+
+
+def _stored_sizes(db, ids) -> dict:
+    """
+    Bytes held by the large text columns of each row, as stored: artifacts
+    are counted compressed, not as the decoded text
+    """
+    columns = [
+        raw_column(column)
+        for column in (
+            Migration.dockerfile_content,
+            Migration.kubernetes_manifest,
+            Migration.docker_compose,
+            Migration.error_message,
+        )
+    ]
+    return {
+        migration_id: sum(len(value.encode()) for value in values if value)
+        for migration_id, *values in db.execute(
+            select(Migration.id, *columns).where(Migration.id.in_(ids))
+        )
+    }
+
+
+def archive_old_migrations(db, cutoff: datetime, chunk_size: int, max_chunks: int):
+    """
+    Move finished migrations last touched before cutoff, with their event
+    history and artifact revisions, into the archive.
+
+    Each chunk is archived, deleted and committed on its own so row locks
+    are held only for chunk_size rows at a time. Returns a report dict.
+    """
+    finished_at = func.coalesce(
+        Migration.completed_at, Migration.updated_at, Migration.created_at
+    )
+    report = {"archived": 0, "chunks": 0, "bytes_reclaimed": 0, "bytes_archived": 0}
+
+    for _ in range(max_chunks):
+        query = (
+            select(Migration)
+            .where(Migration.status.in_(FINAL_STATUSES), finished_at < cutoff)
+            .order_by(Migration.id)
+            .limit(chunk_size)
+        )
+        if db.get_bind().dialect.name == "postgresql":
+            # Concurrent maintenance runs take disjoint chunks
+            query = query.with_for_update(skip_locked=True)
+
+        migrations = db.execute(query).scalars().all()
+        if not migrations:
+            break
+
+        ids = [m.id for m in migrations]
+        events = {}
+        for event in db.execute(
+            select(MigrationEvent)
+            .where(MigrationEvent.migration_id.in_(ids))
+            .order_by(MigrationEvent.created_at, MigrationEvent.id)
+        ).scalars():
+            events.setdefault(event.migration_id, []).append(event)
+        revisions = {}
+        for revision in db.execute(
+            select(ArtifactRevision)
+            .where(ArtifactRevision.migration_id.in_(ids))
+            .order_by(ArtifactRevision.migration_id, ArtifactRevision.revision)
+        ).scalars():
+            revisions.setdefault(revision.migration_id, []).append(revision)
+
+        sizes = _stored_sizes(db, ids)
+        archive_rows = []
+        for migration in migrations:
+            payload = _row_payload(
+                migration,
+                events.get(migration.id, ()),
+                revisions.get(migration.id, ()),
+            )
+            archive_rows.append(
+                {
+                    "id": migration.id,
+                    "vm_id": migration.vm_id,
+                    "name": migration.name,
+                    "target_platform": (
+                        migration.target_platform.value
+                        if migration.target_platform
+                        else None
+                    ),
+                    "status": migration.status.value,
+                    "created_at": migration.created_at,
+                    "completed_at": migration.completed_at,
+                    "payload": payload,
+                }
+            )
+            report["bytes_reclaimed"] += sizes.get(migration.id, 0)
+            report["bytes_archived"] += len(payload)
+
+        db.execute(insert(MigrationArchive), archive_rows)
+        db.query(MigrationEvent).filter(MigrationEvent.migration_id.in_(ids)).delete(
+            synchronize_session=False
+        )
+        db.query(ArtifactRevision).filter(
+            ArtifactRevision.migration_id.in_(ids)
+        ).delete(synchronize_session=False)
+        db.query(Migration).filter(Migration.id.in_(ids)).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        db.expunge_all()
+
+        report["archived"] += len(migrations)
+        report["chunks"] += 1
+        if len(migrations) < chunk_size:
+            break
+
+    return report
+
+
+def purge_sent_outbox(db, cutoff: datetime, chunk_size: int, max_chunks: int) -> int:
+    """Delete outbox messages published before cutoff, in chunks"""
+    deleted = 0
+    for _ in range(max_chunks):
+        ids = (
+            db.execute(
+                select(OutboxMessage.id)
+                .where(OutboxMessage.sent_at < cutoff)
+                .order_by(OutboxMessage.id)
+                .limit(chunk_size)
+            )
+            .scalars()
+            .all()
+        )
+        if not ids:
+            break
+        db.query(OutboxMessage).filter(OutboxMessage.id.in_(ids)).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        deleted += len(ids)
+        if len(ids) < chunk_size:
+            break
+    return deleted
+
+
+def purge_stale_results(redis_client, batch_size: int = 500):
+    """
+    Delete Celery result keys that never got an expiry.
+
+    Results are written with result_expires, so keys without a TTL are
+    leftovers (e.g. from older configurations) that would live forever.
+    """
+    report = {"scanned": 0, "deleted": 0, "bytes_reclaimed": 0}
+    batch = []
+
+    def flush():
+        pipe = redis_client.pipeline(transaction=False)
+        for key in batch:
+            pipe.ttl(key)
+            pipe.strlen(key)
+        results = pipe.execute()
+        stale = [
+            (key, size)
+            for key, ttl, size in zip(batch, results[::2], results[1::2])
+            if ttl == -1
+        ]
+        if stale:
+            redis_client.delete(*[key for key, _ in stale])
+            report["deleted"] += len(stale)
+            report["bytes_reclaimed"] += sum(size for _, size in stale)
+        batch.clear()
+
+    for key in redis_client.scan_iter(match=RESULT_KEY_PATTERN, count=batch_size):
+        report["scanned"] += 1
+        batch.append(key)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return report
+
+
+@celery_app.task(name="app.tasks.maintenance.cleanup_old_tasks")
+def cleanup_old_tasks(retention_days: int = None):
+    """Archive old finished migrations and purge expired data and results"""
+    retention_days = retention_days or settings.MAINTENANCE_RETENTION_DAYS
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=retention_days)
+
+    db = SessionLocal()
+    try:
+        migrations = archive_old_migrations(
+            db,
+            cutoff,
+            chunk_size=settings.MAINTENANCE_CHUNK_SIZE,
+            max_chunks=settings.MAINTENANCE_MAX_CHUNKS,
+        )
+        outbox_deleted = purge_sent_outbox(
+            db,
+            now - timedelta(hours=settings.OUTBOX_RETENTION_HOURS),
+            chunk_size=settings.MAINTENANCE_CHUNK_SIZE,
+            max_chunks=settings.MAINTENANCE_MAX_CHUNKS,
+        )
+        utilization = purge_expired(
+            db,
+            int(now.timestamp()),
+            raw_days=settings.UTILIZATION_RAW_RETENTION_DAYS,
+            rollup_5m_days=settings.UTILIZATION_5M_RETENTION_DAYS,
+            rollup_1h_days=settings.UTILIZATION_1H_RETENTION_DAYS,
+            chunk_size=settings.MAINTENANCE_CHUNK_SIZE,
+            max_chunks=settings.MAINTENANCE_MAX_CHUNKS,
+        )
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    results = {"scanned": 0, "deleted": 0, "bytes_reclaimed": 0}
+    if settings.CELERY_RESULT_BACKEND.startswith("redis"):
+        try:
+            results = purge_stale_results(get_redis(settings.CELERY_RESULT_BACKEND))
+        except Exception as e:
+            logger.warning(f"Could not purge stale task results: {str(e)}")
+
+    report = {
+        "cutoff": cutoff.isoformat(),
+        "migrations": migrations,
+        "outbox_deleted": outbox_deleted,
+        "utilization": utilization,
+        "results": results,
+        "bytes_reclaimed": migrations["bytes_reclaimed"] + results["bytes_reclaimed"],
+    }
+    logger.info(
+        f"Maintenance archived {migrations['archived']} migrations, deleted "
+        f"{results['deleted']} stale results, reclaimed "
+        f"{report['bytes_reclaimed']} bytes"
+    )
+    return report
@@ -4,18 +4,151 @@ Migration Tasks
 
 import logging
 import time
+from contextlib import ExitStack
 from datetime import datetime
 
 from celery import shared_task
+from sqlalchemy import select
 
 from app.celery_app import celery_app
 from app.database import SessionLocal
+from app.metrics import track_migration_stage
 from app.models.migration import Migration, MigrationStatus
 from app.models.vm import VirtualMachine, VMStatus
 from app.services.artifact_generator import ArtifactGenerator
+from app.services.breakers import call_with_retry
+from app.services.concurrency import compare_and_set
+from app.services.eta import PIPELINE, observe_stage, segment_for
+from app.services.migration_events import record_event, seconds_since
+from app.services.revisions import ARTIFACT_COLUMNS, record_revision
+from app.services.rightsizing import resources_for_vm
+from app.services.simulation import get_simulator
+from app.services.throttle import (CLUSTER, REGISTRY, Throttled, defer,
+                                   deferrals_left, throttled)
 
 logger = logging.getLogger(__name__)
 
+CAS_ATTEMPTS = 5
+
+
+class MigrationCancelled(Exception):
+    """The migration was cancelled while its task was running"""
+
+
+class MigrationProgress:
+    """
+    Writes task progress with compare-and-swap on the migration version.
+
+    Only the columns passed to update() are written. If another writer got
+    in first, the row is re-read: a cancel stops the task, anything else is
+    retried on top of the new version. Status changes are recorded in the
+    event log in the same transaction.
+    """
+
+    def __init__(
+        self,
+        db,
+        migration_id: int,
+        version: int,
+        status=None,
+        status_since=None,
+        segment=None,
+    ):
+        self.db = db
+        self.migration_id = migration_id
+        self.version = version
+        self.status = status
+        self.segment = segment
+        self._status_seconds = lambda: seconds_since(status_since)
+
+    def update(self, **values):
+        if values.get("status") not in (None, self.status):
+            values["stage_started_at"] = datetime.utcnow()
+        for _ in range(CAS_ATTEMPTS):
+            if compare_and_set(
+                self.db, Migration, self.migration_id, self.version, **values
+            ):
+                self._record_transition(values)
+                self._record_artifacts(values)
+                self.db.commit()
+                self.version += 1
+                return
+            self.db.rollback()
+
+            row = self.db.execute(
+                select(Migration.status, Migration.version).where(
+                    Migration.id == self.migration_id
+                )
+            ).first()
+            if row is None or row.status == MigrationStatus.CANCELLED:
+                raise MigrationCancelled(f"Migration {self.migration_id} was cancelled")
+            self.version = row.version
+
+        raise RuntimeError(
+            f"Migration {self.migration_id} kept changing, gave up writing progress"
+        )
+
+    def _record_artifacts(self, values):
+        artifacts = {
+            name: values[column]
+            for name, column in ARTIFACT_COLUMNS.items()
+            if column in values
+        }
+        if artifacts:
+            record_revision(self.db, self.migration_id, artifacts)
+
+    def _record_transition(self, values):
+        status = values.get("status")
+        if status is None or status == self.status:
+            return
+        seconds = self._status_seconds()
+        record_event(
+            self.db,
+            self.migration_id,
+            status,
+            from_status=self.status,
+            from_status_seconds=seconds,
+            progress_percent=values.get("progress_percent"),
+            message=values.get("status_message"),
+        )
+        # Only stages that ran to completion feed the ETA statistics
+        if (
+            self.segment is not None
+            and seconds is not None
+            and self.status in PIPELINE
+            and status not in (MigrationStatus.FAILED, MigrationStatus.CANCELLED)
+        ):
+            observe_stage(self.db, self.status, seconds, self.segment)
+        self.status = status
+        entered_at = time.monotonic()
+        self._status_seconds = lambda: time.monotonic() - entered_at
+
+
+def _fail(db, progress, error):
+    """Mark the migration failed, unless it was cancelled meanwhile"""
+    if progress is None:
+        return
+    db.rollback()
+    try:
+        progress.update(
+            status=MigrationStatus.FAILED,
+            error_message=str(error),
+            status_message="Migration failed",
+        )
+    except MigrationCancelled:
+        pass
+
+
+def _migration_targets(migration):
+    """External systems a migration pushes to and deploys on"""
+    return [
+        (REGISTRY, migration.registry_url or "default"),
+        (
+            CLUSTER,
+            f"{migration.target_platform.value}/{migration.target_namespace or 'default'}",
+        ),
+    ]
+
 
 @celery_app.task(bind=True, name="run_migration")
 def run_migration_task(self, migration_id: int):
@@ -25,15 +158,33 @@ def run_migration_task(self, migration_id: int):
     2. Build container image
     3. Push to registry
     4. Deploy to target platform
+
+    A run deferred by a throttle or open breaker resumes at its stage.
     """
     logger.info(f"Starting migration {migration_id}")
 
     db = SessionLocal()
+    migration = progress = None
+    slots = ExitStack()
 
     try:
         migration = db.query(Migration).filter(Migration.id == migration_id).first()
         if not migration:
             raise ValueError(f"Migration with id {migration_id} not found")
+        if migration.status == MigrationStatus.CANCELLED:
+            raise MigrationCancelled(f"Migration {migration_id} was cancelled")
+        progress = MigrationProgress(
+            db,
+            migration_id,
+            migration.version,
+            status=migration.status,
+            status_since=migration.stage_started_at or migration.started_at,
+        )
+        # Held for the whole run, so a registry or cluster only ever sees
+        # its configured number of concurrent migrations
+        targets = _migration_targets(migration)
+        slots.enter_context(throttled(targets))
+        (_, registry), (_, cluster) = targets
 
         vm = (
             db.query(VirtualMachine)
@@ -43,80 +194,122 @@ def run_migration_task(self, migration_id: int):
         if not vm:
             raise ValueError(f"VM with id {migration.vm_id} not found")
 
-        # Step 1: Generate Artifacts (0-25%)
-        self.update_state(
-            state="PROGRESS",
-            meta={
-                "current": 5,
-                "total": 100,
-                "status": "Generating container artifacts...",
-            },
+        progress.segment = segment_for(migration, vm)
+
+        platform = migration.target_platform.value
+        simulator = get_simulator()
+
+        # A deferred run picks up at the stage it stopped in: earlier stages
+        # are not redone and the stage is not entered (or timed) again
+        resume_at = (
+            PIPELINE.index(migration.status) if migration.status in PIPELINE else 0
         )
-        migration.status = MigrationStatus.GENERATING_ARTIFACTS
-        migration.progress_percent = 5
-        migration.status_message = "Generating Dockerfile and manifests"
-        db.commit()
 
-        generator = ArtifactGenerator(migration, vm)
-        migration.dockerfile_content = generator.generate_dockerfile()
-        migration.kubernetes_manifest = generator.generate_kubernetes_manifest()
-        migration.docker_compose = generator.generate_docker_compose()
-        migration.progress_percent = 25
-        db.commit()
+        def resumes(status) -> bool:
+            return PIPELINE.index(status) >= resume_at
 
-        time.sleep(2)  # Simulate processing
+        # Step 1: Generate Artifacts (0-25%)
+        if resumes(MigrationStatus.GENERATING_ARTIFACTS):
+            with track_migration_stage("generating_artifacts", platform):
+                self.update_state(
+                    state="PROGRESS",
+                    meta={
+                        "current": 5,
+                        "total": 100,
+                        "status": "Generating container artifacts...",
+                    },
+                )
+                progress.update(
+                    status=MigrationStatus.GENERATING_ARTIFACTS,
+                    progress_percent=5,
+                    status_message="Generating Dockerfile and manifests",
+                )
+
+                generator = ArtifactGenerator(migration, vm, resources_for_vm(db, vm))
+                progress.update(
+                    dockerfile_content=generator.generate_dockerfile(),
+                    kubernetes_manifest=generator.generate_kubernetes_manifest(),
+                    docker_compose=generator.generate_docker_compose(),
+                    progress_percent=25,
+                )
+
+                simulator.stage("migration.generate", key=migration_id)
 
         # Step 2: Build Image (25-50%)
-        self.update_state(
-            state="PROGRESS",
-            meta={"current": 30, "total": 100, "status": "Building container image..."},
-        )
-        migration.status = MigrationStatus.BUILDING_IMAGE
-        migration.progress_percent = 30
-        migration.status_message = "Building Docker image"
-        db.commit()
-
-        time.sleep(3)  # Simulate build
-        migration.progress_percent = 50
-        db.commit()
+        if resumes(MigrationStatus.BUILDING_IMAGE):
+            with track_migration_stage("building_image", platform):
+                self.update_state(
+                    state="PROGRESS",
+                    meta={
+                        "current": 30,
+                        "total": 100,
+                        "status": "Building container image...",
+                    },
+                )
+                progress.update(
+                    status=MigrationStatus.BUILDING_IMAGE,
+                    progress_percent=30,
+                    status_message="Building Docker image",
+                )
+
+                simulator.stage("migration.build", key=migration_id)
+                progress.update(progress_percent=50)
 
         # Step 3: Push Image (50-75%)
-        self.update_state(
-            state="PROGRESS",
-            meta={
-                "current": 55,
-                "total": 100,
-                "status": "Pushing image to registry...",
-            },
-        )
-        migration.status = MigrationStatus.PUSHING_IMAGE
-        migration.progress_percent = 55
-        migration.status_message = "Pushing to container registry"
-        db.commit()
-
-        time.sleep(2)  # Simulate push
-        migration.progress_percent = 75
-        db.commit()
+        if resumes(MigrationStatus.PUSHING_IMAGE):
+            with track_migration_stage("pushing_image", platform):
+                self.update_state(
+                    state="PROGRESS",
+                    meta={
+                        "current": 55,
+                        "total": 100,
+                        "status": "Pushing image to registry...",
+                    },
+                )
+                progress.update(
+                    status=MigrationStatus.PUSHING_IMAGE,
+                    progress_percent=55,
+                    status_message="Pushing to container registry",
+                )
+
+                call_with_retry(
+                    lambda: simulator.stage("migration.push", key=migration_id),
+                    REGISTRY,
+                    registry,
+                )
+                progress.update(progress_percent=75)
 
         # Step 4: Deploy (75-100%)
-        self.update_state(
-            state="PROGRESS",
-            meta={"current": 80, "total": 100, "status": "Deploying to cluster..."},
-        )
-        migration.status = MigrationStatus.DEPLOYING
-        migration.progress_percent = 80
-        migration.status_message = f"Deploying to {migration.target_platform}"
-        db.commit()
-
-        time.sleep(3)  # Simulate deployment
+        if resumes(MigrationStatus.DEPLOYING):
+            with track_migration_stage("deploying", platform):
+                self.update_state(
+                    state="PROGRESS",
+                    meta={
+                        "current": 80,
+                        "total": 100,
+                        "status": "Deploying to cluster...",
+                    },
+                )
+                progress.update(
+                    status=MigrationStatus.DEPLOYING,
+                    progress_percent=80,
+                    status_message=f"Deploying to {migration.target_platform}",
+                )
+
+                call_with_retry(
+                    lambda: simulator.stage("migration.deploy", key=migration_id),
+                    CLUSTER,
+                    cluster,
+                )
 
         # Complete
-        migration.status = MigrationStatus.COMPLETED
-        migration.progress_percent = 100
-        migration.status_message = "Migration completed successfully"
-        migration.completed_at = datetime.utcnow()
-
-        vm.status = VMStatus.COMPLETED
+        progress.update(
+            status=MigrationStatus.COMPLETED,
+            progress_percent=100,
+            status_message="Migration completed successfully",
+            completed_at=datetime.utcnow(),
+        )
+        compare_and_set(db, VirtualMachine, vm.id, None, status=VMStatus.COMPLETED)
         db.commit()
 
         logger.info(f"Migration {migration_id} completed successfully")
@@ -128,17 +321,33 @@ def run_migration_task(self, migration_id: int):
             "message": "Migration completed successfully",
         }
 
-    except Exception as e:
-        logger.error(f"Migration {migration_id} failed: {str(e)}")
+    except Throttled as e:
+        # Also BreakerOpen: the registry or cluster is down, try again later
+        db.rollback()
+        if not deferrals_left(self):
+            logger.error(f"Migration {migration_id} gave up waiting: {str(e)}")
+            _fail(db, progress, f"Gave up after {self.request.retries} deferrals: {e}")
+            raise
+        compare_and_set(
+            db, Migration, migration_id, None, status_message=f"Deferred: {e}"[:500]
+        )
+        db.commit()
+        defer(self, e)
 
-        if migration:
-            migration.status = MigrationStatus.FAILED
-            migration.error_message = str(e)
-            migration.status_message = "Migration failed"
-            db.commit()
+    except MigrationCancelled:
+        logger.info(f"Migration {migration_id} was cancelled, stopping")
+        return {
+            "status": "cancelled",
+            "migration_id": migration_id,
+            "message": "Migration was cancelled",
+        }
 
+    except Exception as e:
+        logger.error(f"Migration {migration_id} failed: {str(e)}")
+        _fail(db, progress, e)
         raise
     finally:
+        slots.close()
         db.close()
 
 
@@ -162,10 +371,27 @@ def rollback_migration_task(self, migration_id: int):
         )
 
         # Simulate rollback
-        time.sleep(2)
+        call_with_retry(
+            lambda: get_simulator().stage("migration.rollback", key=migration_id),
+            CLUSTER,
+            _migration_targets(migration)[1][1],
+        )
 
-        migration.status = MigrationStatus.CANCELLED
-        migration.status_message = "Migration rolled back"
+        compare_and_set(
+            db,
+            Migration,
+            migration_id,
+            None,
+            status=MigrationStatus.CANCELLED,
+            status_message="Migration rolled back",
+        )
+        record_event(
+            db,
+            migration_id,
+            MigrationStatus.CANCELLED,
+            from_status=migration.status,
+            message="Migration rolled back",
+        )
         db.commit()
 
         return {
@@ -174,6 +400,11 @@ def rollback_migration_task(self, migration_id: int):
             "message": "Migration rolled back successfully",
         }
 
+    except Throttled as e:
+        if deferrals_left(self):
+            defer(self, e)
+        logger.error(f"Rollback of {migration_id} gave up waiting: {str(e)}")
+        raise
     except Exception as e:
         logger.error(f"Rollback failed: {str(e)}")
         raise
@@ -0,0 +1,31 @@
+"""
+Outbox Tasks
+"""
+
+import logging
+
+from app.celery_app import celery_app
+from app.database import SessionLocal
+from app.services.outbox import dispatch_pending
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name="app.tasks.outbox_tasks.dispatch_outbox", ignore_result=True)
+def dispatch_outbox():
+    """Publish outbox messages the API could not dispatch itself"""
+    db = SessionLocal()
+    try:
+        report = dispatch_pending(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if report["sent"] or report["failed"]:
+        logger.info(
+            f"Outbox dispatched {report['sent']} tasks, {report['failed']} failed, "
+            f"{report['dead']} dead-lettered"
+        )
+    return report
@@ -0,0 +1,34 @@
+"""
+Utilization Tasks
+"""
+
+import logging
+
+from app.celery_app import celery_app
+from app.config import settings
+from app.database import SessionLocal
+from app.services.utilization import rollup_pending
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="app.tasks.utilization_tasks.rollup_utilization", ignore_result=True
+)
+def rollup_utilization():
+    """Downsample newly ingested utilization chunks into 5m/1h rollups"""
+    db = SessionLocal()
+    try:
+        report = rollup_pending(db, max_chunks=settings.UTILIZATION_ROLLUP_BATCH)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if report["chunks"]:
+        logger.info(
+            f"Rolled up {report['chunks']} utilization chunks into "
+            f"{report['rollups']} rollups"
+        )
+    return report
@@ -3,17 +3,67 @@ VM Discovery Tasks
 """
 
 import logging
-import time
 
 from celery import shared_task
 
 from app.celery_app import celery_app
 from app.database import SessionLocal
 from app.models.vm import VirtualMachine, VMStatus
+from app.services.breakers import call_with_retry
+from app.services.concurrency import compare_and_set
+from app.services.simulation import get_simulator
+from app.services.throttle import (HYPERVISOR, Throttled, defer,
+                                   deferrals_left, throttled)
 
 logger = logging.getLogger(__name__)
 
 
+def fetch_inventory(hypervisor_type: str, host: str, datacenter: str = None):
+    """
+    Return the VM inventory reported by a hypervisor.
+
+    Demo: returns some sample VMs (replace with actual vSphere integration)
+    """
+    return [
+        {
+            "name": "web-server-01",
+            "uuid": f"vm-{host}-001",
+            "os_type": "Windows Server 2019",
+            "os_family": "windows",
+            "cpu_count": 4,
+            "memory_mb": 8192,
+            "disk_gb": 100,
+            "ip_address": "192.168.1.10",
+            "datacenter": datacenter or "DC-1",
+            "discovered_services": ["IIS", "ASP.NET"],
+        },
+        {
+            "name": "app-server-01",
+            "uuid": f"vm-{host}-002",
+            "os_type": "Windows Server 2022",
+            "os_family": "windows",
+            "cpu_count": 8,
+            "memory_mb": 16384,
+            "disk_gb": 200,
+            "ip_address": "192.168.1.11",
+            "datacenter": datacenter or "DC-1",
+            "discovered_services": [".NET Core", "Windows Service"],
+        },
+        {
+            "name": "linux-app-01",
+            "uuid": f"vm-{host}-003",
+            "os_type": "Ubuntu 22.04 LTS",
+            "os_family": "linux",
+            "cpu_count": 2,
+            "memory_mb": 4096,
+            "disk_gb": 50,
+            "ip_address": "192.168.1.12",
+            "datacenter": datacenter or "DC-1",
+            "discovered_services": ["nginx", "Python Flask"],
+        },
+    ]
+
+
 @celery_app.task(bind=True, name="discover_vms")
 def discover_vms_task(
     self,
@@ -32,112 +82,88 @@ def discover_vms_task(
     db = SessionLocal()
 
     try:
-        # Update task state to show progress
-        self.update_state(
-            state="PROGRESS",
-            meta={"current": 0, "total": 100, "status": "Connecting to hypervisor..."},
-        )
-
-        # Simulate discovery process (replace with actual vSphere integration)
-        time.sleep(2)
-
-        self.update_state(
-            state="PROGRESS",
-            meta={"current": 25, "total": 100, "status": "Scanning datacenter..."},
-        )
-
-        # Demo: Create some sample VMs
-        sample_vms = [
-            {
-                "name": "web-server-01",
-                "uuid": f"vm-{host}-001",
-                "os_type": "Windows Server 2019",
-                "os_family": "windows",
-                "cpu_count": 4,
-                "memory_mb": 8192,
-                "disk_gb": 100,
-                "ip_address": "192.168.1.10",
-                "datacenter": datacenter or "DC-1",
-                "discovered_services": ["IIS", "ASP.NET"],
-            },
-            {
-                "name": "app-server-01",
-                "uuid": f"vm-{host}-002",
-                "os_type": "Windows Server 2022",
-                "os_family": "windows",
-                "cpu_count": 8,
-                "memory_mb": 16384,
-                "disk_gb": 200,
-                "ip_address": "192.168.1.11",
-                "datacenter": datacenter or "DC-1",
-                "discovered_services": [".NET Core", "Windows Service"],
-            },
-            {
-                "name": "linux-app-01",
-                "uuid": f"vm-{host}-003",
-                "os_type": "Ubuntu 22.04 LTS",
-                "os_family": "linux",
-                "cpu_count": 2,
-                "memory_mb": 4096,
-                "disk_gb": 50,
-                "ip_address": "192.168.1.12",
-                "datacenter": datacenter or "DC-1",
-                "discovered_services": ["nginx", "Python Flask"],
-            },
-        ]
-
-        self.update_state(
-            state="PROGRESS",
-            meta={
-                "current": 50,
-                "total": 100,
-                "status": "Processing discovered VMs...",
-            },
-        )
-
-        discovered_count = 0
-        for vm_data in sample_vms:
-            # Check if VM already exists
-            existing = (
-                db.query(VirtualMachine)
-                .filter(VirtualMachine.uuid == vm_data["uuid"])
-                .first()
+        with throttled([(HYPERVISOR, host)]):
+            # Update task state to show progress
+            self.update_state(
+                state="PROGRESS",
+                meta={
+                    "current": 0,
+                    "total": 100,
+                    "status": "Connecting to hypervisor...",
+                },
+            )
+
+            # Simulate discovery process (replace with actual vSphere integration)
+            call_with_retry(
+                lambda: get_simulator().stage("discovery.connect", key=host),
+                HYPERVISOR,
+                host,
+            )
+
+            self.update_state(
+                state="PROGRESS",
+                meta={"current": 25, "total": 100, "status": "Scanning datacenter..."},
             )
 
-            if not existing:
-                vm = VirtualMachine(
-                    name=vm_data["name"],
-                    uuid=vm_data["uuid"],
-                    os_type=vm_data["os_type"],
-                    os_family=vm_data["os_family"],
-                    cpu_count=vm_data["cpu_count"],
-                    memory_mb=vm_data["memory_mb"],
-                    disk_gb=vm_data["disk_gb"],
-                    ip_address=vm_data["ip_address"],
-                    hypervisor=hypervisor_type,
-                    datacenter=vm_data["datacenter"],
-                    discovered_services=vm_data["discovered_services"],
-                    status=VMStatus.DISCOVERED,
+            sample_vms = fetch_inventory(hypervisor_type, host, datacenter)
+
+            self.update_state(
+                state="PROGRESS",
+                meta={
+                    "current": 50,
+                    "total": 100,
+                    "status": "Processing discovered VMs...",
+                },
+            )
+
+            discovered_count = 0
+            for vm_data in sample_vms:
+                # Check if VM already exists
+                existing = (
+                    db.query(VirtualMachine)
+                    .filter(VirtualMachine.uuid == vm_data["uuid"])
+                    .first()
                 )
-                db.add(vm)
-                discovered_count += 1
 
-        db.commit()
+                if not existing:
+                    vm = VirtualMachine(
+                        name=vm_data["name"],
+                        uuid=vm_data["uuid"],
+                        os_type=vm_data["os_type"],
+                        os_family=vm_data["os_family"],
+                        cpu_count=vm_data["cpu_count"],
+                        memory_mb=vm_data["memory_mb"],
+                        disk_gb=vm_data["disk_gb"],
+                        ip_address=vm_data["ip_address"],
+                        hypervisor=hypervisor_type,
+                        datacenter=vm_data["datacenter"],
+                        discovered_services=vm_data["discovered_services"],
+                        status=VMStatus.DISCOVERED,
+                    )
+                    db.add(vm)
+                    discovered_count += 1
 
-        self.update_state(
-            state="PROGRESS",
-            meta={"current": 100, "total": 100, "status": "Discovery complete"},
-        )
+            db.commit()
 
-        logger.info(f"VM discovery complete. Found {discovered_count} new VMs")
+            self.update_state(
+                state="PROGRESS",
+                meta={"current": 100, "total": 100, "status": "Discovery complete"},
+            )
+
+            logger.info(f"VM discovery complete. Found {discovered_count} new VMs")
 
-        return {
-            "status": "success",
-            "hypervisor": host,
-            "vms_discovered": discovered_count,
-            "message": f"Successfully discovered {discovered_count} new virtual machines",
-        }
+            return {
+                "status": "success",
+                "hypervisor": host,
+                "vms_discovered": discovered_count,
+                "message": f"Successfully discovered {discovered_count} new virtual machines",
+            }
 
+    except Throttled as e:
+        if deferrals_left(self):
+            defer(self, e)
+        logger.error(f"VM discovery gave up waiting: {str(e)}")
+        raise
     except Exception as e:
         logger.error(f"VM discovery failed: {str(e)}")
         raise
@@ -145,6 +171,14 @@ def discover_vms_task(
         db.close()
 
 
+def _fail(db, vm_id):
+    """Mark an analyzed VM failed (vm_id is None when it was never loaded)"""
+    db.rollback()
+    if vm_id is not None:
+        compare_and_set(db, VirtualMachine, vm_id, None, status=VMStatus.FAILED)
+        db.commit()
+
+
 @celery_app.task(bind=True, name="analyze_vm")
 def analyze_vm_task(self, vm_id: int):
     """
@@ -153,50 +187,79 @@ def analyze_vm_task(self, vm_id: int):
     logger.info(f"Starting analysis of VM {vm_id}")
 
     db = SessionLocal()
+    vm = None
 
     try:
         vm = db.query(VirtualMachine).filter(VirtualMachine.id == vm_id).first()
         if not vm:
             raise ValueError(f"VM with id {vm_id} not found")
 
-        vm.status = VMStatus.ANALYZING
-        db.commit()
+        # Guest inspection goes through the VM's hypervisor host
+        hypervisor_host = vm.host or vm.datacenter
+        with throttled([(HYPERVISOR, hypervisor_host)]):
+            # Targeted updates, so concurrent edits to other columns are kept
+            compare_and_set(db, VirtualMachine, vm_id, None, status=VMStatus.ANALYZING)
+            db.commit()
 
-        # Simulate analysis (replace with actual WMI/PowerShell integration)
-        self.update_state(
-            state="PROGRESS",
-            meta={
-                "current": 25,
-                "total": 100,
-                "status": "Scanning installed software...",
-            },
-        )
-        time.sleep(2)
-
-        self.update_state(
-            state="PROGRESS",
-            meta={"current": 50, "total": 100, "status": "Analyzing services..."},
-        )
-        time.sleep(2)
-
-        self.update_state(
-            state="PROGRESS",
-            meta={"current": 75, "total": 100, "status": "Generating report..."},
-        )
-
-        # Update VM with analysis results
-        vm.installed_software = ["Microsoft .NET Framework 4.8", "Visual C++ Runtime"]
-        vm.status = VMStatus.READY
-        db.commit()
+            # Simulate analysis (replace with actual WMI/PowerShell integration)
+            self.update_state(
+                state="PROGRESS",
+                meta={
+                    "current": 25,
+                    "total": 100,
+                    "status": "Scanning installed software...",
+                },
+            )
+            call_with_retry(
+                lambda: get_simulator().stage("analysis.software", key=vm_id),
+                HYPERVISOR,
+                hypervisor_host,
+            )
 
-        return {"status": "success", "vm_id": vm_id, "message": "VM analysis complete"}
+            self.update_state(
+                state="PROGRESS",
+                meta={"current": 50, "total": 100, "status": "Analyzing services..."},
+            )
+            call_with_retry(
+                lambda: get_simulator().stage("analysis.services", key=vm_id),
+                HYPERVISOR,
+                hypervisor_host,
+            )
 
+            self.update_state(
+                state="PROGRESS",
+                meta={"current": 75, "total": 100, "status": "Generating report..."},
+            )
+
+            # Update VM with analysis results
+            compare_and_set(
+                db,
+                VirtualMachine,
+                vm_id,
+                None,
+                installed_software=[
+                    "Microsoft .NET Framework 4.8",
+                    "Visual C++ Runtime",
+                ],
+                status=VMStatus.READY,
+            )
+            db.commit()
+
+            return {
+                "status": "success",
+                "vm_id": vm_id,
+                "message": "VM analysis complete",
+            }
+
+    except Throttled as e:
+        if deferrals_left(self):
+            defer(self, e)
+        logger.error(f"VM analysis gave up waiting: {str(e)}")
+        _fail(db, vm_id if vm else None)
+        raise
     except Exception as e:
         logger.error(f"VM analysis failed: {str(e)}")
-        db.rollback()
-        if vm:
-            vm.status = VMStatus.FAILED
-            db.commit()
+        _fail(db, vm_id if vm else None)
         raise
     finally:
         db.close()
@@ -0,0 +1,50 @@
+"""
+API benchmarks: list endpoints over growing tables and VM create throughput
+"""
+
+import uuid
+
+from benchmarks.common import measure
+from benchmarks.fixtures import seed_migrations, seed_vms
+
+
+def run(ctx) -> dict:
+    from fastapi.testclient import TestClient
+
+    from app.database import SessionLocal
+    from app.main import app
+
+    results = {}
+    client = TestClient(app)
+
+    for size in ctx.sizes:
+        session = SessionLocal()
+        try:
+            seed_vms(session, size)
+            seed_migrations(session, size)
+        finally:
+            session.close()
+
+        last_page = max(size - 100, 0)
+        for name, url in [
+            ("list_vms", "/api/v1/vms/?limit=100"),
+            ("list_vms_last_page", f"/api/v1/vms/?skip={last_page}&limit=100"),
+            ("list_vms_filtered", "/api/v1/vms/?status_filter=discovered&limit=100"),
+            ("list_migrations", "/api/v1/migrations/?limit=100"),
+            (
+                "list_migrations_filtered",
+                "/api/v1/migrations/?status_filter=completed&limit=100",
+            ),
+        ]:
+            latency = measure(lambda: client.get(url), repeat=ctx.repeat)
+            results[f"api.{name}.{size}"] = {"value": latency * 1000, "unit": "ms"}
+
+    def create_vm():
+        client.post(
+            "/api/v1/vms/",
+            json={"name": "bench-create", "uuid": f"create-{uuid.uuid4().hex}"},
+        )
+
+    per_create = measure(create_vm, repeat=ctx.repeat, number=20)
+    results["api.create_vm"] = {"value": 1 / per_create, "unit": "ops/s"}
+    return results
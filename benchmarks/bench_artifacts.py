@@ -0,0 +1,50 @@
+"""
+ArtifactGenerator throughput per method
+"""
+
+import random
+from types import SimpleNamespace
+
+from benchmarks.common import measure
+from benchmarks.fixtures import synthetic_vm
+
+
+def _fixtures(count: int):
+    rng = random.Random(3)
+    pairs = []
+    for i in range(count):
+        vm = SimpleNamespace(**synthetic_vm(i, rng))
+        migration = SimpleNamespace(
+            base_image=None,
+            container_port=8080,
+            replicas=2,
+            target_namespace="bench",
+            registry_url="registry.example.com",
+            image_name=None,
+            image_tag="latest",
+        )
+        pairs.append((migration, vm))
+    return pairs
+
+
+def run(ctx) -> dict:
+    from app.services.artifact_generator import ArtifactGenerator
+
+    generators = [ArtifactGenerator(m, vm) for m, vm in _fixtures(100)]
+    results = {}
+    for method in [
+        "generate_dockerfile",
+        "generate_kubernetes_manifest",
+        "generate_docker_compose",
+    ]:
+
+        def generate_all():
+            for generator in generators:
+                getattr(generator, method)()
+
+        per_batch = measure(generate_all, repeat=ctx.repeat)
+        results[f"artifacts.{method}"] = {
+            "value": len(generators) / per_batch,
+            "unit": "ops/s",
+        }
+    return results
@@ -0,0 +1,42 @@
+"""
+Capacity planner packing time for 50k-pod fleets
+"""
+
+import numpy as np
+
+from benchmarks.common import measure
+
+WORKLOADS = 10_000  # ~50k pods at 1-9 pods per workload
+
+
+def run(ctx) -> dict:
+    from app.services.capacity import STRATEGIES, NodeShape, pack
+    from app.services.rightsizing import recommend
+
+    rng = np.random.default_rng(5)
+    sizing = recommend(
+        rng.choice([1, 2, 4, 8, 16], size=WORKLOADS),
+        rng.choice([1024, 2048, 4096, 8192, 16384], size=WORKLOADS),
+        rng.beta(2, 5, WORKLOADS),
+        rng.beta(5, 2, WORKLOADS),
+    )
+    pods = rng.integers(1, 10, WORKLOADS)
+    shape = NodeShape("8x32", cpu_m=7800, memory_mb=29000)
+
+    results = {}
+    for strategy in STRATEGIES:
+        seconds = measure(
+            lambda: pack(
+                sizing["cpu_request_m"],
+                sizing["memory_request_mb"],
+                pods,
+                shape,
+                strategy,
+            ),
+            repeat=ctx.repeat,
+        )
+        results[f"capacity.{strategy}.{int(pods.sum())}"] = {
+            "value": seconds * 1000,
+            "unit": "ms",
+        }
+    return results
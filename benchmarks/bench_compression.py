@@ -0,0 +1,73 @@
+"""
+Response compression cost and savings for a VM list page and a generated
+Kubernetes manifest, per coding and level, and the precompressed cache
+"""
+
+import json
+import random
+from types import SimpleNamespace
+
+from benchmarks.common import measure
+from benchmarks.fixtures import synthetic_vm
+
+LEVELS = {"gzip": [1, 6, 9], "br": [4, 11]}
+
+
+def _payloads() -> dict:
+    from app.services.artifact_generator import ArtifactGenerator
+
+    rng = random.Random(5)
+    vms = [synthetic_vm(i, rng) for i in range(100)]
+    listing = [
+        {**vm, "id": i + 1, "status": "discovered", "created_at": "2024-01-01T00:00:00"}
+        for i, vm in enumerate(vms)
+    ]
+    migration = SimpleNamespace(
+        base_image=None,
+        container_port=8080,
+        replicas=2,
+        target_namespace="bench",
+        registry_url="registry.example.com",
+        image_name=None,
+        image_tag="latest",
+    )
+    manifest = ArtifactGenerator(
+        migration, SimpleNamespace(**vms[0])
+    ).generate_kubernetes_manifest()
+    return {
+        "vm_list_100": json.dumps(listing).encode(),
+        "manifest": manifest.encode(),
+    }
+
+
+def run(ctx) -> dict:
+    from app.services.compression import (PrecompressedCache,
+                                          available_codings, compress)
+
+    results = {}
+    for name, body in _payloads().items():
+        for coding in available_codings():
+            for level in LEVELS[coding]:
+                key = f"compression.{name}.{coding}{level}"
+                seconds = measure(
+                    lambda: compress(body, coding, level), repeat=ctx.repeat, number=20
+                )
+                results[f"{key}.cpu"] = {"value": seconds * 1e6, "unit": "us"}
+                results[f"{key}.ratio"] = {
+                    "value": len(compress(body, coding, level)) / len(body),
+                    "unit": "ratio",
+                }
+
+    # Repeated artifact downloads: a cache hit instead of a compression
+    manifest = _payloads()["manifest"]
+    cache = PrecompressedCache(1 << 20)
+    seconds = measure(
+        lambda: cache.get("digest", "gzip", lambda: compress(manifest, "gzip")),
+        repeat=ctx.repeat,
+        number=1000,
+    )
+    results["compression.manifest.cached"] = {
+        "value": seconds * 1e6,
+        "unit": "us",
+    }
+    return results
@@ -0,0 +1,51 @@
+"""
+Dependency graph analysis and wave planning over large synthetic graphs
+"""
+
+import time
+
+import numpy as np
+
+NODES = 100_000
+EDGES = 300_000
+
+
+def run(ctx) -> dict:
+    from app.services.dependency_graph import DependencyGraph, plan_waves
+
+    rng = np.random.default_rng(13)
+    # Mostly local traffic (app tiers) plus some fleet-wide shared services
+    sources = rng.integers(0, NODES, EDGES)
+    local = sources + rng.integers(-20, 20, EDGES)
+    shared = rng.integers(0, 50, EDGES)
+    targets = np.clip(np.where(rng.random(EDGES) < 0.9, local, shared), 0, NODES - 1)
+
+    results = {}
+    start = time.perf_counter()
+    graph = DependencyGraph(np.arange(1, NODES + 1), sources, targets)
+    results[f"dependencies.build.{EDGES}"] = {
+        "value": (time.perf_counter() - start) * 1000,
+        "unit": "ms",
+    }
+
+    start = time.perf_counter()
+    graph.weak_components()
+    results[f"dependencies.components.{EDGES}"] = {
+        "value": (time.perf_counter() - start) * 1000,
+        "unit": "ms",
+    }
+
+    start = time.perf_counter()
+    graph.strong_components()
+    results[f"dependencies.strong_components.{EDGES}"] = {
+        "value": (time.perf_counter() - start) * 1000,
+        "unit": "ms",
+    }
+
+    start = time.perf_counter()
+    plan_waves(graph, max_wave_size=50)
+    results[f"dependencies.plan_waves.{EDGES}"] = {
+        "value": (time.perf_counter() - start) * 1000,
+        "unit": "ms",
+    }
+    return results
@@ -0,0 +1,45 @@
+"""
+Fingerprint index lookups for single VMs and whole inventories
+"""
+
+import random
+import time
+
+from benchmarks.common import measure
+from benchmarks.fixtures import SERVICES
+
+SOFTWARE = [
+    ["Microsoft .NET Framework 4.8", "Visual C++ Runtime"],
+    ["OpenJDK 17.0.2"],
+    [],
+]
+INVENTORY = 100_000
+
+
+def run(ctx) -> dict:
+    from app.services.fingerprints import get_fingerprint_index
+
+    index = get_fingerprint_index()
+    rng = random.Random(17)
+    rows = [
+        (
+            rng.choice(["windows", "linux"]),
+            rng.choice(SERVICES),
+            rng.choice(SOFTWARE),
+        )
+        for _ in range(INVENTORY)
+    ]
+
+    single = measure(
+        lambda: index.recommend_many(rows[:1]), repeat=ctx.repeat, number=1000
+    )
+    start = time.perf_counter()
+    index.recommend_many(rows)
+    elapsed = time.perf_counter() - start
+    return {
+        "fingerprints.single_vm": {"value": single * 1e6, "unit": "us"},
+        f"fingerprints.inventory.{INVENTORY}": {
+            "value": INVENTORY / elapsed,
+            "unit": "vms/s",
+        },
+    }
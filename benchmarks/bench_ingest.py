@@ -0,0 +1,45 @@
+"""
+Discovery ingest benchmark: discover_vms_task over large synthetic inventories
+"""
+
+import random
+import time
+
+from benchmarks.fixtures import clear_vms, synthetic_vm
+
+
+def run(ctx) -> dict:
+    from app.database import SessionLocal
+    from app.tasks import vm_tasks
+
+    results = {}
+    original = vm_tasks.fetch_inventory
+    try:
+        for size in ctx.sizes:
+            inventory = [
+                synthetic_vm(i, random.Random(i), prefix="ingest") for i in range(size)
+            ]
+            vm_tasks.fetch_inventory = lambda *args, **kwargs: inventory
+
+            session = SessionLocal()
+            clear_vms(session)
+            session.commit()
+            session.close()
+
+            start = time.perf_counter()
+            vm_tasks.discover_vms_task.apply(
+                kwargs={
+                    "hypervisor_type": "vsphere",
+                    "host": "bench",
+                    "username": "bench",
+                    "password": "bench",
+                }
+            ).get()
+            elapsed = time.perf_counter() - start
+            results[f"ingest.discover_vms.{size}"] = {
+                "value": size / elapsed,
+                "unit": "vms/s",
+            }
+    finally:
+        vm_tasks.fetch_inventory = original
+    return results
@@ -0,0 +1,30 @@
+"""
+Right-sizing engine throughput for whole fleets
+"""
+
+import numpy as np
+
+from benchmarks.common import measure
+
+FLEET_SIZES = (10_000, 100_000)
+
+
+def run(ctx) -> dict:
+    from app.services.rightsizing import recommend
+
+    rng = np.random.default_rng(7)
+    results = {}
+    for size in FLEET_SIZES:
+        cpus = rng.choice([1, 2, 4, 8, 16], size=size)
+        memory = rng.choice([1024, 2048, 4096, 8192, 16384, 65536], size=size)
+        cpu_p95 = np.where(rng.random(size) < 0.7, rng.beta(2, 5, size), np.nan)
+        memory_p99 = np.where(rng.random(size) < 0.7, rng.beta(5, 2, size), np.nan)
+
+        seconds = measure(
+            lambda: recommend(cpus, memory, cpu_p95, memory_p99), repeat=ctx.repeat
+        )
+        results[f"rightsizing.recommend.{size}"] = {
+            "value": seconds * 1000,
+            "unit": "ms",
+        }
+    return results
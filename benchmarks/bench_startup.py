@@ -0,0 +1,49 @@
+"""
+API cold start: importing app.main and serving the first request in a
+fresh interpreter, as an autoscaled pod would. The total carries a budget
+(STARTUP_BUDGET_MS, default 2500 ms); the runner fails when it is exceeded.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", 2500))
+RUNS = 3
+
+_PROBE = """
+import json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from starlette.testclient import TestClient
+client = TestClient(app.main.app)
+ready = time.perf_counter()
+assert client.get("/health").status_code == 200
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_request": done - ready}))
+"""
+
+
+def _cold_start() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(ctx) -> dict:
+    samples = [_cold_start() for _ in range(max(min(ctx.repeat, RUNS), 1))]
+    import_ms = statistics.median(s["import"] for s in samples) * 1000
+    request_ms = statistics.median(s["first_request"] for s in samples) * 1000
+    return {
+        "startup.import": {"value": import_ms, "unit": "ms"},
+        "startup.first_request": {"value": request_ms, "unit": "ms"},
+        "startup.total": {
+            "value": import_ms + request_ms,
+            "unit": "ms",
+            "budget": STARTUP_BUDGET_MS,
+        },
+    }
@@ -0,0 +1,40 @@
+"""
+Migration task overhead with simulated stage latency removed
+"""
+
+from benchmarks.common import measure
+from benchmarks.fixtures import seed_vms
+
+
+def run(ctx) -> dict:
+    from app.database import SessionLocal
+    from app.models.migration import Migration
+    from app.models.vm import VirtualMachine
+    from app.services.simulation import Simulator, set_simulator
+    from app.tasks.migration_tasks import run_migration_task
+
+    set_simulator(Simulator(profile={"*": {"latency": "zero"}}))
+    try:
+        session = SessionLocal()
+        try:
+            seed_vms(session, 100)
+            vm_ids = [row[0] for row in session.query(VirtualMachine.id)]
+            migrations = [
+                Migration(vm_id=vm_id, name=f"overhead-{vm_id}") for vm_id in vm_ids
+            ]
+            session.add_all(migrations)
+            session.commit()
+            migration_ids = [m.id for m in migrations]
+        finally:
+            session.close()
+
+        ids = iter(migration_ids * (ctx.repeat + 1))
+
+        def run_one():
+            run_migration_task.apply(args=[next(ids)]).get()
+
+        per_task = measure(run_one, repeat=ctx.repeat, number=10)
+    finally:
+        # Later suites in the same process get the configured simulator back
+        set_simulator(None)
+    return {"tasks.run_migration_overhead": {"value": per_task * 1000, "unit": "ms"}}
@@ -0,0 +1,75 @@
+"""
+Utilization ingest throughput through the API and rollup time
+"""
+
+import time
+
+import numpy as np
+
+from benchmarks.common import measure
+from benchmarks.fixtures import seed_vms
+
+VMS = 100
+SAMPLES_PER_VM = 360  # One hour at 10s resolution
+
+
+def run(ctx) -> dict:
+    from fastapi.testclient import TestClient
+    from sqlalchemy import delete
+
+    from app.database import SessionLocal
+    from app.main import app
+    from app.models.utilization import UtilizationChunk, UtilizationRollup
+    from app.models.vm import VirtualMachine
+    from app.services.utilization import rollup_pending
+
+    session = SessionLocal()
+    try:
+        seed_vms(session, VMS, seed=3)
+        session.execute(delete(UtilizationChunk))
+        session.execute(delete(UtilizationRollup))
+        session.commit()
+        vm_ids = [row[0] for row in session.query(VirtualMachine.id)]
+    finally:
+        session.close()
+
+    rng = np.random.default_rng(11)
+    client = TestClient(app)
+    hour = {"offset": 1_700_000_000}
+
+    def ingest():
+        timestamps = (hour["offset"] + np.arange(SAMPLES_PER_VM) * 10).tolist()
+        hour["offset"] += 3600
+        body = {
+            "series": [
+                {
+                    "vm_id": vm_id,
+                    "timestamps": timestamps,
+                    "cpu": rng.random(SAMPLES_PER_VM).round(4).tolist(),
+                    "memory": rng.random(SAMPLES_PER_VM).round(4).tolist(),
+                }
+                for vm_id in vm_ids
+            ]
+        }
+        client.post("/api/v1/vms/utilization", json=body).raise_for_status()
+
+    per_batch = measure(ingest, repeat=ctx.repeat)
+    results = {
+        "utilization.ingest_samples": {
+            "value": len(vm_ids) * SAMPLES_PER_VM * 2 / per_batch,
+            "unit": "samples/s",
+        }
+    }
+
+    session = SessionLocal()
+    try:
+        start = time.perf_counter()
+        report = rollup_pending(session, max_chunks=100_000)
+        elapsed = time.perf_counter() - start
+    finally:
+        session.close()
+    results[f"utilization.rollup.{report['chunks']}"] = {
+        "value": elapsed * 1000,
+        "unit": "ms",
+    }
+    return results
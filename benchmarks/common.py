@@ -0,0 +1,123 @@
+"""
+Shared helpers for load tests and benchmarks
+"""
+
+import math
+import os
+import re
+import time
+from contextlib import contextmanager
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of values (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100.0 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def latency_summary(seconds) -> dict:
+    """Count and p50/p95/p99/max in milliseconds"""
+    return {
+        "count": len(seconds),
+        "p50_ms": round(percentile(seconds, 50) * 1000, 3),
+        "p95_ms": round(percentile(seconds, 95) * 1000, 3),
+        "p99_ms": round(percentile(seconds, 99) * 1000, 3),
+        "max_ms": round(max(seconds, default=0) * 1000, 3),
+    }
+
+
+def configure_inprocess_environment(database_url: str, **overrides):
+    """
+    Point the app at a local database and in-memory broker/result backend.
+
+    Must be called before anything under app/ is imported, since settings
+    and engines are created at import time.
+    """
+    os.environ.update(
+        {
+            "DATABASE_URL": database_url,
+            "CELERY_BROKER_URL": "memory://",
+            "CELERY_RESULT_BACKEND": "cache+memory://",
+            "METRICS_ENABLED": "false",
+            **{key: str(value) for key, value in overrides.items()},
+        }
+    )
+
+
+def create_schema():
+    """Create all tables on the configured database"""
+    from app import models  # noqa: F401
+    from app.database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    if engine.dialect.name == "sqlite":
+        # Let readers proceed while a worker thread is writing
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+
+class OperationCounter:
+    """Counts SQL statements and Redis commands issued by this process"""
+
+    def __init__(self):
+        self.sql_statements = 0
+        self.redis_commands = 0
+        self._installed = False
+
+    def install(self):
+        if self._installed:
+            return
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        event.listen(Engine, "before_cursor_execute", self._on_sql)
+
+        import redis.client
+
+        original = redis.client.Redis.execute_command
+        counter = self
+
+        def execute_command(self, *args, **kwargs):
+            counter.redis_commands += 1
+            return original(self, *args, **kwargs)
+
+        redis.client.Redis.execute_command = execute_command
+        self._installed = True
+
+    def _on_sql(self, *args, **kwargs):
+        self.sql_statements += 1
+
+    def snapshot(self):
+        return {"sql": self.sql_statements, "redis": self.redis_commands}
+
+
+_SERVER_TIMING_COUNT = re.compile(r'(\w+);dur=[\d.]+;desc="(\d+) \w+"')
+
+
+def server_timing_counts(header: str) -> dict:
+    """Extract {'db': n, 'redis': n} from a Server-Timing header"""
+    return {name: int(n) for name, n in _SERVER_TIMING_COUNT.findall(header or "")}
+
+
+@contextmanager
+def timer(results: list):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        results.append(time.perf_counter() - start)
+
+
+def measure(fn, repeat: int = 5, number: int = 1) -> float:
+    """Median seconds per call of fn over repeat rounds of number calls"""
+    fn()  # warm up caches, connections and lazy imports
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+    return percentile(rounds, 50)
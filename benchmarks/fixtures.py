@@ -0,0 +1,101 @@
+"""
+Synthetic data for benchmarks
+"""
+
+import random
+
+from sqlalchemy import delete, insert
+
+SERVICES = [
+    ["IIS", "ASP.NET"],
+    [".NET Core", "Windows Service"],
+    ["nginx", "Python Flask"],
+    ["nginx"],
+    ["Python"],
+    [],
+]
+
+SOFTWARE = [
+    ["Microsoft .NET Framework 4.8", "Visual C++ Runtime"],
+    ["Microsoft SQL Server 2019"],
+    ["OpenJDK 17"],
+    ["Python 3.10"],
+    [],
+]
+
+
+def synthetic_vm(index: int, rng: random.Random, prefix: str = "bench") -> dict:
+    windows = index % 3 != 2
+    return {
+        "name": f"{prefix}-vm-{index:06d}",
+        "uuid": f"{prefix}-{index:08d}",
+        "os_type": "Windows Server 2019" if windows else "Ubuntu 22.04 LTS",
+        "os_family": "windows" if windows else "linux",
+        "cpu_count": rng.choice([1, 2, 4, 8, 16]),
+        "memory_mb": rng.choice([1024, 2048, 4096, 8192, 16384, 32768]),
+        "disk_gb": float(rng.choice([20, 50, 100, 200, 500])),
+        "ip_address": f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}",
+        "datacenter": f"DC-{index % 4 + 1}",
+        "discovered_services": SERVICES[index % len(SERVICES)],
+        "installed_software": SOFTWARE[index % len(SOFTWARE)],
+    }
+
+
+def clear_migrations(session):
+    """Delete all migrations with their event log and artifact revisions"""
+    from app.models.event import MigrationEvent
+    from app.models.migration import Migration
+    from app.models.revision import ArtifactRevision
+
+    session.execute(delete(MigrationEvent))
+    session.execute(delete(ArtifactRevision))
+    session.execute(delete(Migration))
+
+
+def clear_vms(session):
+    """Delete all VMs, after the migrations referencing them"""
+    from app.models.vm import VirtualMachine
+
+    clear_migrations(session)
+    session.execute(delete(VirtualMachine))
+
+
+def seed_vms(session, count: int, seed: int = 1, chunk_size: int = 5000):
+    """Replace the virtual_machines table contents with count synthetic rows"""
+    from app.models.vm import VirtualMachine, VMStatus
+
+    clear_vms(session)
+    rng = random.Random(seed)
+    table = VirtualMachine.__table__
+    for start in range(0, count, chunk_size):
+        rows = [
+            {**synthetic_vm(i, rng), "status": VMStatus.DISCOVERED}
+            for i in range(start, min(start + chunk_size, count))
+        ]
+        session.execute(insert(table), rows)
+    session.commit()
+
+
+def seed_migrations(session, count: int, chunk_size: int = 5000):
+    """Replace the migrations table contents with count rows over existing VMs"""
+    from app.models.migration import Migration, MigrationStatus
+    from app.models.vm import VirtualMachine
+
+    clear_migrations(session)
+    vm_ids = [row[0] for row in session.query(VirtualMachine.id).limit(count)]
+    statuses = list(MigrationStatus)
+    table = Migration.__table__
+    for start in range(0, count, chunk_size):
+        rows = [
+            {
+                "vm_id": vm_ids[i % len(vm_ids)],
+                "name": f"bench-migration-{i}",
+                "status": statuses[i % len(statuses)],
+                "progress_percent": 0,
+                "replicas": 1,
+                "image_tag": "latest",
+            }
+            for i in range(start, min(start + chunk_size, count))
+        ]
+        session.execute(insert(table), rows)
+    session.commit()
@@ -0,0 +1,252 @@
+"""
+Migration Pipeline Load Test
+
+Drives discovery + create + start + poll scenarios against the API and
+reports throughput, latency percentiles and DB/Redis operations per
+migration.
+
+By default everything runs in-process: the API through a TestClient, a
+Celery worker in a background thread on an in-memory broker, and SQLite.
+Stage latencies come from the simulation backend, so --profile zero
+measures pure orchestration overhead.
+
+    python -m benchmarks.load_test --migrations 200 --concurrency 8
+    python -m benchmarks.load_test --profile '{"*": {"latency": "uniform:0,0.05", "failure_rate": 0.02}}'
+    python -m benchmarks.load_test --base-url http://localhost:8000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import (OperationCounter,
+                               configure_inprocess_environment,
+                               latency_summary, server_timing_counts, timer)
+
+FINAL_STATUSES = {"completed", "failed", "cancelled"}
+ZERO_PROFILE = '{"*": {"latency": "zero"}}'
+
+
+class LoadTest:
+    def __init__(self, client, poll_interval: float, timeout: float):
+        self.client = client
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.latencies = {
+            "discover": [],
+            "create_vm": [],
+            "create_migration": [],
+            "start_migration": [],
+            "poll": [],
+            "end_to_end": [],
+        }
+        self.outcomes = {}
+        self.api_ops = {"db": 0, "redis": 0}
+        self.errors = []
+
+    def _request(self, op: str, method: str, url: str, **kwargs):
+        with timer(self.latencies[op]):
+            response = self.client.request(method, url, **kwargs)
+        for name, count in server_timing_counts(
+            response.headers.get("server-timing")
+        ).items():
+            if name in self.api_ops:
+                self.api_ops[name] += count
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {url} -> {response.status_code}")
+        return response.json()
+
+    def discover(self, host: str):
+        task = self._request(
+            "discover",
+            "POST",
+            "/api/v1/vms/discover",
+            json={"host": host, "username": "load", "password": "test"},
+        )
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            status = self._request("poll", "GET", f"/api/v1/tasks/{task['task_id']}")
+            if status["ready"]:
+                return status
+            time.sleep(self.poll_interval)
+        raise TimeoutError(f"Discovery on {host} did not finish")
+
+    def migrate_one(self, index: int):
+        start = time.perf_counter()
+        suffix = uuid.uuid4().hex[:12]
+        try:
+            vm = self._request(
+                "create_vm",
+                "POST",
+                "/api/v1/vms/",
+                json={
+                    "name": f"load-vm-{index}",
+                    "uuid": f"load-{suffix}",
+                    "os_family": "linux" if index % 2 else "windows",
+                    "cpu_count": 2,
+                    "memory_mb": 4096,
+                    "discovered_services": ["nginx"] if index % 2 else ["IIS"],
+                },
+            )
+            migration = self._request(
+                "create_migration",
+                "POST",
+                "/api/v1/migrations/",
+                json={"name": f"load-{suffix}", "vm_id": vm["id"]},
+            )
+            self._request(
+                "start_migration", "POST", f"/api/v1/migrations/{migration['id']}/start"
+            )
+
+            deadline = time.monotonic() + self.timeout
+            status = None
+            while time.monotonic() < deadline:
+                status = self._request(
+                    "poll", "GET", f"/api/v1/migrations/{migration['id']}"
+                )["status"]
+                if status in FINAL_STATUSES:
+                    break
+                time.sleep(self.poll_interval)
+            else:
+                status = f"timeout ({status})"
+        except Exception as e:
+            self.errors.append(str(e))
+            status = "error"
+
+        self.latencies["end_to_end"].append(time.perf_counter() - start)
+        self.outcomes[status] = self.outcomes.get(status, 0) + 1
+
+    def run(self, migrations: int, concurrency: int, discoveries: int):
+        for i in range(discoveries):
+            self.discover(f"loadtest-host-{i}-{uuid.uuid4().hex[:6]}")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(self.migrate_one, range(migrations)))
+        return time.perf_counter() - start
+
+
+def run_inprocess(args):
+    workdir = tempfile.mkdtemp(prefix="vmshift-load-")
+    configure_inprocess_environment(
+        f"sqlite:///{os.path.join(workdir, 'load.db')}",
+        PROFILING_ENABLED="true",
+        PROFILING_SLOW_REQUEST_MS=float("inf"),
+        SIMULATION_PROFILE=args.profile,
+        SIMULATION_SEED=args.seed,
+    )
+
+    from celery.contrib.testing.worker import start_worker
+    from fastapi.testclient import TestClient
+
+    from app.celery_app import celery_app, celery_queues
+    from app.main import app
+    from benchmarks.common import create_schema
+
+    create_schema()
+    # The in-memory transport polls, and a worker whose prefetch window is
+    # full only re-polls every 2s; keep both from dominating latencies
+    celery_app.conf.broker_transport_options = {"polling_interval": 0.005}
+    celery_app.conf.worker_prefetch_multiplier = 4
+    counter = OperationCounter()
+    counter.install()
+
+    with start_worker(
+        celery_app,
+        pool="threads",
+        concurrency=args.worker_concurrency or args.concurrency,
+        perform_ping_check=False,
+        queues=celery_queues(),
+        shutdown_timeout=30,
+    ), TestClient(app) as client:
+        test = LoadTest(client, args.poll_interval, args.timeout)
+        elapsed = test.run(args.migrations, args.concurrency, args.discoveries)
+
+    ops = counter.snapshot()
+    return (
+        test,
+        elapsed,
+        {
+            "db_statements": ops["sql"],
+            "redis_commands": ops["redis"],
+        },
+    )
+
+
+def run_remote(args):
+    import httpx
+
+    with httpx.Client(base_url=args.base_url, timeout=30) as client:
+        test = LoadTest(client, args.poll_interval, args.timeout)
+        elapsed = test.run(args.migrations, args.concurrency, args.discoveries)
+
+    # Only what the API reports via Server-Timing (requires PROFILING_ENABLED)
+    return (
+        test,
+        elapsed,
+        {
+            "db_statements": test.api_ops["db"],
+            "redis_commands": test.api_ops["redis"],
+        },
+    )
+
+
+def build_report(args, test: LoadTest, elapsed: float, ops: dict) -> dict:
+    finished = sum(test.outcomes.get(s, 0) for s in FINAL_STATUSES)
+    per_migration = max(args.migrations, 1)
+    return {
+        "mode": "remote" if args.base_url else "inprocess",
+        "migrations": args.migrations,
+        "concurrency": args.concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(finished / elapsed, 3) if elapsed else 0,
+        "outcomes": test.outcomes,
+        "latency": {op: latency_summary(v) for op, v in test.latencies.items() if v},
+        "operations_per_migration": {
+            "db_statements": round(ops["db_statements"] / per_migration, 2),
+            "redis_commands": round(ops["redis_commands"] / per_migration, 2),
+        },
+        "errors": test.errors[:10],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--migrations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--discoveries", type=int, default=1)
+    parser.add_argument(
+        "--worker-concurrency",
+        type=int,
+        help="In-process worker threads (default: --concurrency)",
+    )
+    parser.add_argument("--poll-interval", type=float, default=0.02)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument(
+        "--profile",
+        default=ZERO_PROFILE,
+        help="SIMULATION_PROFILE JSON or file (default: zero latency everywhere)",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="Run against a deployed API instead")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    runner = run_remote if args.base_url else run_inprocess
+    report = build_report(args, *runner(args))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+    return 0 if not report["errors"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
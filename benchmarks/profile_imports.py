@@ -0,0 +1,113 @@
+"""
+Import-Time Profile
+
+Imports a module (app.main by default) in a fresh interpreter with
+`python -X importtime` and reports where the time goes: the slowest
+modules by cumulative and self time, and self time summed per top-level
+package. Modules that the API should only load on first use (Celery,
+numpy, yaml, redis) are flagged if they show up.
+
+    python -m benchmarks.profile_imports
+    python -m benchmarks.profile_imports --module app.tasks --top 30
+    python -m benchmarks.profile_imports --json imports.json
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+DEFERRED_PACKAGES = ("celery", "kombu", "numpy", "yaml", "redis")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr: str) -> list:
+    """[{module, self_us, cumulative_us, depth}] in import order"""
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            entries.append(
+                {
+                    "module": match.group(4),
+                    "self_us": int(match.group(1)),
+                    "cumulative_us": int(match.group(2)),
+                    "depth": len(match.group(3)) // 2,
+                }
+            )
+    return entries
+
+
+def profile(module: str = "app.main") -> list:
+    """Import module in a fresh interpreter and return its import-time entries"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def summarize(entries: list, top: int = 20) -> dict:
+    """Total import time, slowest modules and self time per package"""
+    packages = defaultdict(int)
+    for entry in entries:
+        packages[entry["module"].split(".", 1)[0]] += entry["self_us"]
+    loaded = {entry["module"] for entry in entries}
+    return {
+        "total_ms": round(sum(e["self_us"] for e in entries) / 1000, 1),
+        "modules": len(entries),
+        "slowest_cumulative": sorted(
+            entries, key=lambda e: e["cumulative_us"], reverse=True
+        )[:top],
+        "slowest_self": sorted(entries, key=lambda e: e["self_us"], reverse=True)[:top],
+        "packages": dict(
+            sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ),
+        "deferred_loaded": [name for name in DEFERRED_PACKAGES if name in loaded],
+    }
+
+
+def print_report(module: str, summary: dict):
+    print(f"import {module}: {summary['total_ms']} ms, {summary['modules']} modules")
+    for title, rows, key in (
+        ("Slowest by cumulative time", "slowest_cumulative", "cumulative_us"),
+        ("Slowest by self time", "slowest_self", "self_us"),
+    ):
+        print(f"\n{title}:")
+        for entry in summary[rows]:
+            print(f"  {entry[key] / 1000:9.1f} ms  {entry['module']}")
+    print("\nSelf time per package:")
+    for package, micros in summary["packages"].items():
+        print(f"  {micros / 1000:9.1f} ms  {package}")
+    if summary["deferred_loaded"]:
+        print(
+            "\nLoaded at import but expected on first use: "
+            + ", ".join(summary["deferred_loaded"])
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", help="Write the summary as JSON to this file")
+    args = parser.parse_args(argv)
+
+    summary = summarize(profile(args.module), args.top)
+    print_report(args.module, summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"module": args.module, **summary}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Benchmark Suite Runner
+
+Runs the API, ingest, artifact, task, right-sizing, utilization, capacity,
+dependency graph, fingerprint, compression and startup benchmarks against
+SQLite (default) or any DATABASE_URL, writes the results as JSON and
+optionally compares them with a baseline, exiting non-zero on regressions
+beyond a threshold or on results over their budget.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --sizes 1000,10000,100000 --output bench.json
+    python -m benchmarks.run --database-url postgresql://... --only api
+    python -m benchmarks.run --baseline main.json --threshold 0.2
+    STARTUP_BUDGET_MS=1500 python -m benchmarks.run --only startup
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import configure_inprocess_environment
+
+SUITES = [
+    "api",
+    "ingest",
+    "artifacts",
+    "tasks",
+    "rightsizing",
+    "utilization",
+    "capacity",
+    "dependencies",
+    "fingerprints",
+    "compression",
+    "startup",
+]
+HIGHER_IS_BETTER_UNITS = {"ops/s", "vms/s", "samples/s"}
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """Return a list of regressions worse than threshold (fractional)"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous["value"]:
+            continue
+        change = (current["value"] - previous["value"]) / previous["value"]
+        if current["unit"] in HIGHER_IS_BETTER_UNITS:
+            change = -change
+        if change > threshold:
+            regressions.append(
+                {
+                    "name": name,
+                    "baseline": previous["value"],
+                    "current": current["value"],
+                    "unit": current["unit"],
+                    "regression_pct": round(change * 100, 1),
+                }
+            )
+    return regressions
+
+
+def over_budget(results: dict):
+    """Return results exceeding the budget their suite set for them"""
+    return [
+        {"name": name, "budget": result["budget"], "current": result["value"]}
+        for name, result in results.items()
+        if "budget" in result and result["value"] > result["budget"]
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--only", help=f"Comma-separated subset of {SUITES}")
+    parser.add_argument(
+        "--sizes", default="1000,10000", help="Row counts for table-size benchmarks"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url", help="Default: a temporary SQLite file")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown as a fraction of the baseline (default 0.2)",
+    )
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(prefix="vmshift-bench-"), "bench.db"
+    )
+    configure_inprocess_environment(
+        database_url, SIMULATION_PROFILE='{"*": {"latency": "zero"}}'
+    )
+
+    from benchmarks.common import create_schema
+
+    create_schema()
+
+    ctx = SimpleNamespace(
+        sizes=[int(s) for s in args.sizes.split(",") if s],
+        repeat=args.repeat,
+    )
+    suites = args.only.split(",") if args.only else SUITES
+
+    results = {}
+    for suite in suites:
+        module = importlib.import_module(f"benchmarks.bench_{suite}")
+        start = time.perf_counter()
+        suite_results = module.run(ctx)
+        for result in suite_results.values():
+            result["value"] = round(result["value"], 4)
+        results.update(suite_results)
+        print(
+            f"{suite}: {len(suite_results)} results in "
+            f"{time.perf_counter() - start:.1f}s",
+            file=sys.stderr,
+        )
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": database_url.split(":", 1)[0],
+            "sizes": ctx.sizes,
+            "repeat": ctx.repeat,
+        },
+        "results": results,
+    }
+
+    exit_code = 0
+    exceeded = over_budget(results)
+    if exceeded:
+        report["over_budget"] = exceeded
+        exit_code = 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        report["regressions"] = regressions
+        if regressions:
+            exit_code = 1
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
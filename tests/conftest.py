@@ -9,7 +9,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
-from app.database import Base, get_db
+from app.database import Base, get_db, get_read_db
 
 # Import models FIRST to register with Base before importing main
 from app.models.migration import Migration  # noqa: F401
@@ -58,6 +58,7 @@ def client(db_session):
             pass
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
     from fastapi.testclient import TestClient
 
@@ -65,3 +66,54 @@ def client(db_session):
         yield c
 
     app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def make_migration(db_session):
+    """
+    Factory adding a committed migration; keywords set its columns. All
+    migrations of a test belong to one VM, created on first use.
+    """
+    made = []
+
+    def make(**fields):
+        if not made:
+            vm = VirtualMachine(name="vm-1", uuid="uuid-1", os_family="linux")
+            db_session.add(vm)
+            db_session.flush()
+            made.append(vm)
+        fields.setdefault("name", f"m-{len(made)}")
+        migration = Migration(vm_id=made[0].id, **fields)
+        db_session.add(migration)
+        db_session.commit()
+        made.append(migration)
+        return migration
+
+    return make
+
+
+@pytest.fixture
+def migration(make_migration):
+    """A pending migration of a fresh VM"""
+    return make_migration()
+
+
+@pytest.fixture
+def lua_redis():
+    """
+    Redis that runs Lua scripts: the server at TEST_REDIS_URL (a dedicated
+    database, flushed after each test) or else fakeredis with Lua support
+    """
+    url = os.getenv("TEST_REDIS_URL")
+    if url:
+        import redis
+
+        client = redis.from_url(url)
+    else:
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa", reason="fakeredis needs lupa to run Lua")
+        client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    try:
+        yield client
+    finally:
+        client.flushdb()
@@ -0,0 +1,277 @@
+"""
+Tests for circuit breakers and retry backoff
+"""
+
+import time
+
+import pytest
+import redis
+
+from app.config import settings
+from app.models.event import MigrationEvent
+from app.models.migration import Migration, MigrationStatus
+from app.services import breakers as breakers_module
+from app.services.breakers import (BreakerOpen, CircuitBreakers, backoff,
+                                   call_with_retry)
+from app.services.throttle import REGISTRY, Throttled
+from app.tasks import migration_tasks
+from tests.conftest import TestingSessionLocal
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.results = []
+
+    def hgetall(self, key):
+        self.results.append(self.redis.hashes.get(key, {}))
+
+    def execute(self):
+        return self.results
+
+
+class FakeRedis:
+    """Scripted breaker calls plus the hash/set reads used by states()"""
+
+    def __init__(self, allow=(1, 0), error=None):
+        self.allow = allow
+        self.error = error
+        self.failures = []
+        self.successes = []
+        self.hashes = {}
+        self.index = set()
+
+    def register_script(self, source):
+        def script(keys, args=()):
+            if self.error:
+                raise self.error
+            if source == breakers_module._ALLOW:
+                return list(self.allow)
+            if source == breakers_module._FAILURE:
+                self.failures.append(keys[0])
+                return 0
+            assert source == breakers_module._SUCCESS
+            self.successes.append(keys[0])
+            return 1
+
+        return script
+
+    def smembers(self, key):
+        return {member.encode() for member in self.index}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def srem(self, key, *members):
+        self.index.difference_update(members)
+
+
+@pytest.fixture
+def install(monkeypatch):
+    def install(fake):
+        breakers = CircuitBreakers(fake)
+        monkeypatch.setattr(breakers_module, "_breakers", breakers)
+        return breakers
+
+    return install
+
+
+def test_backoff_is_capped_full_jitter():
+    samples = [backoff(attempt, 1.0, 20.0) for attempt in range(10) for _ in range(50)]
+    assert all(0 <= delay <= 20.0 for delay in samples)
+    assert max(backoff(0, 1.0, 20.0) for _ in range(200)) <= 1.0
+    assert len(set(samples)) > 100
+
+
+def test_failures_are_retried_then_succeed(install):
+    fake = FakeRedis()
+    install(fake)
+    calls, sleeps = [], []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("registry down")
+        return "pushed"
+
+    result = call_with_retry(flaky, REGISTRY, "Registry.Example.com", 3, sleeps.append)
+
+    assert result == "pushed"
+    assert len(sleeps) == 2
+    assert fake.failures == ["breaker:registry:registry.example.com"] * 2
+    assert fake.successes == ["breaker:registry:registry.example.com"]
+
+
+def test_last_failure_is_raised(install):
+    install(FakeRedis())
+    sleeps = []
+
+    def failing():
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        call_with_retry(failing, REGISTRY, "r", 3, sleeps.append)
+    assert len(sleeps) == 2
+
+
+def test_open_breaker_fails_fast(install):
+    fake = FakeRedis(allow=(0, 12000))
+    install(fake)
+    calls = []
+
+    with pytest.raises(BreakerOpen) as opened:
+        call_with_retry(lambda: calls.append(1), REGISTRY, "r", 3, time.sleep)
+
+    assert calls == []
+    assert opened.value.retry_after == 12.0
+    # Deferred by tasks exactly like a throttled target
+    assert isinstance(opened.value, Throttled)
+    assert "circuit open" in str(opened.value)
+
+
+def test_unavailable_redis_fails_open(install):
+    install(FakeRedis(error=redis.ConnectionError("down")))
+    assert call_with_retry(lambda: "ok", REGISTRY, "r", 1) == "ok"
+
+
+def test_states_report_open_half_open_and_closed(install, monkeypatch):
+    fake = FakeRedis()
+    breakers = install(fake)
+    now_ms = 1_000_000_000
+    monkeypatch.setattr(breakers_module.time, "time", lambda: now_ms / 1000)
+    fake.index = {"registry:a", "registry:b", "cluster:k8s/default", "registry:gone"}
+    fake.hashes = {
+        "breaker:registry:a": {
+            b"state": b"open",
+            b"open_until": str(now_ms + 5000).encode(),
+        },
+        "breaker:registry:b": {b"state": b"open", b"open_until": b"1"},
+        "breaker:cluster:k8s/default": {b"failures": b"2"},
+    }
+
+    states = {(s["kind"], s["target"]): s for s in breakers.states()}
+
+    assert states["registry", "a"]["state"] == "open"
+    assert states["registry", "a"]["retry_after"] == 5.0
+    assert states["registry", "b"]["state"] == "half_open"
+    assert states["cluster", "k8s/default"] == {
+        "kind": "cluster",
+        "target": "k8s/default",
+        "state": "closed",
+        "failures": 2,
+        "retry_after": 0.0,
+    }
+    # Expired breakers drop out of the index
+    assert "registry:gone" not in fake.index
+
+
+def test_breakers_endpoint(client, install):
+    fake = FakeRedis()
+    install(fake)
+    fake.index = {"registry:a"}
+    fake.hashes = {
+        "breaker:registry:a": {b"state": b"open", b"open_until": b"99999999999999"}
+    }
+
+    body = client.get("/health/breakers").json()
+    assert body["status"] == "degraded"
+    assert body["open"] == 1
+    assert body["breakers"][0]["target"] == "a"
+
+
+@pytest.fixture
+def lua_breakers(lua_redis):
+    """Breakers running their scripts: 2 failures open for 100 ms"""
+    return CircuitBreakers(lua_redis, 2, 60.0, 0.1, 1.0)
+
+
+def test_breaker_opens_at_the_threshold(lua_breakers):
+    lua_breakers.check(REGISTRY, "r")
+    lua_breakers.record_failure(REGISTRY, "r")
+    lua_breakers.check(REGISTRY, "r")
+    lua_breakers.record_failure(REGISTRY, "r")
+
+    with pytest.raises(BreakerOpen) as opened:
+        lua_breakers.check(REGISTRY, "r")
+    assert 0 < opened.value.retry_after <= 0.1
+    lua_breakers.check(REGISTRY, "other")
+    [state] = lua_breakers.states()
+    assert (state["target"], state["state"], state["failures"]) == ("r", "open", 2)
+
+
+def test_successes_while_closed_keep_the_failure_count(lua_breakers):
+    lua_breakers.record_failure(REGISTRY, "r")
+    lua_breakers.record_success(REGISTRY, "r")
+    lua_breakers.record_failure(REGISTRY, "r")
+
+    with pytest.raises(BreakerOpen):
+        lua_breakers.check(REGISTRY, "r")
+
+
+def test_one_probe_after_cooldown_and_its_success_closes(lua_breakers):
+    for _ in range(2):
+        lua_breakers.record_failure(REGISTRY, "r")
+    # A call started before opening fails late: not a probe, no reopening
+    lua_breakers.record_failure(REGISTRY, "r")
+    time.sleep(0.12)
+
+    lua_breakers.check(REGISTRY, "r")  # the probe
+    with pytest.raises(BreakerOpen):
+        lua_breakers.check(REGISTRY, "r")
+
+    lua_breakers.record_success(REGISTRY, "r")
+    lua_breakers.check(REGISTRY, "r")
+    assert lua_breakers.states() == []
+
+
+def test_failed_probe_reopens_for_twice_the_cooldown(lua_breakers):
+    for _ in range(2):
+        lua_breakers.record_failure(REGISTRY, "r")
+    time.sleep(0.12)
+    lua_breakers.check(REGISTRY, "r")
+
+    lua_breakers.record_failure(REGISTRY, "r")
+
+    with pytest.raises(BreakerOpen) as reopened:
+        lua_breakers.check(REGISTRY, "r")
+    assert 0.1 < reopened.value.retry_after <= 0.2
+
+
+def test_deferred_migration_resumes_at_its_stage(
+    db_session, make_migration, install, monkeypatch
+):
+    # Deferred by an open registry breaker while pushing
+    migration = make_migration(
+        status=MigrationStatus.PUSHING_IMAGE,
+        progress_percent=55,
+        dockerfile_content="FROM scratch",
+    )
+
+    class Simulator:
+        stages = []
+
+        def stage(self, stage, key=None):
+            self.stages.append(stage)
+            return 0.0
+
+    install(FakeRedis())
+    monkeypatch.setattr(migration_tasks, "get_simulator", Simulator)
+    monkeypatch.setattr(migration_tasks, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(settings, "THROTTLE_ENABLED", False)
+
+    # Called directly there is no task id to report progress under
+    task = migration_tasks.run_migration_task
+    monkeypatch.setattr(task, "update_state", lambda **kwargs: None)
+
+    task.run(migration.id)
+
+    assert Simulator.stages == ["migration.push", "migration.deploy"]
+    db_session.expire_all()
+    resumed = db_session.get(Migration, migration.id)
+    assert resumed.status == MigrationStatus.COMPLETED
+    assert resumed.dockerfile_content == "FROM scratch"
+    events = db_session.query(MigrationEvent).order_by(MigrationEvent.id).all()
+    assert [(e.from_status, e.status) for e in events] == [
+        ("pushing_image", "deploying"),
+        ("deploying", "completed"),
+    ]
@@ -0,0 +1,84 @@
+"""
+Tests for cache-friendly Dockerfiles and build grouping
+"""
+
+from types import SimpleNamespace
+
+from app.models.migration import Migration
+from app.models.vm import VirtualMachine
+from app.services.artifact_generator import ArtifactGenerator
+from app.services.build_cache import cache_key, group_builds, parse_stages
+
+
+def _dockerfile(name, os_family, services):
+    vm = SimpleNamespace(
+        name=name,
+        os_family=os_family,
+        discovered_services=services,
+        installed_software=None,
+        cpu_count=2,
+        memory_mb=2048,
+    )
+    migration = SimpleNamespace(base_image=None, container_port=None)
+    return ArtifactGenerator(migration, vm).generate_dockerfile()
+
+
+def test_linux_packages_in_one_layer_before_source():
+    stages = parse_stages(_dockerfile("web", "linux", ["nginx", "Python Flask"]))
+    final = stages[-1]
+
+    assert len(stages) == 2  # Python dependencies are built in their own stage
+    installs = [i for i in final if "apt-get install" in i]
+    assert len(installs) == 1
+    assert "nginx" in installs[0] and "python3" in installs[0]
+    source = final.index("COPY ./app /app")
+    assert final.index("COPY --from=python-deps /opt/venv /opt/venv") < source
+    assert final.index(installs[0]) < source
+
+
+def test_windows_features_in_one_layer_before_source():
+    [stage] = parse_stages(_dockerfile("iis", "windows", ["IIS", "ASP.NET"]))
+    features = [i for i in stage if i.startswith("RUN Install-WindowsFeature")]
+    assert len(features) == 1
+    assert stage.index("COPY ./app /inetpub/wwwroot") > stage.index(features[0])
+
+
+def test_identical_base_layers_share_a_key():
+    a = cache_key(_dockerfile("a", "linux", ["nginx"]))
+    b = cache_key(_dockerfile("b", "linux", ["nginx"]))
+    c = cache_key(_dockerfile("c", "linux", ["Python"]))
+    assert a[0] == b[0] != c[0]
+    assert c[1]["base_images"] == ["ubuntu:22.04", "ubuntu:22.04"]
+
+
+def test_groups_are_balanced_over_builders():
+    items = [(i, _dockerfile(f"vm{i}", "linux", ["nginx"])) for i in range(4)]
+    items += [(10 + i, _dockerfile(f"py{i}", "linux", ["Python"])) for i in range(3)]
+    items += [(20, _dockerfile("iis", "windows", ["IIS"]))]
+
+    report = group_builds(items, builders=2)
+
+    assert [len(g["migration_ids"]) for g in report["groups"]] == [4, 3, 1]
+    assert [b["migrations"] for b in report["builders"]] == [4, 4]
+    assert report["cache_hit_ratio"] == (8 - 3) / 8
+
+
+def test_build_groups_endpoint(client, db_session):
+    vms = [
+        VirtualMachine(
+            name=f"web-{i}",
+            uuid=f"u-{i}",
+            os_family="linux",
+            discovered_services=["nginx"],
+        )
+        for i in range(3)
+    ]
+    db_session.add_all(vms)
+    db_session.commit()
+    db_session.add_all([Migration(vm_id=vm.id, name=vm.name) for vm in vms])
+    db_session.commit()
+
+    body = client.get("/api/v1/migrations/build-groups", params={"builders": 2}).json()
+    assert body["migrations"] == 3
+    assert len(body["groups"]) == 1
+    assert sorted(b["migrations"] for b in body["builders"]) == [0, 3]
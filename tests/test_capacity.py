@@ -0,0 +1,99 @@
+"""
+Tests for the capacity planner
+"""
+
+import numpy as np
+
+from app.models.migration import Migration, TargetPlatform
+from app.models.vm import VirtualMachine
+from app.services.capacity import BEST_FIT, FIRST_FIT, NodeShape, pack
+
+
+def _first_fit_reference(cpu, memory, shape):
+    """Item-at-a-time first-fit decreasing"""
+    items = sorted(
+        zip(cpu, memory),
+        key=lambda item: (
+            -max(item[0] / shape.cpu_m, item[1] / shape.memory_mb),
+            -(item[0] + item[1]),
+        ),
+    )
+    nodes = []
+    for c, m in items:
+        for node in nodes:
+            if node[0] >= c and node[1] >= m and node[2] > 0:
+                node[0] -= c
+                node[1] -= m
+                node[2] -= 1
+                break
+        else:
+            nodes.append([shape.cpu_m - c, shape.memory_mb - m, shape.max_pods - 1])
+    return len(nodes)
+
+
+def test_bulk_first_fit_matches_item_by_item():
+    rng = np.random.default_rng(3)
+    shape = NodeShape("n", cpu_m=4000, memory_mb=16384, max_pods=20)
+    cpu = rng.choice([100, 250, 500, 1500], 60)
+    memory = rng.choice([256, 1024, 4096], 60)
+    pods = rng.integers(1, 6, 60)
+
+    plan = pack(cpu, memory, pods, shape, FIRST_FIT)
+
+    expected = _first_fit_reference(
+        np.repeat(cpu, pods), np.repeat(memory, pods), shape
+    )
+    assert plan["nodes"] == expected
+    assert plan["pods"] == pods.sum()
+    assert plan["nodes"] >= plan["lower_bound_nodes"]
+
+
+def test_best_fit_fills_the_tightest_node():
+    shape = NodeShape("n", cpu_m=1000, memory_mb=1000, max_pods=10)
+    # First-fit puts the 300s on the 600 node; best fit keeps them together
+    plan_ff = pack([600, 500, 400, 300], [1] * 4, [1, 1, 1, 2], shape, FIRST_FIT)
+    plan_bf = pack([600, 500, 400, 300], [1] * 4, [1, 1, 1, 2], shape, BEST_FIT)
+    assert plan_bf["nodes"] <= plan_ff["nodes"]
+
+
+def test_pod_limit_and_unplaceable_workloads():
+    shape = NodeShape("n", cpu_m=1000, memory_mb=1000, max_pods=2)
+    plan = pack([100, 2000], [100, 100], [5, 1], shape)
+    assert plan["nodes"] == 3
+    assert plan["unplaceable"].tolist() == [1]
+
+
+def test_plan_endpoint(client, db_session):
+    vm = VirtualMachine(name="app", uuid="u-1", cpu_count=2, memory_mb=4096)
+    db_session.add(vm)
+    db_session.commit()
+    migration = Migration(
+        vm_id=vm.id,
+        name="app",
+        target_platform=TargetPlatform.KUBERNETES,
+        replicas=2,
+    )
+    db_session.add(migration)
+    db_session.commit()
+
+    response = client.post(
+        "/api/v1/capacity/plan",
+        json={
+            "node_shapes": [
+                {"name": "small", "cpu_m": 1000, "memory_mb": 4096, "cost": 1.0},
+                {"name": "large", "cpu_m": 8000, "memory_mb": 32768, "cost": 5.0},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["workloads"] == 1
+    assert body["pods"] == 6  # 2 replicas at the HPA ceiling of 3x
+    assert len(body["plans"]) == 4
+    assert body["recommended"]["cost"] == min(p["cost"] for p in body["plans"])
+
+    response = client.post(
+        "/api/v1/capacity/plan",
+        json={"node_shapes": [{"name": "n", "cpu_m": 1000, "memory_mb": 1000}]},
+    )
+    assert response.json()["plans"][0]["unplaceable"] == [f"migration:{migration.id}"]
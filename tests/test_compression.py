@@ -0,0 +1,180 @@
+"""
+Tests for compressed artifact storage and Content-Encoding negotiation
+"""
+
+import base64
+import gzip
+
+import pytest
+from sqlalchemy import text
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.testclient import TestClient
+
+from app.middleware import CompressionMiddleware
+from app.models.migration import Migration
+from app.models.vm import VirtualMachine
+from app.services.compression import (BROTLI, GZIP, PrecompressedCache,
+                                      accepted_encodings, accepts,
+                                      choose_encoding)
+
+DOCKERFILE = "FROM ubuntu:22.04\n" + "RUN true\n" * 50
+
+
+@pytest.fixture
+def migration(make_migration):
+    return make_migration(dockerfile_content=DOCKERFILE)
+
+
+def test_artifacts_are_stored_compressed(db_session, migration):
+    stored = db_session.execute(
+        text("SELECT dockerfile_content FROM migrations WHERE id = :id"),
+        {"id": migration.id},
+    ).scalar()
+
+    # Base64 gzip in the existing text column, so no schema change is needed
+    assert isinstance(stored, str)
+    assert len(stored) < len(DOCKERFILE)
+    stream = base64.b64decode(stored)
+    assert gzip.decompress(stream).decode() == DOCKERFILE
+    # Deterministic, so unchanged artifacts keep their bytes
+    assert stream == gzip.compress(DOCKERFILE.encode(), 6, mtime=0)
+
+    db_session.expire_all()
+    assert db_session.get(Migration, migration.id).dockerfile_content == DOCKERFILE
+
+
+def test_uncompressed_legacy_values_are_read(db_session, migration):
+    db_session.execute(
+        text("UPDATE migrations SET docker_compose = :v WHERE id = :id"),
+        {"v": "version: '3.8'\n", "id": migration.id},
+    )
+    db_session.expire_all()
+    assert db_session.get(Migration, migration.id).docker_compose == "version: '3.8'\n"
+
+
+def test_accept_encoding_parsing():
+    assert accepted_encodings("gzip;q=0.5, br, *;q=0") == {
+        "gzip": 0.5,
+        "br": 1.0,
+        "*": 0.0,
+    }
+    assert accepts("deflate, gzip", "gzip")
+    assert accepts("*", "gzip")
+    assert not accepts("gzip;q=0", "gzip")
+    assert not accepts(None, "gzip")
+
+
+def test_artifact_served_compressed(client, migration):
+    response = client.get(
+        f"/api/v1/migrations/{migration.id}/artifacts/dockerfile",
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.text == DOCKERFILE
+
+
+def test_artifact_served_identity(client, migration):
+    response = client.get(
+        f"/api/v1/migrations/{migration.id}/artifacts/dockerfile",
+        headers={"Accept-Encoding": "identity"},
+    )
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text == DOCKERFILE
+
+
+def test_artifact_not_found(client, migration):
+    base = f"/api/v1/migrations/{migration.id}/artifacts"
+    assert client.get(f"{base}/kubernetes_manifest").status_code == 404
+    assert client.get(f"{base}/unknown").status_code == 404
+    assert client.get("/api/v1/migrations/999/artifacts/dockerfile").status_code == 404
+
+
+def test_artifact_etag_revalidation(client, migration):
+    url = f"/api/v1/migrations/{migration.id}/artifacts/dockerfile"
+    tag = client.get(url).headers["etag"]
+
+    response = client.get(url, headers={"If-None-Match": tag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert client.get(url, headers={"If-None-Match": 'W/"other"'}).status_code == 200
+
+
+def test_choose_encoding_prefers_quality_then_our_order():
+    assert choose_encoding("gzip, br", (BROTLI, GZIP)) == BROTLI
+    assert choose_encoding("gzip, br;q=0.5", (BROTLI, GZIP)) == GZIP
+    assert choose_encoding("br", (GZIP,)) is None
+    assert choose_encoding("identity", (BROTLI, GZIP)) is None
+
+
+def test_precompressed_cache_is_lru_bounded_by_bytes():
+    cache = PrecompressedCache(max_bytes=10)
+    calls = []
+
+    def produce(body):
+        def make():
+            calls.append(body)
+            return body
+
+        return make
+
+    assert cache.get("a", GZIP, produce(b"aaaa")) == b"aaaa"
+    assert cache.get("a", GZIP, produce(b"xxxx")) == b"aaaa"
+    cache.get("b", GZIP, produce(b"bbbb"))
+    cache.get("a", GZIP, produce(b"aaaa"))  # a is now most recent
+    cache.get("c", GZIP, produce(b"cccc"))  # evicts b
+    cache.get("b", GZIP, produce(b"bbbb"))
+
+    assert calls == [b"aaaa", b"bbbb", b"cccc", b"bbbb"]
+    assert cache.size <= 10
+    assert cache.stats()["hits"] == 2
+
+
+def test_large_responses_are_compressed(client, db_session):
+    db_session.add_all(
+        VirtualMachine(name=f"vm-{i}", uuid=f"u-{i}", os_family="linux")
+        for i in range(50)
+    )
+    db_session.commit()
+
+    response = client.get("/api/v1/vms/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert len(response.json()) == 50
+
+    response = client.get("/api/v1/vms/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def _app(response):
+    async def app(scope, receive, send):
+        await response(scope, receive, send)
+
+    return CompressionMiddleware(app, minimum_size=100)
+
+
+def test_streaming_responses_are_compressed_per_chunk():
+    chunks = [b"x" * 300, b"y" * 300]
+
+    async def body():
+        for chunk in chunks:
+            yield chunk
+
+    client = TestClient(_app(StreamingResponse(body(), media_type="text/plain")))
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.content == b"".join(chunks)
+
+
+def test_already_compressed_types_pass_through():
+    png = PlainTextResponse(b"\x89PNG" * 100, media_type="image/png")
+    response = TestClient(_app(png)).get("/", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
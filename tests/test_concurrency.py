@@ -0,0 +1,89 @@
+"""
+Tests for optimistic concurrency on migrations and VMs
+"""
+
+import pytest
+
+from app.models.migration import Migration, MigrationStatus
+from app.services.concurrency import compare_and_set
+from app.tasks.migration_tasks import MigrationCancelled, MigrationProgress
+
+
+def test_put_honours_if_match(client, db_session, make_migration):
+    migration = make_migration(status=MigrationStatus.IN_PROGRESS)
+    url = f"/api/v1/migrations/{migration.id}"
+
+    etag = client.get(url).headers["etag"]
+    assert etag == '"1"'
+
+    response = client.put(
+        url, json={"status_message": "edited"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"2"'
+    assert response.json()["version"] == 2
+
+    # The old ETag no longer matches
+    response = client.put(
+        url, json={"status_message": "lost update"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+    assert client.get(url).json()["status_message"] == "edited"
+
+
+def test_vm_put_honours_if_match(client, db_session, make_migration):
+    migration = make_migration(status=MigrationStatus.IN_PROGRESS)
+    url = f"/api/v1/vms/{migration.vm_id}"
+
+    response = client.put(url, json={"name": "renamed"}, headers={"If-Match": '"7"'})
+    assert response.status_code == 412
+
+    response = client.put(url, json={"name": "renamed"}, headers={"If-Match": "*"})
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"2"'
+
+
+def test_task_progress_stops_at_a_concurrent_cancel(db_session, make_migration):
+    migration = make_migration(status=MigrationStatus.IN_PROGRESS)
+    progress = MigrationProgress(db_session, migration.id, migration.version)
+    progress.update(progress_percent=30)
+
+    # The user cancels between two progress writes
+    assert compare_and_set(
+        db_session,
+        Migration,
+        migration.id,
+        progress.version,
+        status=MigrationStatus.CANCELLED,
+    )
+    db_session.commit()
+
+    with pytest.raises(MigrationCancelled):
+        progress.update(status=MigrationStatus.DEPLOYING, progress_percent=80)
+
+    db_session.expire_all()
+    assert db_session.get(Migration, migration.id).status == MigrationStatus.CANCELLED
+
+
+def test_task_progress_keeps_concurrent_edits(db_session, make_migration):
+    migration = make_migration(status=MigrationStatus.IN_PROGRESS)
+    progress = MigrationProgress(db_session, migration.id, migration.version)
+
+    compare_and_set(db_session, Migration, migration.id, None, replicas=3)
+    db_session.commit()
+
+    progress.update(progress_percent=50)
+
+    db_session.expire_all()
+    row = db_session.get(Migration, migration.id)
+    assert (row.replicas, row.progress_percent, row.version) == (3, 50, 3)
+
+
+def test_cancel_wins_over_progress_writes(client, db_session, make_migration):
+    migration = make_migration(status=MigrationStatus.BUILDING_IMAGE)
+
+    response = client.post(f"/api/v1/migrations/{migration.id}/cancel")
+
+    assert response.status_code == 200
+    db_session.expire_all()
+    assert db_session.get(Migration, migration.id).status == MigrationStatus.CANCELLED
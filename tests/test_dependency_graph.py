@@ -0,0 +1,131 @@
+"""
+Tests for the VM dependency graph and wave planner
+"""
+
+import numpy as np
+
+from app.models.vm import VirtualMachine
+from app.services.dependency_graph import (DependencyGraph, get_graph_cache,
+                                           plan_waves)
+
+
+def _union_find_components(n, edges):
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in edges:
+        parent[find(a)] = find(b)
+    return [find(x) for x in range(n)]
+
+
+def _same_partition(a, b):
+    pairs = set(zip(a, b))
+    return len(pairs) == len(set(a)) == len(set(b))
+
+
+def test_weak_components_match_union_find():
+    rng = np.random.default_rng(2)
+    sources, targets = rng.integers(0, 500, 400), rng.integers(0, 500, 400)
+    graph = DependencyGraph(np.arange(500), sources, targets)
+
+    expected = _union_find_components(500, zip(sources.tolist(), targets.tolist()))
+    assert _same_partition(graph.weak_components().tolist(), expected)
+
+
+def test_strong_components_are_dependency_ordered():
+    # 0 -> 1 <-> 2 -> 3, so {1, 2} is a cycle that depends on 3
+    graph = DependencyGraph([10, 11, 12, 13], [0, 1, 2, 2], [1, 2, 1, 3])
+    labels = graph.strong_components()
+
+    assert labels[1] == labels[2]
+    assert labels[3] < labels[1] < labels[0]
+    assert graph.vm_ids[graph.predecessors(1)].tolist() == [10, 12]
+
+
+def test_waves_keep_components_together_and_respect_size():
+    # Two 3-VM apps, one 6-VM chain and four standalone VMs
+    sources = [0, 1, 3, 4, 6, 7, 8, 9, 10]
+    targets = [1, 2, 4, 5, 7, 8, 9, 10, 11]
+    graph = DependencyGraph(np.arange(16), sources, targets)
+
+    plan = plan_waves(graph, max_wave_size=4)
+
+    waves = [set(wave["vm_ids"]) for wave in plan["waves"]]
+    assert all(len(wave) <= 4 for wave in waves)
+    assert sorted(v for wave in waves for v in wave) == list(range(16))
+    for app in ({0, 1, 2}, {3, 4, 5}):
+        assert any(app <= wave for wave in waves)
+    # The chain is split dependencies first: 11 migrates before 6
+    chain = [i for i, wave in enumerate(waves) if wave & set(range(6, 12))]
+    assert 11 in waves[chain[0]] and 6 in waves[chain[-1]]
+    assert plan["components"] == 7
+
+
+def test_wave_and_dependency_endpoints(client, db_session):
+    db_session.add_all(
+        [
+            VirtualMachine(
+                name="web",
+                uuid="u-web",
+                ip_address="10.0.0.1",
+                network_config={"connections": ["10.0.0.2:8080"]},
+            ),
+            VirtualMachine(
+                name="app",
+                uuid="u-app",
+                ip_address="10.0.0.2",
+                network_config={"connections": [{"host": "db", "port": 1433}]},
+            ),
+            VirtualMachine(name="db", uuid="u-db", ip_address="10.0.0.3"),
+            VirtualMachine(name="solo", uuid="u-solo", ip_address="10.0.0.9"),
+        ]
+    )
+    db_session.commit()
+    ids = {vm.name: vm.id for vm in db_session.query(VirtualMachine)}
+
+    get_graph_cache().invalidate()
+    body = client.get("/api/v1/vms/waves", params={"max_wave_size": 3}).json()
+    assert body["edges"] == 2
+    assert [sorted(w["vm_ids"]) for w in body["waves"]] == [
+        sorted([ids["web"], ids["app"], ids["db"]]),
+        [ids["solo"]],
+    ]
+
+    body = client.get(f"/api/v1/vms/{ids['app']}/dependencies").json()
+    assert body["depends_on"] == [ids["db"]]
+    assert body["dependents"] == [ids["web"]]
+
+
+def test_vm_writes_refresh_the_cached_graph(client, db_session):
+    db_session.add(VirtualMachine(name="db", uuid="u-db", ip_address="10.0.0.3"))
+    db_session.commit()
+    get_graph_cache().invalidate()
+    assert client.get("/api/v1/vms/waves").json()["vms"] == 1
+
+    created = client.post(
+        "/api/v1/vms/",
+        json={
+            "name": "web",
+            "uuid": "u-web",
+            "ip_address": "10.0.0.1",
+            "network_config": {"connections": ["10.0.0.3:5432"]},
+        },
+    ).json()
+    body = client.get(f"/api/v1/vms/{created['id']}/dependencies").json()
+    assert body["depends_on"] == [db_session.query(VirtualMachine).first().id]
+
+    # Added behind the API's back (as discovery workers do): rebuilt once
+    db_session.add(VirtualMachine(name="app", uuid="u-app"))
+    db_session.commit()
+    app = db_session.query(VirtualMachine).filter_by(name="app").one()
+    body = client.get(f"/api/v1/vms/{app.id}/dependencies").json()
+    assert body == {"vm_id": app.id, "depends_on": [], "dependents": []}
+
+    client.delete(f"/api/v1/vms/{created['id']}")
+    assert client.get("/api/v1/vms/waves").json()["vms"] == 2
+    assert client.get("/api/v1/vms/999/dependencies").status_code == 404
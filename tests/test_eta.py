@@ -0,0 +1,112 @@
+"""
+Tests for stage statistics and ETA prediction
+"""
+
+from datetime import datetime
+
+import pytest
+
+from app.models.migration import Migration, MigrationStatus, TargetPlatform
+from app.models.stats import StageDurationStat
+from app.models.vm import VirtualMachine
+from app.services.eta import PIPELINE, EtaEstimator, observe_stage, segment_for
+
+
+def _observe_pipeline(db_session, segment, seconds, times=5):
+    for _ in range(times):
+        for stage in PIPELINE:
+            observe_stage(db_session, stage, seconds[stage], segment)
+    db_session.commit()
+
+
+def test_observations_update_every_granularity(db_session):
+    segment = ("kubernetes", "linux", "small")
+    observe_stage(db_session, MigrationStatus.BUILDING_IMAGE, 2.0, segment)
+    observe_stage(db_session, MigrationStatus.BUILDING_IMAGE, 4.0, segment)
+    db_session.commit()
+
+    rows = {
+        (r.target_platform, r.os_family, r.size_bucket): r
+        for r in db_session.query(StageDurationStat).filter_by(stage="building_image")
+    }
+    assert set(rows) == {
+        ("kubernetes", "linux", "small"),
+        ("kubernetes", "*", "*"),
+        ("*", "*", "*"),
+    }
+    for row in rows.values():
+        assert (row.count, row.total_seconds, row.total_squared_seconds) == (
+            2,
+            6.0,
+            20.0,
+        )
+
+
+def test_unknown_segment_parts_are_counted_once(db_session):
+    observe_stage(db_session, MigrationStatus.DEPLOYING, 3.0, ("*", "*", "*"))
+    observe_stage(db_session, MigrationStatus.DEPLOYING, 5.0, ("docker", "*", "*"))
+    db_session.commit()
+
+    rows = {
+        (r.target_platform, r.os_family, r.size_bucket): (r.count, r.total_seconds)
+        for r in db_session.query(StageDurationStat).filter_by(stage="deploying")
+    }
+    assert rows == {("docker", "*", "*"): (1, 5.0), ("*", "*", "*"): (2, 8.0)}
+
+
+def test_estimate_sums_remaining_stages(db_session):
+    vm = VirtualMachine(
+        name="vm-1", uuid="uuid-1", os_family="linux", cpu_count=2, memory_mb=2048
+    )
+    db_session.add(vm)
+    db_session.flush()
+    migration = Migration(
+        name="m-1",
+        vm_id=vm.id,
+        target_platform=TargetPlatform.KUBERNETES,
+        status=MigrationStatus.PUSHING_IMAGE,
+        stage_started_at=datetime.utcnow(),
+    )
+    db_session.add(migration)
+    db_session.commit()
+
+    seconds = {stage: 10.0 for stage in PIPELINE}
+    seconds[MigrationStatus.DEPLOYING] = 20.0
+    # Only the platform-wide key has data for this segment
+    _observe_pipeline(db_session, ("kubernetes", "windows", "large"), seconds)
+
+    estimator = EtaEstimator(min_samples=5)
+    eta = estimator.estimate(db_session, migration, vm)
+    assert eta["seconds"] == pytest.approx(30.0, abs=0.5)
+    assert eta["stddev_seconds"] == 0.0
+    assert eta["samples"] == 5
+
+    # Too few samples in every segment
+    assert EtaEstimator(min_samples=6).estimate(db_session, migration, vm) is None
+    assert segment_for(migration, vm) == ("kubernetes", "linux", "small")
+
+
+def test_migration_response_includes_eta(client, db_session, monkeypatch):
+    vm = VirtualMachine(name="vm-1", uuid="uuid-1")
+    db_session.add(vm)
+    db_session.flush()
+    running = Migration(
+        name="running",
+        vm_id=vm.id,
+        status=MigrationStatus.DEPLOYING,
+        stage_started_at=datetime.utcnow(),
+    )
+    done = Migration(name="done", vm_id=vm.id, status=MigrationStatus.COMPLETED)
+    db_session.add_all([running, done])
+    db_session.commit()
+    _observe_pipeline(db_session, ("*", "*", "*"), {s: 60.0 for s in PIPELINE})
+
+    monkeypatch.setattr(
+        "app.routers.migrations.get_eta_estimator", lambda: EtaEstimator()
+    )
+    body = client.get(f"/api/v1/migrations/{running.id}").json()
+    assert 0 < body["eta"]["seconds"] <= 60.0
+
+    listed = {m["name"]: m for m in client.get("/api/v1/migrations/").json()}
+    assert listed["running"]["eta"] is not None
+    assert listed["done"]["eta"] is None
@@ -0,0 +1,103 @@
+"""
+Tests for the service fingerprint index
+"""
+
+import os
+
+import pytest
+
+from app.models.vm import VirtualMachine
+from app.services.fingerprints import (FingerprintIndex, FingerprintRegistry,
+                                       InvalidRules, normalize)
+
+RULES = {
+    "defaults": {
+        "linux": {"base_image": "ubuntu:22.04", "command": "app", "packages": ["curl"]}
+    },
+    "rules": [
+        {
+            "name": "nginx",
+            "os_family": "linux",
+            "match": ["nginx"],
+            "packages": ["nginx"],
+            "source": "N\n",
+        },
+        {
+            "name": "java",
+            "os_family": "linux",
+            "match": ["OpenJDK", "tomcat"],
+            "base_image": "eclipse-temurin:17",
+            "priority": 10,
+            "packages": ["default-jre", "curl"],
+            "source": "J\n",
+        },
+        {
+            "name": "iis",
+            "os_family": "windows",
+            "match": ["IIS"],
+            "base_image": "servercore",
+        },
+    ],
+}
+
+
+def test_normalize_drops_versions_and_case():
+    assert normalize("  Microsoft .NET   Framework 4.8 ") == "microsoft .net framework"
+    assert normalize("OpenJDK 17.0.2 v2") == "openjdk"
+    assert normalize("ASP.NET") == "asp.net"
+
+
+def test_rules_apply_in_file_order_with_priority_base_image():
+    index = FingerprintIndex(RULES)
+    result = index.resolve(
+        "linux", index.mask("linux", ["Tomcat", "nginx", "IIS", "openjdk 11"])
+    )
+    assert result["rules"] == ["nginx", "java"]
+    assert result["source"] == ["N\n", "J\n"]
+    assert result["packages"] == ["curl", "default-jre", "nginx"]
+    assert result["base_image"] == "eclipse-temurin:17"
+    assert result["command"] == "app"
+
+    [plain] = index.recommend_many([("linux", ["redis"], None)])
+    assert plain["base_image"] == "ubuntu:22.04" and plain["rules"] == []
+
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(InvalidRules):
+        FingerprintIndex({"rules": [{"name": "x"}]})
+
+
+def test_registry_reloads_changed_file_and_keeps_last_good(tmp_path):
+    path = tmp_path / "rules.yaml"
+    path.write_text("rules:\n  - {name: a, match: [nginx], base_image: one}\n")
+    registry = FingerprintRegistry(str(path), check_interval=0)
+    assert registry.get().resolve("linux", 1)["base_image"] == "one"
+
+    path.write_text("rules:\n  - {name: a, match: [nginx], base_image: two}\n")
+    os.utime(path, ns=(0, 10**18))
+    assert registry.get().resolve("linux", 1)["base_image"] == "two"
+
+    path.write_text("rules: [{name: broken}]\n")
+    os.utime(path, ns=(0, 2 * 10**18))
+    assert registry.get().resolve("linux", 1)["base_image"] == "two"
+
+
+def test_create_migration_and_inventory_recommendations(client, db_session):
+    vm = VirtualMachine(
+        name="legacy",
+        uuid="u-1",
+        os_family="windows",
+        discovered_services=["IIS"],
+        installed_software=["Microsoft .NET Framework 4.8"],
+    )
+    db_session.add(vm)
+    db_session.commit()
+
+    response = client.post("/api/v1/migrations/", json={"vm_id": vm.id, "name": "m"})
+    assert response.json()["base_image"].startswith(
+        "mcr.microsoft.com/dotnet/framework/aspnet"
+    )
+
+    [row] = client.get("/api/v1/vms/recommendations").json()
+    assert row["vm_id"] == vm.id
+    assert row["rules"] == ["iis", "dotnet-framework"]
@@ -0,0 +1,113 @@
+"""
+Tests for concurrent, cached health checks
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services import health
+from app.services.health import HealthChecker
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_checks_run_concurrently():
+    def slow():
+        time.sleep(0.2)
+        return {}
+
+    checker = HealthChecker({"a": slow, "b": slow, "c": slow}, ttl=0, timeout=1)
+    start = time.perf_counter()
+    result = run(checker.results())
+
+    assert time.perf_counter() - start < 0.5
+    assert result["status"] == "healthy"
+    assert set(result["dependencies"]) == {"a", "b", "c"}
+    assert result["dependencies"]["a"]["latency_ms"] >= 200
+
+
+def test_failures_and_timeouts_degrade():
+    release = threading.Event()
+
+    def broken():
+        raise ConnectionError("connection refused")
+
+    def hung():
+        release.wait(5)
+        return {}
+
+    checker = HealthChecker(
+        {"ok": lambda: {"type": "x"}, "broken": broken, "hung": hung},
+        ttl=0,
+        timeout=0.1,
+    )
+    try:
+        result = run(checker.results())
+        deps = result["dependencies"]
+        assert result["status"] == "degraded"
+        assert deps["ok"] == {
+            "status": "healthy",
+            "type": "x",
+            "latency_ms": deps["ok"]["latency_ms"],
+        }
+        assert deps["broken"] == {"status": "unhealthy", "error": "connection refused"}
+        assert "timed out" in deps["hung"]["error"]
+
+        # The hung check is not started a second time
+        again = run(checker.results())["dependencies"]["hung"]
+        assert again["error"] == "previous check still running"
+    finally:
+        release.set()
+
+
+def test_results_are_cached_for_the_ttl():
+    calls = []
+
+    def counted():
+        calls.append(1)
+        return {}
+
+    async def storm(checker):
+        return await asyncio.gather(*(checker.results() for _ in range(50)))
+
+    checker = HealthChecker({"db": counted}, ttl=60, timeout=1)
+    results = run(storm(checker))
+    run(checker.results())
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+@pytest.fixture
+def fake_checkers(monkeypatch):
+    def install(**checks):
+        checker = HealthChecker(checks, ttl=0, timeout=1)
+        monkeypatch.setattr(
+            health, "_checkers", {"detailed": checker, "readiness": checker}
+        )
+
+    return install
+
+
+def test_detailed_endpoint(client, fake_checkers):
+    fake_checkers(
+        database=lambda: {"type": "sqlite"},
+        broker=lambda: {"queue_depth": {"celery": 3}, "queued": 3},
+    )
+    body = client.get("/health/detailed").json()
+    assert body["service"] == "vmshift-api"
+    assert body["status"] == "healthy"
+    assert body["dependencies"]["broker"]["queued"] == 3
+
+
+def test_readiness_endpoint(client, fake_checkers):
+    def down():
+        raise ConnectionError("down")
+
+    fake_checkers(database=down)
+    assert client.get("/ready").json() == {"ready": False}
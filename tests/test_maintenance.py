@@ -0,0 +1,128 @@
+"""
+Tests for the maintenance archival and result purge
+"""
+
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+from app.models.migration import (Migration, MigrationArchive, MigrationStatus,
+                                  TargetPlatform)
+from app.models.revision import ArtifactRevision
+from app.models.types import CompressedText
+from app.services.revisions import record_revision
+from app.tasks.maintenance import archive_old_migrations, purge_stale_results
+
+
+def _seed(make_migration):
+    old = datetime.now(timezone.utc) - timedelta(days=90)
+    for i in range(5):
+        make_migration(
+            name=f"old-{i}",
+            target_platform=TargetPlatform.KUBERNETES,
+            status=MigrationStatus.COMPLETED,
+            dockerfile_content="FROM ubuntu:22.04\n",
+            completed_at=old,
+        )
+    # Too recent, and not finished
+    make_migration(
+        name="recent",
+        status=MigrationStatus.FAILED,
+        completed_at=datetime.now(timezone.utc),
+    )
+    make_migration(name="running", status=MigrationStatus.DEPLOYING)
+
+
+def test_archives_old_finished_migrations_in_chunks(db_session, make_migration):
+    _seed(make_migration)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+
+    report = archive_old_migrations(db_session, cutoff, chunk_size=2, max_chunks=10)
+
+    assert report["archived"] == 5
+    assert report["chunks"] == 3
+    # Measured as stored, i.e. compressed
+    stored = CompressedText().process_bind_param("FROM ubuntu:22.04\n", None)
+    assert report["bytes_reclaimed"] == 5 * len(stored)
+    assert {m.name for m in db_session.query(Migration)} == {"recent", "running"}
+
+    archived = db_session.query(MigrationArchive).order_by(MigrationArchive.id).all()
+    assert [a.name for a in archived] == [f"old-{i}" for i in range(5)]
+    row = json.loads(gzip.decompress(archived[0].payload))
+    assert row["status"] == "completed"
+    assert row["dockerfile_content"] == "FROM ubuntu:22.04\n"
+
+
+def test_archive_keeps_artifact_revisions(db_session, make_migration):
+    _seed(make_migration)
+    first = db_session.query(Migration.id).filter_by(name="old-0").scalar()
+    for version in (1, 2):
+        record_revision(db_session, first, {"dockerfile": f"FROM base:{version}\n"})
+    db_session.commit()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+
+    archive_old_migrations(db_session, cutoff, chunk_size=10, max_chunks=1)
+
+    assert db_session.query(ArtifactRevision).count() == 0
+    archived = db_session.get(MigrationArchive, first)
+    revisions = json.loads(gzip.decompress(archived.payload))["revisions"]
+    assert [r["revision"] for r in revisions] == [1, 2]
+    assert json.loads(revisions[0]["payload"])["dockerfile"] == "FROM base:1\n"
+
+
+def test_max_chunks_bounds_one_run(db_session, make_migration):
+    _seed(make_migration)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+
+    report = archive_old_migrations(db_session, cutoff, chunk_size=2, max_chunks=1)
+
+    assert report["archived"] == 2
+    assert db_session.query(Migration).count() == 5
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.results = []
+
+    def ttl(self, key):
+        self.results.append(self.redis.ttls[key])
+
+    def strlen(self, key):
+        self.results.append(len(self.redis.values[key]))
+
+    def execute(self):
+        return self.results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {
+            "celery-task-meta-a": "x" * 10,
+            "celery-task-meta-b": "y" * 20,
+            "celery-task-meta-c": "z" * 30,
+        }
+        self.ttls = {
+            "celery-task-meta-a": -1,
+            "celery-task-meta-b": 120,
+            "celery-task-meta-c": -1,
+        }
+
+    def scan_iter(self, match=None, count=None):
+        return iter(list(self.values))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key)
+
+
+def test_purges_only_results_without_expiry():
+    redis = FakeRedis()
+
+    report = purge_stale_results(redis, batch_size=2)
+
+    assert report == {"scanned": 3, "deleted": 2, "bytes_reclaimed": 40}
+    assert list(redis.values) == ["celery-task-meta-b"]
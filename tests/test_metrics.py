@@ -0,0 +1,25 @@
+"""
+Tests for the Prometheus metrics endpoint
+"""
+
+
+def test_metrics_endpoint_reports_route_templates(client):
+    client.get("/api/v1/vms/12345")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    body = response.text
+    assert 'route="/api/v1/vms/{vm_id}"' in body
+    assert "vmshift_http_requests_in_flight" in body
+    assert "vmshift_db_pool_size" in body
+
+
+def test_unmatched_paths_share_one_label(client):
+    client.get("/no/such/path/abc")
+    client.get("/no/such/path/def")
+
+    body = client.get("/metrics").text
+    assert 'route="unmatched"' in body
+    assert "/no/such/path" not in body
@@ -0,0 +1,68 @@
+"""
+Tests for the migration event log
+"""
+
+import pytest
+
+from app.models.event import MigrationEvent
+from app.models.migration import Migration, MigrationStatus
+from app.services.migration_events import record_event, stage_duration_stats
+from app.tasks.migration_tasks import MigrationProgress
+
+
+def test_transitions_build_a_timeline(client, db_session, migration, monkeypatch):
+    monkeypatch.setattr("app.routers.migrations.dispatch_soon", lambda: None)
+    client.post(f"/api/v1/migrations/{migration.id}/start")
+
+    db_session.expire_all()
+    progress = MigrationProgress(
+        db_session,
+        migration.id,
+        db_session.get(Migration, migration.id).version,
+        status=MigrationStatus.IN_PROGRESS,
+    )
+    progress.update(status=MigrationStatus.BUILDING_IMAGE, progress_percent=30)
+    progress.update(progress_percent=50)  # Not a transition
+    progress.update(status=MigrationStatus.COMPLETED, progress_percent=100)
+
+    response = client.get(f"/api/v1/migrations/{migration.id}/timeline")
+    assert response.status_code == 200
+    body = response.json()
+    assert [(e["from_status"], e["status"]) for e in body["events"]] == [
+        ("pending", "in_progress"),
+        ("in_progress", "building_image"),
+        ("building_image", "completed"),
+    ]
+    assert body["events"][2]["from_status_seconds"] >= 0
+    assert set(body["stage_seconds"]) == {"building_image"}
+
+
+def test_timeline_of_unknown_migration_is_404(client):
+    assert client.get("/api/v1/migrations/999/timeline").status_code == 404
+
+
+def test_stage_duration_percentiles(client, db_session):
+    for seconds in [1.0, 2.0, 3.0, 4.0, 10.0]:
+        record_event(
+            db_session,
+            1,
+            MigrationStatus.PUSHING_IMAGE,
+            from_status=MigrationStatus.BUILDING_IMAGE,
+            from_status_seconds=seconds,
+        )
+    record_event(db_session, 1, MigrationStatus.IN_PROGRESS)
+    db_session.commit()
+
+    stats = stage_duration_stats(db_session)
+    assert list(stats) == ["building_image"]
+    building = stats["building_image"]
+    assert building["count"] == 5
+    assert building["mean_seconds"] == 4.0
+    assert building["p50_seconds"] == 3.0
+    assert building["p95_seconds"] == pytest.approx(8.8)
+    assert building["max_seconds"] == 10.0
+
+    response = client.get("/api/v1/migrations/stats/stage-durations")
+    assert response.status_code == 200
+    assert response.json()["stages"]["building_image"]["count"] == 5
+    assert db_session.query(MigrationEvent).count() == 6
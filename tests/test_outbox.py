@@ -0,0 +1,114 @@
+"""
+Tests for the transactional task outbox
+"""
+
+from contextlib import contextmanager
+
+from app.models.migration import MigrationStatus
+from app.models.outbox import OutboxMessage
+from app.services.outbox import dispatch_pending, enqueue_task
+
+
+class FakeCeleryApp:
+    def __init__(self, fail_on=None, error=None):
+        self.sent = []
+        self.fail_on = fail_on
+        self.error = error or ConnectionError("broker unavailable")
+        self.connections = 0
+
+    @contextmanager
+    def producer_or_acquire(self):
+        self.connections += 1
+        yield object()
+
+    def send_task(self, name, args=None, kwargs=None, task_id=None, producer=None):
+        if task_id == self.fail_on:
+            raise self.error
+        self.sent.append((name, args, task_id))
+
+
+def test_rolled_back_enqueue_is_never_published(db_session):
+    enqueue_task(db_session, "run_migration", [1])
+    db_session.rollback()
+
+    app = FakeCeleryApp()
+    assert dispatch_pending(db_session, app=app)["sent"] == 0
+    assert app.sent == []
+
+
+def test_dispatches_in_batches_over_one_connection(db_session):
+    task_ids = [enqueue_task(db_session, "run_migration", [i]) for i in range(5)]
+    db_session.commit()
+
+    app = FakeCeleryApp()
+    report = dispatch_pending(db_session, app=app, batch_size=2, max_batches=10)
+
+    assert report == {"sent": 5, "failed": 0, "dead": 0, "batches": 3}
+    assert [t for _, _, t in app.sent] == task_ids
+    assert app.connections == 1
+    assert db_session.query(OutboxMessage).filter_by(sent_at=None).count() == 0
+
+    # Already sent messages are not published again
+    assert dispatch_pending(db_session, app=app)["sent"] == 0
+
+
+def test_broker_outage_leaves_the_rest_pending(db_session):
+    task_ids = [enqueue_task(db_session, "run_migration", [i]) for i in range(3)]
+    db_session.commit()
+
+    report = dispatch_pending(db_session, app=FakeCeleryApp(fail_on=task_ids[1]))
+
+    assert report["sent"] == 1 and report["failed"] == 1
+    failed = db_session.query(OutboxMessage).filter_by(task_id=task_ids[1]).one()
+    assert failed.sent_at is None and failed.dead_at is None
+    assert failed.attempts == 0  # not the message's fault
+    assert "broker unavailable" in failed.last_error
+    assert db_session.query(OutboxMessage).filter_by(sent_at=None).count() == 2
+
+
+def test_rejected_message_is_skipped_then_dead_lettered(db_session):
+    task_ids = [enqueue_task(db_session, "run_migration", [i]) for i in range(4)]
+    db_session.commit()
+    app = FakeCeleryApp(fail_on=task_ids[1], error=TypeError("not serializable"))
+
+    report = dispatch_pending(db_session, app=app, batch_size=2, max_attempts=2)
+
+    assert report == {"sent": 3, "failed": 1, "dead": 0, "batches": 2}
+    assert [t for _, _, t in app.sent] == [task_ids[0], *task_ids[2:]]
+
+    report = dispatch_pending(db_session, app=app, max_attempts=2)
+    assert report["dead"] == 1
+    dead = db_session.query(OutboxMessage).filter_by(task_id=task_ids[1]).one()
+    assert dead.attempts == 2 and dead.dead_at is not None
+    assert "not serializable" in dead.last_error
+
+    # Dead letters are not retried
+    assert dispatch_pending(db_session, app=app)["failed"] == 0
+
+
+def test_start_migration_records_task_in_outbox(
+    client, db_session, make_migration, monkeypatch
+):
+    monkeypatch.setattr("app.routers.migrations.dispatch_soon", lambda: None)
+    migrations = [make_migration(), make_migration()]
+    migrations.append(make_migration(status=MigrationStatus.COMPLETED))
+
+    response = client.post(f"/api/v1/migrations/{migrations[0].id}/start")
+    assert response.status_code == 200
+    message = db_session.query(OutboxMessage).one()
+    assert message.task_id == response.json()["task_id"]
+    assert message.args == [migrations[0].id]
+
+    response = client.post(
+        "/api/v1/migrations/bulk-start",
+        json={"migration_ids": [m.id for m in migrations] + [999]},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert [s["migration_id"] for s in body["started"]] == [migrations[1].id]
+    assert {s["migration_id"] for s in body["skipped"]} == {
+        migrations[0].id,
+        migrations[2].id,
+        999,
+    }
+    assert db_session.query(OutboxMessage).count() == 2
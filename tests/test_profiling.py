@@ -0,0 +1,44 @@
+"""
+Tests for the request profiling middleware
+"""
+
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.middleware import install_profiling
+
+
+def _profiled_app(slow_request_ms: float):
+    engine = create_engine("sqlite://")
+    profiled = FastAPI()
+    install_profiling(profiled, slow_request_ms=slow_request_ms)
+
+    @profiled.get("/items")
+    async def items():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return [{"id": i} for i in range(10)]
+
+    return profiled
+
+
+def test_server_timing_header_counts_queries():
+    response = TestClient(_profiled_app(slow_request_ms=10_000)).get("/items")
+    assert response.status_code == 200
+
+    timing = response.headers["server-timing"]
+    assert "app;dur=" in timing
+    assert 'desc="2 queries"' in timing
+    assert "serialize;dur=" in timing
+
+
+def test_slow_request_logs_top_queries(caplog):
+    with caplog.at_level(logging.WARNING, logger="app.middleware.profiling"):
+        TestClient(_profiled_app(slow_request_ms=0)).get("/items")
+
+    assert "Slow request GET /items" in caplog.text
+    assert "SELECT 1" in caplog.text
@@ -0,0 +1,108 @@
+"""
+Tests for artifact revision history
+"""
+
+import json
+
+import pytest
+
+from app.config import settings
+from app.models.revision import ArtifactRevision
+from app.services.revisions import (apply_delta, get_revision, line_delta,
+                                    record_revision)
+
+
+def _artifacts(version: int) -> dict:
+    return {
+        "dockerfile": "FROM ubuntu:22.04\n" + "RUN true\n" * 20 + f"CMD v{version}\n",
+        "kubernetes_manifest": "kind: Deployment\nreplicas: 1\n",
+        "docker_compose": None,
+    }
+
+
+@pytest.mark.parametrize(
+    "old,new",
+    [
+        ("a\nb\nc\n", "a\nB\nc\nd\n"),
+        ("", "x\ny"),
+        ("x\ny\n", ""),
+        ("same\n", "same\n"),
+        ("no newline", "no newline\nnow"),
+    ],
+)
+def test_delta_round_trip(old, new):
+    assert apply_delta(old, line_delta(old, new)) == new
+
+
+def test_unchanged_artifacts_write_no_revision(db_session, migration):
+    assert record_revision(db_session, migration.id, _artifacts(1)).revision == 1
+    db_session.commit()
+    assert record_revision(db_session, migration.id, _artifacts(1)) is None
+    assert record_revision(db_session, migration.id, _artifacts(2)).revision == 2
+
+
+def test_revisions_are_rebuilt_across_keyframes(db_session, migration, monkeypatch):
+    monkeypatch.setattr(settings, "ARTIFACT_KEYFRAME_INTERVAL", 3)
+    for version in range(1, 8):
+        record_revision(db_session, migration.id, _artifacts(version))
+        db_session.commit()
+
+    rows = db_session.query(ArtifactRevision).order_by(ArtifactRevision.revision)
+    assert [row.is_keyframe for row in rows] == [
+        True,
+        False,
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+    # Deltas only carry the changed line
+    delta = json.loads(rows[1].payload)["dockerfile"]
+    assert ["+", ["CMD v2\n"]] in delta
+    assert len(rows[1].payload) < len(rows[0].payload)
+
+    for version in range(1, 8):
+        assert get_revision(db_session, migration.id, version)["artifacts"] == (
+            _artifacts(version)
+        )
+    assert get_revision(db_session, migration.id, 8) is None
+
+
+def test_partial_updates_carry_other_artifacts(db_session, migration):
+    record_revision(db_session, migration.id, _artifacts(1))
+    record_revision(db_session, migration.id, {"docker_compose": "version: '3.8'\n"})
+    db_session.commit()
+
+    artifacts = get_revision(db_session, migration.id, 2)["artifacts"]
+    assert artifacts == {**_artifacts(1), "docker_compose": "version: '3.8'\n"}
+
+
+def test_revision_endpoints(client, db_session, migration):
+    base = f"/api/v1/migrations/{migration.id}"
+    assert client.get(f"{base}/revisions").json() == []
+
+    assert client.post(f"{base}/generate-artifacts").status_code == 200
+    assert client.post(f"{base}/generate-artifacts").status_code == 200
+    assert len(client.get(f"{base}/revisions").json()) == 1
+
+    migration.container_port = 9090
+    db_session.commit()
+    client.post(f"{base}/generate-artifacts")
+    revisions = client.get(f"{base}/revisions").json()
+    assert [r["revision"] for r in revisions] == [1, 2]
+
+    first = client.get(f"{base}/revisions/1").json()
+    assert "EXPOSE 80\n" in first["dockerfile"]
+    assert "EXPOSE 9090" in client.get(f"{base}/revisions/2").json()["dockerfile"]
+
+    diff = client.get(
+        f"{base}/revisions/diff", params={"from_revision": 1, "to_revision": 2}
+    ).json()
+    assert "-EXPOSE 80\n" in diff["diffs"]["dockerfile"]
+    assert "+EXPOSE 9090\n" in diff["diffs"]["dockerfile"]
+    # The port also appears in the manifest and the compose file
+    assert set(diff["diffs"]) == {"dockerfile", "kubernetes_manifest", "docker_compose"}
+
+    assert client.get(f"{base}/revisions/3").status_code == 404
+    assert client.get("/api/v1/migrations/999/revisions").status_code == 404
@@ -0,0 +1,128 @@
+"""
+Tests for the right-sizing engine
+"""
+
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import yaml
+
+from app.models.utilization import UtilizationRollup
+from app.models.vm import VirtualMachine
+from app.services.artifact_generator import ArtifactGenerator
+from app.services.capacity import workload_demands
+from app.services.rightsizing import (RightSizingPolicy, recommend,
+                                      resources_for_vm)
+
+
+def test_requests_follow_utilization_and_policy():
+    policy = RightSizingPolicy(cpu_headroom=0.0, memory_headroom=0.0)
+    sizing = recommend(
+        [4, 4, None],
+        [8192, 8192, None],
+        cpu_utilization=[0.5, np.nan, 0.5],
+        memory_utilization=[0.25, np.nan, np.nan],
+        policy=policy,
+    )
+
+    # 4 cores at 50% -> 2000m; no data -> default 15% of 4 cores
+    assert sizing["cpu_request_m"].tolist() == [2000, 600, 500]
+    assert sizing["memory_request_mb"].tolist() == [2048, 5744, 368]
+    assert sizing["cpu_limit_m"].tolist() == [4000, 1200, 1000]
+    assert sizing["observed"].tolist() == [True, False, True]
+
+
+def test_sample_matrix_uses_percentile_and_clamps():
+    policy = RightSizingPolicy(
+        cpu_percentile=50, cpu_headroom=0.0, max_cpu_millicores=1500
+    )
+    samples = np.array([[0.1, 0.2, 0.3], [0.9, 1.0, np.nan], [np.nan] * 3])
+
+    sizing = recommend([1, 4, 1], [1024] * 3, cpu_utilization=samples, policy=policy)
+
+    assert sizing["cpu_request_m"].tolist() == [200, 1500, 150]
+    # Limits stay at or above the clamped request
+    assert sizing["cpu_limit_m"].tolist() == [400, 1500, 300]
+    assert sizing["observed"].tolist() == [True, True, False]
+
+
+def test_fleet_of_100k_vms_is_vectorized():
+    rng = np.random.default_rng(0)
+    sizing = recommend(
+        rng.integers(1, 32, 100_000),
+        rng.integers(512, 65536, 100_000),
+        rng.random(100_000),
+        rng.random(100_000),
+    )
+    assert sizing["cpu_request_m"].shape == (100_000,)
+    assert (sizing["memory_limit_mb"] >= sizing["memory_request_mb"]).all()
+
+
+def test_manifest_uses_recommendations(client, db_session):
+    vm = VirtualMachine(name="web-01", uuid="u-1", cpu_count=4, memory_mb=8192)
+    db_session.add(vm)
+    db_session.commit()
+
+    migration = SimpleNamespace(
+        target_namespace=None,
+        registry_url=None,
+        image_name=None,
+        image_tag=None,
+        container_port=None,
+        replicas=1,
+    )
+    manifest = ArtifactGenerator(migration, vm).generate_kubernetes_manifest()
+    deployment = next(yaml.safe_load_all(manifest))
+    resources = deployment["spec"]["template"]["spec"]["containers"][0]["resources"]
+    # No utilization data: defaults well below the VM's allocation
+    assert resources["requests"] == {"cpu": "750m", "memory": "7168Mi"}
+
+    body = client.get("/api/v1/vms/rightsizing").json()
+    assert body == [
+        {
+            "vm_id": vm.id,
+            "name": "web-01",
+            "cpu_request_m": 750,
+            "cpu_limit_m": 1500,
+            "memory_request_mb": 7168,
+            "memory_limit_mb": 8960,
+            "observed": False,
+        }
+    ]
+
+
+def test_recommendations_use_utilization_rollups(client, db_session):
+    vm = VirtualMachine(name="web-01", uuid="u-1", cpu_count=4, memory_mb=8192)
+    db_session.add(vm)
+    db_session.commit()
+    hour = int(time.time()) // 3600 * 3600
+    for age, cpu_p95 in ((1, 0.4), (2, 0.6), (30 * 24, 0.95)):
+        for metric, p95 in (("cpu", cpu_p95), ("memory", 0.5)):
+            db_session.add(
+                UtilizationRollup(
+                    vm_id=vm.id,
+                    resolution="1h",
+                    metric=metric,
+                    bucket_epoch=hour - age * 3600,
+                    count=60,
+                    min=0.0,
+                    avg=p95 / 2,
+                    p95=p95,
+                    max=p95,
+                )
+            )
+    db_session.commit()
+
+    # Busiest hour within the lookback: 4 cores * 60% * 1.25, 8 GiB * 50% * 1.25
+    assert resources_for_vm(db_session, vm)["requests"] == {
+        "cpu": "3000m",
+        "memory": "5120Mi",
+    }
+    body = client.get("/api/v1/vms/rightsizing").json()
+    assert body[0]["cpu_request_m"] == 3000
+    assert body[0]["observed"] is True
+
+    demands = workload_demands(db_session, vm_ids=[vm.id])
+    assert demands["cpu_m"].tolist() == [3000]
+    assert demands["memory_mb"].tolist() == [5120]
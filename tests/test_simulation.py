@@ -0,0 +1,47 @@
+"""
+Tests for the simulation backend
+"""
+
+import pytest
+
+from app.services.simulation import (LatencyDistribution, SimulatedFailure,
+                                     Simulator)
+
+
+def _simulator(profile, seed=7):
+    slept = []
+    return Simulator(profile=profile, seed=seed, sleep=slept.append), slept
+
+
+def test_outcomes_are_deterministic_per_key():
+    profile = {"*": {"latency": "uniform:0,1", "failure_rate": 0.5}}
+
+    def outcomes():
+        simulator, slept = _simulator(profile)
+        results = []
+        for key in range(50):
+            try:
+                simulator.stage("migration.build", key=key)
+                results.append("ok")
+            except SimulatedFailure:
+                results.append("failed")
+        return results, slept
+
+    assert outcomes() == outcomes()
+    assert "ok" in outcomes()[0] and "failed" in outcomes()[0]
+
+
+def test_stage_lookup_falls_back_to_prefix_then_wildcard():
+    simulator, slept = _simulator(
+        {"migration.build": {"latency": 3}, "migration.*": {"latency": "fixed:1"}}
+    )
+    simulator.stage("migration.build")
+    simulator.stage("migration.push")
+    simulator.stage("discovery.connect")
+
+    assert slept == [3.0, 1.0]
+
+
+def test_unknown_distribution_is_rejected():
+    with pytest.raises(ValueError):
+        LatencyDistribution("pareto:1")
@@ -0,0 +1,45 @@
+"""
+Tests for API cold start: heavy libraries stay unloaded until first use
+"""
+
+import subprocess
+import sys
+import threading
+
+from app.lazy import LazyModule, lazy_import
+
+DEFERRED = ("celery", "numpy", "yaml", "redis")
+
+
+def test_importing_the_api_does_not_load_deferred_packages():
+    probe = (
+        "import sys, app.main; "
+        f"print(','.join(m for m in {DEFERRED!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_lazy_import_returns_loaded_modules_directly():
+    assert lazy_import("json") is sys.modules["json"]
+
+
+def test_lazy_module_imports_on_first_attribute_access():
+    module = LazyModule("colorsys")
+    sys.modules.pop("colorsys", None)
+    results = []
+
+    def convert():
+        results.append(module.rgb_to_hsv(1.0, 0.0, 0.0))
+
+    threads = [threading.Thread(target=convert) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [(0.0, 1.0, 1.0)] * 8
+    assert "colorsys" in sys.modules
+    assert module.hls_to_rgb is sys.modules["colorsys"].hls_to_rgb
@@ -0,0 +1,283 @@
+"""
+Tests for per-target throttling
+"""
+
+import time
+
+import pytest
+import redis
+
+from app.config import settings
+from app.models.migration import Migration, MigrationStatus
+from app.models.vm import VirtualMachine, VMStatus
+from app.services import throttle
+from app.services.throttle import (
+    CLUSTER,
+    HYPERVISOR,
+    REGISTRY,
+    TargetThrottle,
+    Throttled,
+    defer,
+    throttled,
+)
+from app.tasks import migration_tasks, vm_tasks
+from tests.conftest import TestingSessionLocal
+
+
+class FakeRedis:
+    """Answers the acquire script from a queue of results"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+        self.released = []
+        self.renewed = []
+        self.refunded = []
+
+    def register_script(self, source):
+        def acquire(keys, args):
+            self.calls.append((keys, args))
+            result = self.results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        if source == throttle._RENEW:
+            return lambda keys, args: self.renewed.append((keys, args)) or 1
+        if source == throttle._REFUND:
+            return lambda keys, args: self.refunded.append(keys[0]) or 1
+        return acquire
+
+    def zrem(self, key, member):
+        self.released.append((key, member))
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    def install(*results):
+        fake = FakeRedis(results)
+        monkeypatch.setattr(throttle, "_throttle", TargetThrottle(fake, 60))
+        monkeypatch.setattr(settings, "THROTTLE_ENABLED", True)
+        return fake
+
+    return install
+
+
+def test_keys_share_a_cluster_slot():
+    bucket, slots = TargetThrottle.keys(REGISTRY, "registry.example.com")
+    tag = "{throttle:registry:registry.example.com}"
+    assert bucket.startswith(tag) and slots.startswith(tag)
+
+
+def test_acquire_passes_limits_and_lease(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "REGISTRY_RATE_PER_SECOND", 2.5)
+    monkeypatch.setattr(settings, "REGISTRY_BURST", 7)
+    monkeypatch.setattr(settings, "REGISTRY_MAX_CONCURRENT", 3)
+    fake = fake_redis([1, 0])
+
+    with throttled([(REGISTRY, "Registry.Example.com")]):
+        pass
+
+    [(keys, args)] = fake.calls
+    assert keys == TargetThrottle.keys(REGISTRY, "registry.example.com")
+    assert args[:4] == [2.5, 7, 3, 60000]
+    assert fake.released == [(keys[1], args[4])]
+
+
+def test_refused_target_releases_earlier_slots(fake_redis):
+    fake = fake_redis([1, 0], [0, 2500])
+
+    with pytest.raises(Throttled) as refused:
+        with throttled([(REGISTRY, "r"), (CLUSTER, "kubernetes/default")]):
+            pytest.fail("should not run")
+
+    assert refused.value.kind == CLUSTER
+    assert refused.value.retry_after == 2.5
+    assert fake.released == [(fake.calls[0][0][1], fake.calls[0][1][4])]
+    # The registry's token is refunded, the refusing cluster took none
+    assert fake.refunded == [fake.calls[0][0][0]]
+
+
+def test_held_leases_are_renewed(monkeypatch):
+    fake = FakeRedis([[1, 0]])
+    monkeypatch.setattr(throttle, "_throttle", TargetThrottle(fake, 0.03))
+    monkeypatch.setattr(settings, "THROTTLE_ENABLED", True)
+
+    with throttled([(REGISTRY, "r")]):
+        time.sleep(0.1)
+
+    [(keys, args)] = fake.calls
+    assert len(fake.renewed) >= 2
+    assert fake.renewed[0] == ([keys[1]], [30, args[4]])
+    renewals = len(fake.renewed)
+    time.sleep(0.05)
+    assert len(fake.renewed) == renewals  # the heartbeat stops with the block
+
+
+def test_unavailable_redis_fails_open(fake_redis):
+    fake = fake_redis(redis.ConnectionError("down"))
+    ran = []
+    with throttled([(HYPERVISOR, "vcenter-1"), (HYPERVISOR, None)]):
+        ran.append(True)
+    assert ran and len(fake.calls) == 1 and fake.released == []
+    assert fake.renewed == [] and fake.refunded == []
+
+
+def test_disabled_checks_nothing(fake_redis, monkeypatch):
+    fake = fake_redis()
+    monkeypatch.setattr(settings, "THROTTLE_ENABLED", False)
+    with throttled([(HYPERVISOR, "vcenter-1")]):
+        pass
+    assert fake.calls == []
+
+
+def test_defer_retries_with_jittered_countdown():
+    retries = []
+
+    class Task:
+        name = "analyze_vm"
+
+        def retry(self, **kwargs):
+            retries.append(kwargs)
+            return RuntimeError("retry")
+
+    for _ in range(20):
+        with pytest.raises(RuntimeError):
+            defer(Task(), Throttled(HYPERVISOR, "h", 4.0))
+
+    countdowns = [retry["countdown"] for retry in retries]
+    assert all(4.0 <= countdown <= 8.0 for countdown in countdowns)
+    assert len(set(countdowns)) > 1
+    assert retries[0]["max_retries"] == settings.THROTTLE_MAX_DEFERRALS
+
+
+def test_throttled_analysis_leaves_vm_untouched(db_session, fake_redis, monkeypatch):
+    vm = VirtualMachine(name="web", uuid="u-1", os_family="linux", host="esx-1")
+    db_session.add(vm)
+    db_session.commit()
+    fake_redis([0, 1000])
+    monkeypatch.setattr(vm_tasks, "SessionLocal", TestingSessionLocal)
+
+    # Called directly, Task.retry re-raises the Throttled error
+    with pytest.raises(Throttled):
+        vm_tasks.analyze_vm_task.run(vm.id)
+
+    db_session.expire_all()
+    assert db_session.get(VirtualMachine, vm.id).status == VMStatus.DISCOVERED
+
+
+def test_analysis_fails_once_deferrals_are_used_up(db_session, fake_redis, monkeypatch):
+    vm = VirtualMachine(name="web", uuid="u-1", os_family="linux", host="esx-1")
+    db_session.add(vm)
+    db_session.commit()
+    fake_redis([0, 1000])
+    monkeypatch.setattr(vm_tasks, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(settings, "THROTTLE_MAX_DEFERRALS", 0)
+
+    with pytest.raises(Throttled):
+        vm_tasks.analyze_vm_task.run(vm.id)
+
+    db_session.expire_all()
+    assert db_session.get(VirtualMachine, vm.id).status == VMStatus.FAILED
+
+
+def test_migration_fails_once_deferrals_are_used_up(
+    db_session, migration, fake_redis, monkeypatch
+):
+    fake_redis([0, 1000])
+    monkeypatch.setattr(migration_tasks, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(settings, "THROTTLE_MAX_DEFERRALS", 0)
+
+    with pytest.raises(Throttled):
+        migration_tasks.run_migration_task.run(migration.id)
+
+    db_session.expire_all()
+    failed = db_session.get(Migration, migration.id)
+    assert failed.status == MigrationStatus.FAILED
+    assert failed.error_message.startswith("Gave up after 0 deferrals")
+
+
+@pytest.fixture
+def lua_throttle(lua_redis, monkeypatch):
+    """TargetThrottle running its scripts, registry limits set per test"""
+
+    def install(rate=1000.0, burst=10, limit=0, lease_seconds=60.0):
+        monkeypatch.setattr(settings, "REGISTRY_RATE_PER_SECOND", rate)
+        monkeypatch.setattr(settings, "REGISTRY_BURST", burst)
+        monkeypatch.setattr(settings, "REGISTRY_MAX_CONCURRENT", limit)
+        return TargetThrottle(lua_redis, lease_seconds)
+
+    return install
+
+
+def test_bucket_allows_a_burst_then_refills(lua_throttle):
+    limiter = lua_throttle(rate=20.0, burst=2)
+    limiter.acquire(REGISTRY, "r")
+    limiter.acquire(REGISTRY, "r")
+
+    with pytest.raises(Throttled) as refused:
+        limiter.acquire(REGISTRY, "r")
+    assert 0 < refused.value.retry_after <= 0.05
+
+    time.sleep(0.06)
+    limiter.acquire(REGISTRY, "r")
+    # Buckets are per target
+    limiter.acquire(REGISTRY, "other")
+
+
+def test_slots_are_capped_released_and_expire(lua_throttle):
+    limiter = lua_throttle(limit=1, lease_seconds=0.05)
+    lease = limiter.acquire(REGISTRY, "r")
+    with pytest.raises(Throttled) as refused:
+        limiter.acquire(REGISTRY, "r")
+    assert 0 < refused.value.retry_after <= 0.05
+
+    limiter.release(REGISTRY, "r", lease)
+    limiter.acquire(REGISTRY, "r")  # never released: its lease runs out
+
+    time.sleep(0.06)
+    limiter.acquire(REGISTRY, "r")
+
+
+def test_renewal_keeps_a_slot_past_its_lease(lua_throttle):
+    limiter = lua_throttle(limit=1, lease_seconds=0.2)
+    lease = limiter.acquire(REGISTRY, "r")
+
+    time.sleep(0.14)
+    assert limiter.renew(REGISTRY, "r", lease)
+    time.sleep(0.14)
+    with pytest.raises(Throttled):
+        limiter.acquire(REGISTRY, "r")
+
+    time.sleep(0.1)
+    assert not limiter.renew(REGISTRY, "r", lease)  # expired meanwhile
+    limiter.acquire(REGISTRY, "r")
+
+
+def test_refund_returns_a_token_up_to_the_burst(lua_throttle):
+    limiter = lua_throttle(rate=0.001, burst=1)
+    limiter.acquire(REGISTRY, "r")
+    with pytest.raises(Throttled):
+        limiter.acquire(REGISTRY, "r")
+
+    limiter.refund(REGISTRY, "r")
+    limiter.refund(REGISTRY, "r")  # already full, the bucket stays at 1
+    limiter.acquire(REGISTRY, "r")
+    with pytest.raises(Throttled):
+        limiter.acquire(REGISTRY, "r")
+
+
+def test_refused_cluster_refunds_the_registry_token(lua_throttle, monkeypatch):
+    limiter = lua_throttle(rate=0.001, burst=1, limit=1)
+    monkeypatch.setattr(settings, "CLUSTER_MAX_CONCURRENT", 1)
+    monkeypatch.setattr(throttle, "_throttle", limiter)
+    monkeypatch.setattr(settings, "THROTTLE_ENABLED", True)
+    busy = limiter.acquire(CLUSTER, "c")
+
+    with pytest.raises(Throttled):
+        with throttled([(REGISTRY, "r"), (CLUSTER, "c")]):
+            pass
+
+    limiter.release(CLUSTER, "c", busy)
+    with throttled([(REGISTRY, "r"), (CLUSTER, "c")]):
+        pass
@@ -0,0 +1,162 @@
+"""
+Tests for utilization ingest, rollups and retention
+"""
+
+import numpy as np
+import pytest
+
+from app.models.utilization import UtilizationChunk, UtilizationRollup
+from app.models.vm import VirtualMachine
+from app.services.utilization import (aggregate, ingest, pack_series,
+                                      purge_expired, rollup_pending)
+
+HOUR = 1_700_000_000 // 3600 * 3600
+
+
+def _vm(db_session):
+    vm = VirtualMachine(name="web-01", uuid="u-1")
+    db_session.add(vm)
+    db_session.commit()
+    return vm
+
+
+def test_aggregate_buckets_match_numpy():
+    rng = np.random.default_rng(1)
+    ts = HOUR + rng.integers(0, 3600, 1000)
+    values = rng.random(1000)
+    values[::50] = np.nan
+
+    stats = aggregate(ts, values, 300)
+
+    assert stats["bucket"].tolist() == list(range(HOUR, HOUR + 3600, 300))
+    for i, bucket in enumerate(stats["bucket"]):
+        window = values[(ts >= bucket) & (ts < bucket + 300)]
+        window = window[~np.isnan(window)]
+        assert stats["count"][i] == len(window)
+        assert stats["avg"][i] == pytest.approx(window.mean())
+        assert stats["p95"][i] == pytest.approx(np.percentile(window, 95))
+        assert stats["max"][i] == window.max()
+
+
+def test_pack_series_rejects_mismatched_lengths():
+    with pytest.raises(ValueError):
+        pack_series(1, [HOUR, HOUR + 10], {"cpu": [0.5]})
+
+
+def test_ingest_and_query_rollups(client, db_session):
+    vm = _vm(db_session)
+    timestamps = [HOUR + i * 60 for i in range(120)]
+    response = client.post(
+        "/api/v1/vms/utilization",
+        json={
+            "series": [
+                {
+                    "vm_id": vm.id,
+                    "timestamps": timestamps,
+                    "cpu": [i / 120 for i in range(120)],
+                    "memory": [0.5] * 120,
+                }
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert response.json() == {"chunks": 1, "samples": 120}
+
+    report = rollup_pending(db_session)
+    assert report["chunks"] == 1
+
+    response = client.get(
+        f"/api/v1/vms/{vm.id}/utilization",
+        params={"resolution": "1h", "start": HOUR, "end": HOUR + 7200},
+    )
+    body = response.json()
+    cpu = body["metrics"]["cpu"]
+    assert [point["bucket_epoch"] for point in cpu] == [HOUR, HOUR + 3600]
+    assert cpu[0]["count"] == 60
+    assert cpu[0]["min"] == 0.0
+    assert body["metrics"]["memory"][1]["avg"] == pytest.approx(0.5)
+    assert body["metrics"]["disk"] == []
+
+    response = client.get(
+        f"/api/v1/vms/{vm.id}/utilization",
+        params={"start": HOUR, "end": HOUR + 7200, "metric": "cpu"},
+    )
+    assert len(response.json()["metrics"]["cpu"]) == 24
+
+
+def test_ingest_rejects_unknown_vm(client, db_session):
+    response = client.post(
+        "/api/v1/vms/utilization",
+        json={"series": [{"vm_id": 999, "timestamps": [HOUR], "cpu": [0.1]}]},
+    )
+    assert response.status_code == 404
+
+
+def test_late_batches_recompute_the_bucket(db_session):
+    vm = _vm(db_session)
+    ingest(db_session, [pack_series(vm.id, [HOUR, HOUR + 10], {"cpu": [0.1, 0.2]})])
+    db_session.commit()
+    rollup_pending(db_session)
+
+    ingest(db_session, [pack_series(vm.id, [HOUR + 20], {"cpu": [0.9]})])
+    db_session.commit()
+    rollup_pending(db_session)
+
+    rollup = (
+        db_session.query(UtilizationRollup)
+        .filter_by(vm_id=vm.id, resolution="5m", metric="cpu")
+        .one()
+    )
+    assert rollup.count == 3
+    assert rollup.max == pytest.approx(0.9)
+
+
+def test_purge_keeps_raw_chunks_until_rolled_up(db_session):
+    vm = _vm(db_session)
+    ingest(db_session, [pack_series(vm.id, [HOUR], {"cpu": [0.1]})])
+    db_session.commit()
+    now = HOUR + 30 * 86400
+
+    purge_expired(db_session, now, raw_days=2, rollup_5m_days=14, rollup_1h_days=400)
+    assert db_session.query(UtilizationChunk).count() == 1
+
+    rollup_pending(db_session)
+    report = purge_expired(
+        db_session, now, raw_days=2, rollup_5m_days=14, rollup_1h_days=400
+    )
+    assert report["raw_chunks"] == 1
+    assert db_session.query(UtilizationChunk).count() == 0
+    remaining = db_session.query(UtilizationRollup.resolution).distinct().all()
+    assert remaining == [("1h",)]
+
+
+def test_late_samples_after_raw_purge_keep_history(db_session):
+    vm = _vm(db_session)
+    hours = 240
+    ingest(
+        db_session,
+        [pack_series(vm.id, [HOUR + h * 3600], {"cpu": [0.5]}) for h in range(hours)],
+    )
+    db_session.commit()
+    rollup_pending(db_session)
+    now = HOUR + hours * 3600
+    purge_expired(db_session, now, raw_days=2, rollup_5m_days=400, rollup_1h_days=400)
+    assert db_session.query(UtilizationChunk).count() == 48
+
+    late = HOUR + 2 * 3600 + 60  # 10 days old, raw data already purged
+    ingest(db_session, [pack_series(vm.id, [late, now], {"cpu": [0.9, 0.1]})])
+    db_session.commit()
+    rollup_pending(db_session)
+
+    hourly = (
+        db_session.query(UtilizationRollup)
+        .filter_by(vm_id=vm.id, resolution="1h", metric="cpu")
+        .order_by(UtilizationRollup.bucket_epoch)
+        .all()
+    )
+    assert len(hourly) == hours + 1
+    merged = hourly[2]
+    assert merged.count == 2
+    assert merged.avg == pytest.approx(0.7)
+    assert merged.max == pytest.approx(0.9)
+    assert hourly[3].count == 1 and hourly[3].avg == pytest.approx(0.5)
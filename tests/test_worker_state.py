@@ -0,0 +1,83 @@
+"""
+Tests for the event-driven worker state snapshot
+"""
+
+import itertools
+import time
+
+from app.celery_app import celery_app
+from app.services.worker_state import WorkerStateMonitor
+
+
+class FakePipeline:
+    def __init__(self, lengths):
+        self.lengths = lengths
+        self.queued = []
+
+    def llen(self, queue):
+        self.queued.append(queue)
+
+    def execute(self):
+        return [self.lengths[q] for q in self.queued]
+
+
+class FakeRedis:
+    def __init__(self, lengths):
+        self.lengths = lengths
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.lengths)
+
+
+_clock = itertools.count(1)
+
+
+def _event(type_, **fields):
+    now = time.time()
+    return {
+        "type": type_,
+        "timestamp": now,
+        "local_received": now,
+        "clock": next(_clock),
+        "pid": 1,
+        **fields,
+    }
+
+
+def _monitor():
+    return WorkerStateMonitor(
+        celery_app,
+        ["discovery", "migration"],
+        lambda: FakeRedis({"discovery": 3, "migration": 7}),
+    )
+
+
+def test_snapshot_tracks_workers_and_tasks():
+    monitor = _monitor()
+    monitor.handle_event(
+        _event("worker-heartbeat", hostname="w1", freq=2.0, active=1, processed=4)
+    )
+    monitor.handle_event(
+        _event("task-received", uuid="t1", name="run_migration", hostname="w1")
+    )
+    monitor.handle_event(
+        _event("task-received", uuid="t2", name="discover_vms", hostname="w1")
+    )
+    monitor.handle_event(_event("task-started", uuid="t1", hostname="w1"))
+
+    tasks = monitor.tasks_by_worker()
+    assert [t["id"] for t in tasks["active"]["w1"]] == ["t1"]
+    assert [t["id"] for t in tasks["reserved"]["w1"]] == ["t2"]
+
+    workers = monitor.workers()
+    assert workers["w1"]["alive"] is True
+    assert workers["w1"]["processed"] == 4
+    assert monitor.freshness()["stale"] is False
+
+
+def test_snapshot_without_events_is_stale():
+    monitor = _monitor()
+    monitor.poll_queues()
+
+    assert monitor.freshness()["stale"] is True
+    assert monitor.queues_snapshot() == {"discovery": 3, "migration": 7}